@@ -0,0 +1,190 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+from datetime import date, datetime
+from sqlalchemy import select
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+from models import db, Venue, Artist, Show
+from queries import venue_detail, artist_detail
+from genres import with_genre
+from geo import nearby, nearby_args
+from routing import reads
+
+try:
+    # optional; several times faster than the standard library encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API, version 1.
+#
+# Mirrors the venue, artist and show pages for clients that want data rather
+# than HTML. Collections are streamed: rows come off a server-side cursor in
+# chunks and each chunk is encoded and sent before the next is fetched, so a
+# response's memory does not grow with the table. ?fields=a,b selects only
+# those columns in SQL. With a shared (Redis) page cache, collection
+# responses carry an ETag derived from its generations, so revalidating an
+# unchanged collection is a 304 that never reaches the database; the
+# per-process memory cache cannot see other processes' writes, so without
+# one there is no ETag.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# rows fetched and encoded per chunk of a streamed collection
+STREAM_CHUNK = 500
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value, default=_default)
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_default)
+
+    def dumps(value):
+        return _encoder.encode(value).encode()
+
+def stream_rows(rows, keys, chunk=STREAM_CHUNK):
+    '''Yields a {"data": [...]} document for `rows`, one encoded piece per `chunk` rows.'''
+    yield b'{"data":['
+    separator, batch = b'', []
+    for row in rows:
+        batch.append(dict(zip(keys, row)))
+        if len(batch) >= chunk:
+            # one encoder call per chunk; drop the list's brackets to splice it in
+            yield separator + dumps(batch)[1:-1]
+            separator, batch = b',', []
+    if batch:
+        yield separator + dumps(batch)[1:-1]
+    yield b']}'
+
+def json_response(value, status=200):
+    return current_app.response_class(dumps(value), status=status, mimetype='application/json')
+
+def requested_fields(available):
+    '''The ?fields= names, in `available` order; every field when absent. The id is always kept.'''
+    if not request.args.get('fields'):
+        return list(available)
+    names = {name.strip() for name in request.args['fields'].split(',') if name.strip()}
+    unknown = names - set(available)
+    if unknown:
+        abort(400, 'unknown fields: %s' % ', '.join(sorted(unknown)))
+    return [name for name in available if name == 'id' or name in names]
+
+# by code: the app's own 404/500 pages would win over a catch-all HTTPException handler
+@api.errorhandler(400)
+@api.errorhandler(404)
+@api.errorhandler(500)
+def http_error(error):
+    return json_response({'error': {'status': error.code, 'message': error.description}}, error.code)
+
+#----------------------------------------------------------------------------#
+# Collections.
+#----------------------------------------------------------------------------#
+
+def field_map(model, names):
+    return {name: getattr(model, name) for name in names}
+
+VENUE_FIELDS = field_map(Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link',
+                                 'facebook_link', 'website_link', 'genres', 'seeking_talent',
+                                 'seeking_description', 'num_upcoming_shows'])
+ARTIST_FIELDS = field_map(Artist, ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                                   'website_link', 'genres', 'seeking_venue', 'seeking_description',
+                                   'num_upcoming_shows'])
+# same names as the /shows tiles
+SHOW_FIELDS = dict(field_map(Show, ['id', 'start_time', 'venue_id', 'artist_id']),
+                   venue_name=Venue.name, artist_name=Artist.name, artist_image_link=Artist.image_link)
+
+def collection(fields, order, tags, build):
+    '''
+    Streams the rows of `build(columns)`, a query over the requested columns,
+    ordered by `order`. The ETag, sent only with a shared page cache, stays
+    valid until one of `tags` is invalidated.
+    '''
+    page_cache = current_app.extensions['page_cache']
+    etag = page_cache.etag(*tags)
+    if etag is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    keys = requested_fields(fields)
+    query = build([fields[key] for key in keys]).order_by(*order)
+    chunk = current_app.config.get('API_STREAM_CHUNK', STREAM_CHUNK)
+    response = Response(stream_with_context(stream_rows(query.yield_per(chunk), keys, chunk)),
+                        mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+    # cache, but revalidate every time
+    response.cache_control.no_cache = True
+    return response
+
+def listing(model):
+    def build(columns):
+        query = db.session.query(*columns).filter(model.deleted_at.is_(None))
+        if request.args.get('genre'):
+            query = with_genre(query, model, request.args['genre'])
+        return query
+    return build
+
+def show_rows(columns):
+    query = db.session.query(*columns).select_from(Show)
+    # join only the sides whose columns were asked for; the few rows being
+    # deleted are left out by id on a side that is not joined
+    models = {column.class_ for column in columns}
+    for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        if model in models:
+            query = query.join(model, key == model.id).filter(model.deleted_at.is_(None))
+        else:
+            query = query.filter(key.notin_(select(model.id).where(model.deleted_at.isnot(None))))
+    return query
+
+@api.route('/venues')
+@reads
+def venues():
+    return collection(VENUE_FIELDS, (Venue.id,), ('venues',), listing(Venue))
+
+@api.route('/artists')
+@reads
+def artists():
+    return collection(ARTIST_FIELDS, (Artist.id,), ('artists',), listing(Artist))
+
+@api.route('/shows')
+@reads
+def shows():
+    return collection(SHOW_FIELDS, (Show.start_time, Show.id), ('shows', 'venues', 'artists'), show_rows)
+
+@api.route('/venues/nearby')
+@reads
+def nearby_venues():
+    latitude, longitude, radius, limit = nearby_args(request.args)
+    return json_response({'data': [dict(venue._asdict(), distance_km=round(distance, 3))
+                                   for distance, venue in nearby(db.session, latitude, longitude, radius, limit)]})
+
+#----------------------------------------------------------------------------#
+# Single records.
+#----------------------------------------------------------------------------#
+
+def record(data):
+    if data is None:
+        abort(404, 'not found')
+    keys = requested_fields(data)
+    return json_response({'data': {key: data[key] for key in keys}})
+
+@api.route('/venues/<int:venue_id>')
+@reads
+def venue(venue_id):
+    # past and upcoming shift with the clock, so these carry no ETag
+    return record(venue_detail(venue_id))
+
+@api.route('/artists/<int:artist_id>')
+@reads
+def artist(artist_id):
+    return record(artist_detail(artist_id))
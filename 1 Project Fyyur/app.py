@@ -3,18 +3,41 @@
 #----------------------------------------------------------------------------#
 
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import logging
+import click
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from psycopg2 import _psycopg
 from models import *
+from queries import venue_areas, venue_listing, show_listing, venue_detail, artist_detail, \
+  venue_detail_fanned_out, artist_detail_fanned_out, VENUE_LISTING_ORDER, SHOW_LISTING_ORDER
+from pagination import paginate
+from formatting import format_datetime, set_cache_size, DEFAULT_CACHE_SIZE
+from templating import init_templates, compile_templates
+from assets import init_assets, build_assets
+from instrumentation import query_budget, RequestProfiler
+from cache import PageCache
+from routing import ReplicaRouter, reads
+from api import api, json_response
+from autocomplete import complete, autocomplete_args, preload as preload_autocomplete, info as autocomplete_info
+from importer import import_file, KINDS as IMPORT_KINDS, BATCH_SIZE as IMPORT_BATCH_SIZE
+from search import search, RESULTS_PER_PAGE
+from counters import count_new_show, roll_forward, stale_counters, recount_all
+from synthetic import Generator
+from genres import with_genre
+from geo import nearby, nearby_args, geocode_missing
+from bookings import clashes, find_conflicts
+from edits import apply_edit, form_values, EditConflict
+from deletions import start_deletion, run_job, pending_jobs, job_status, BATCH_SIZE as DELETION_BATCH_SIZE
+from partitions import ensure_partitions, archive_shows, add_months, month_start, \
+  MONTHS_AHEAD as PARTITION_MONTHS_AHEAD, KEEP_MONTHS
+from upcoming import calendar, parse_bound, add_upcoming_show, refresh_upcoming, CALENDAR_ORDER
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -23,28 +46,42 @@ from models import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db.init_app(app)
 migrate = Migrate(app, db)
+page_cache = PageCache(app)
+profiler = RequestProfiler(app)
+replicas = ReplicaRouter(app, db)
+app.register_blueprint(api)
+
+# most queries a venue/artist detail page may issue
+DETAIL_PAGE_QUERY_BUDGET = 3
+# runs the statements of fanned-out detail pages (DETAIL_PAGE_FAN_OUT)
+detail_executor = ThreadPoolExecutor(app.config.get('DETAIL_PAGE_FAN_OUT_WORKERS', 8),
+                                     thread_name_prefix='fyyur-detail')
+# works the deletion jobs queued by the delete views, one at a time
+deletion_executor = ThreadPoolExecutor(1, thread_name_prefix='fyyur-deletions')
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+set_cache_size(app.config.get('DATETIME_FORMAT_CACHE_SIZE', DEFAULT_CACHE_SIZE))
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+# asset_url() and asset_urls() for the layout
+init_assets(app)
+# after the filters and helpers, which templates need to compile
+init_templates(app)
+if app.config.get('AUTOCOMPLETE_PRELOAD'):
+  preload_autocomplete(app)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
+@page_cache.cached()
 def index():
   return render_template('pages/home.html')
 
@@ -53,106 +90,72 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@reads
+@page_cache.cached('venues')
 def venues():
+  # one keyset-paginated query for a page of areas, venues and upcoming show counts
+  venues = venue_listing()
+  if request.args.get('genre'):
+    venues = with_genre(venues, Venue, request.args['genre'])
+  page = paginate(venues, VENUE_LISTING_ORDER, request.args)
+  areas = venue_areas(page.rows)
 
-   data = []
-
-   locations = Venue.query.all()
-
-   global location
-
-   for location in locations:
-         unique_area = []
-
-         data.append({
-     'city' : location.city,
-     'state' : location.state,
-     'venues' : unique_area
-   })
+  return render_template("pages/venues.html", areas=areas, page=page)
 
-         areas = Venue.query.filter_by(state=location.state, city=location.city).all()
-
-         for area in areas:
-               num_upcoming_shows = 0
-               shows = Show.query.filter_by(venue_id = area.id).all()
-
-               for show in shows:
-                     if show.start_time > datetime.now():
-                           num_upcoming_shows = num_upcoming_shows + 1
-                           
-                           unique_area.append({
-                             'id': area.id,
-                             'name': area.name,
-                             'num_upcoming_shows': len(num_upcoming_shows)
-                            })
-       
-
-   return render_template("pages/venues.html", locations=data)
-
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
+@reads
 def search_venues():
 
- search_term = request.form.get("search_term", "")
- results = Venue.query.filter(Venue.name.ilike(f"%{search_term}%")).all()
- data = []
-
- global result
+ # the navbar form posts the first page, pager links GET the next ones
+ search_term = request.values.get("search_term", "")
+ page = max(request.values.get("page", 1, type=int), 1)
+ total, results = search(Venue, search_term, page)
 
- for result in results:
-       num_upcoming_shows = Show.query.filter(Show.venue_id == result.id).filter(Show.start_time > datetime.now()).all()
-
-       data.append({
+ data = [{
     'id' : result.id,
     'name' : result.name,
-    'num_upcoming_shows' : len(num_upcoming_shows)
-  })
+    'num_upcoming_shows' : result.num_upcoming_shows
+  } for result in results]
 
  response = {
-   'venues': data,
-   'count' : len(results)
+   'data': data,
+   'count' : total,
+   'page': page,
+   'has_prev': page > 1,
+   'has_next': page * RESULTS_PER_PAGE < total
  }
 
- return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+ return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@app.route('/venues/nearby')
+@reads
+def nearby_venues():
+  # ?lat=&lon=&radius=&limit=, nearest first
+  latitude, longitude, radius, limit = nearby_args(request.args)
+  data = [{
+    'id': venue.id,
+    'name': venue.name,
+    'city': venue.city,
+    'state': venue.state,
+    'num_upcoming_shows': venue.num_upcoming_shows,
+    'distance_km': distance
+  } for distance, venue in nearby(db.session, latitude, longitude, radius, limit)]
+
+  return render_template('pages/nearby_venues.html', venues=data,
+                         latitude=latitude, longitude=longitude, radius=radius)
 
 @app.route('/venues/<int:venue_id>')
+@reads
+@query_budget(DETAIL_PAGE_QUERY_BUDGET)
 def show_venue(venue_id):
+  if app.config.get('DETAIL_PAGE_FAN_OUT'):
+    data = venue_detail_fanned_out(venue_id, detail_executor)
+  else:
+    # the venue, its upcoming shows and its past shows: three queries per page
+    data = venue_detail(venue_id)
+  if data is None:
+    abort(404)
 
-  location = Venue.query.filter_by(Venue.id==venue_id).first()
-  shows = Show.query.filter(venue_id == venue_id).filter(Show.start_time > datetime.now()).all()
-  upcoming_shows = []
-  past_shows = []
-
-  for show in shows:
-        if show.start_time > datetime.now():
-              upcoming_shows.append(data)
-        else:
-              past_shows.append(data)
-        data = {
-          'artist_id': show.artist_id,
-          'artist_name': db.session.query(Artist).filter_by(id=show.artist_id).first().name,
-          'artist_image_link': db.session.query(Artist).filter_by(id=show.artist_id).first().image_link,
-          'start_time': format_datetime(str(show.start_time))
-        }
-  
-
-  data={
-    "id": location.id,
-    "name": location.name,
-    "genres": location.genres,
-    "address": location.address,
-    "city": location.city,
-    "state": location.state,
-    "phone": location.phone,
-    "website_link": location.website_link,
-    "facebook_link": location.facebook_link,
-    "seeking_talent": location.seeking_talent,
-    "seeking_description": location.seeking_talent,
-    "image_link": location.seeking_description,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
-  } 
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -173,7 +176,7 @@ def create_venue_submission():
     city = data['city']
     state = data['state']
     phone = data['phone']
-    genres = data['genres']
+    genres = data.getlist('genres')
     image_link = data['image_link']
     facebook_link = data['facebook_link']
     website_link = data['website_link']
@@ -193,6 +196,7 @@ def create_venue_submission():
     
     db.session.add(venue)
     db.session.commit()
+    page_cache.invalidate('venues')
     flash('Venue' + data['name'] + 'was successfully listed!')
  except:
     db.session.rollback()
@@ -201,14 +205,21 @@ def create_venue_submission():
     db.session.close()
  return render_template('pages/home.html')
   
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+  location_name = str(venue_id)
+  job_id = None
   try:
-    location = Venue.query.get(venue_id)
-    location_name = location.name
-
-    db.session.delete(location)
+    # hides the venue now; its shows and the row itself go in the background
+    job = start_deletion(db.session, 'venue', venue_id)
+    if job is None:
+      flash('Venue ' + location_name + ' was not found')
+      return deletion_response(None)
+    location_name = job.name
     db.session.commit()
+    job_id = job.id
+    page_cache.invalidate('venues', 'artists', 'shows')
+    queue_deletion(job_id)
 
     flash('Venue ' + location_name + ' was deleted')
   except:
@@ -217,91 +228,64 @@ def delete_venue(venue_id):
   finally:
     db.session.close()
 
-  return jsonify({'success': True})
+  return deletion_response(job_id)
 
 @app.route('/artists')
+@reads
+@page_cache.cached('artists')
 def artists():
-      
-  data = []
-
-  artists = Artist.query.all()
-
-  for artist in artists:
-        upcoming_shows = Show.query.filter(Show.artist_id == artist.id).filter(Show.start_time > datetime.now()).all()
-
-        data.append({
-     'id': artist.id,
-     'name': artist.name,
-     'num_upcoming_shows': len(upcoming_shows)
-   })     
-
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
+  # upcoming show counts come from the maintained counter column
+  artists = Artist.query.with_entities(Artist.id, Artist.name, Artist.num_upcoming_shows) \
+    .filter(Artist.deleted_at.is_(None))
+  if request.args.get('genre'):
+    artists = with_genre(artists, Artist, request.args['genre'])
+  page = paginate(artists, (Artist.name, Artist.id), request.args)
+
+  data = [{
+    'id': artist.id,
+    'name': artist.name,
+    'num_upcoming_shows': artist.num_upcoming_shows
+  } for artist in page.rows]
+
+  return render_template('pages/artists.html', artists=data, page=page)
+
+@app.route('/artists/search', methods=['GET', 'POST'])
+@reads
 def search_artists():
 
- search_term = request.form.get("search_term", "")
- results = Artist.query.filter(Artist.name.ilike(f"%{search_term}%")).all()
- data = []
+ # the navbar form posts the first page, pager links GET the next ones
+ search_term = request.values.get("search_term", "")
+ page = max(request.values.get("page", 1, type=int), 1)
+ total, results = search(Artist, search_term, page)
 
- global result
-
- for result in results:
-       num_upcoming_shows = Show.query.filter(Show.artist_id == result.id).filter(Show.start_time > datetime.now()).all()
-
-       data.append({
+ data = [{
     'id' : result.id,
     'name' : result.name,
-    'num_upcoming_shows' : len(num_upcoming_shows)
-  })
+    'num_upcoming_shows' : result.num_upcoming_shows
+  } for result in results]
 
-       response = {
-   'venues': data,
-   'count' : len(results)
+ response = {
+   'data': data,
+   'count' : total,
+   'page': page,
+   'has_prev': page > 1,
+   'has_next': page * RESULTS_PER_PAGE < total
  }
- 
- return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+ return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@reads
+@query_budget(DETAIL_PAGE_QUERY_BUDGET)
 def show_artist(artist_id):
+  if app.config.get('DETAIL_PAGE_FAN_OUT'):
+    data = artist_detail_fanned_out(artist_id, detail_executor)
+  else:
+    # the artist, its upcoming shows and its past shows: three queries per page
+    data = artist_detail(artist_id)
+  if data is None:
+    abort(404)
 
-  artist = Artist.query.filter_by(artist.id==artist_id).first()
-  shows = Show.query.filter(artist_id == artist_id).filter(Show.start_time > datetime.now()).all()
-  upcoming_shows = []
-  past_shows = []
-
-  for show in shows:
-        if show.start_time > datetime.now():
-              upcoming_shows.append(data)
-        else:
-              past_shows.append(data)
-        data = {
-          'artist_id': show.venue_id,
-          'artist_name': db.session.query(Venue).filter_by(id=show.venue_id).first().name,
-          'artist_image_link': db.session.query(Venue).filter_by(id=show.venue_id).first().image_link,
-          'start_time': format_datetime(str(show.start_time))
-        }
-  
-
-  data={
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres,
-    "address": artist.address,
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website_link": artist.website_link,
-    "facebook_link": artist.facebook_link,
-    "seeking_talent": artist.seeking_talent,
-    "seeking_description": artist.seeking_talent,
-    "image_link": artist.seeking_description,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
-  } 
-  
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -309,23 +293,25 @@ def show_artist(artist_id):
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
       
-  form = ArtistForm()
-  
-  artist = Artist.query.filter(Artist.id == artist_id).first()
+  artist = Artist.query.filter(Artist.id == artist_id, Artist.deleted_at.is_(None)).first()
+  if artist is None:
+    abort(404)
+  # filled in from the row, so an untouched field posts back unchanged
+  form = ArtistForm(obj=artist)
  
   result = {
     "id": artist.id,
     "name": artist.name,
     "genres": artist.genres,
-    "address": artist.address,
     "city": artist.city,
     "state": artist.state,
     "phone": artist.phone,
     "website_link": artist.website_link,
     "facebook_link": artist.facebook_link,
-    "seeking_talent": artist.seeking_talent,
-    "seeking_description": artist.seeking_talent,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
     "image_link": artist.image_link,
+    "version": artist.version,
   }
   return render_template('forms/edit_artist.html', form=form, artist=result)
 
@@ -335,21 +321,19 @@ def edit_artist_submission(artist_id):
   try:
     form = ArtistForm()
 
-    artist = Artist.query.filter(Artist.id == artist_id).first()
-
-    artist.name = form.name.data
-    artist.genres = form.genres.data
-    artist.city = form.city.data
-    artist.state = form.state.data
-    artist.phone = form.phone.data
-    artist.facebook_link = form.facebook_link.data
-    artist.image_link = form.image_link.data
-    artist.website_link = form.website_link.data
-    artist.seeking_venue = form.seeking_venue.data
-    artist.seeking_description = form.seeking_description.data
-
-    db.session.commit()
-    flash('Artist' + request.form['name'] + 'was successfully updated!')
+    # one UPDATE of the changed columns, none at all for an unchanged form
+    changed = apply_edit(db.session, Artist, artist_id, form_values(Artist, form),
+                         request.form.get('version', type=int))
+    if changed:
+      db.session.commit()
+      page_cache.invalidate('artists', 'shows')
+      flash('Artist' + request.form['name'] + 'was successfully updated!')
+    else:
+      flash('Artist ' + request.form['name'] + ' was not changed.')
+  except EditConflict:
+    db.session.rollback()
+    flash('Artist ' + request.form['name'] + ' was changed by someone else while you were editing. '
+          'Reload the form and try again.')
   except:
     db.session.rollback()
     flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
@@ -360,9 +344,11 @@ def edit_artist_submission(artist_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-  form = VenueForm()
-  
-  venue = Venue.query.filter(Venue.id == venue_id).first()
+  venue = Venue.query.filter(Venue.id == venue_id, Venue.deleted_at.is_(None)).first()
+  if venue is None:
+    abort(404)
+  # filled in from the row, so an untouched field posts back unchanged
+  form = VenueForm(obj=venue)
   
   result = {
     "id": venue.id,
@@ -375,8 +361,9 @@ def edit_venue(venue_id):
     "website_link": venue.website_link,
     "facebook_link": venue.facebook_link,
     "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
     "image_link": venue.image_link,
+    "version": venue.version,
   }
   return render_template('forms/edit_venue.html', form=form, venue=result)
 
@@ -386,22 +373,19 @@ def edit_venue_submission(venue_id):
   try:
     form = VenueForm()
 
-    venue = Venue.query.filter(Venue.id == venue_id).first()
-
-    venue.name = form.name.data
-    venue.genres = form.genres.data
-    venue.address = form.address.data
-    venue.city = form.city.data
-    venue.state = form.state.data
-    venue.phone = form.phone.data
-    venue.facebook_link = form.facebook_link.data
-    venue.image_link = form.image_link.data
-    venue.website_link = form.website_link.data
-    venue.seeking_talent = form.seeking_talent.data
-    venue.seeking_description = form.seeking_description.data
-
-    db.session.commit()
-    flash('Venue' + request.form['name'] + 'was successfully updated!')
+    # one UPDATE of the changed columns, none at all for an unchanged form
+    changed = apply_edit(db.session, Venue, venue_id, form_values(Venue, form),
+                         request.form.get('version', type=int))
+    if changed:
+      db.session.commit()
+      page_cache.invalidate('venues', 'shows')
+      flash('Venue' + request.form['name'] + 'was successfully updated!')
+    else:
+      flash('Venue ' + request.form['name'] + ' was not changed.')
+  except EditConflict:
+    db.session.rollback()
+    flash('Venue ' + request.form['name'] + ' was changed by someone else while you were editing. '
+          'Reload the form and try again.')
   except:
     db.session.rollback()
     flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
@@ -428,7 +412,7 @@ def create_artist_submission():
     city = data['city']
     state = data['state']
     phone = data['phone']
-    genres = data['genres']
+    genres = data.getlist('genres')
     image_link = data['image_link']
     facebook_link = data['facebook_link']
     website_link = data['website_link']
@@ -448,6 +432,7 @@ def create_artist_submission():
     
     db.session.add(artist)
     db.session.commit()
+    page_cache.invalidate('artists')
     flash('Artist' + data['name'] + 'was successfully listed!')
   except:
     db.session.rollback()
@@ -458,26 +443,105 @@ def create_artist_submission():
   return render_template('pages/home.html')
 
 
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  artist_name = str(artist_id)
+  job_id = None
+  try:
+    # hides the artist now; its shows and the row itself go in the background
+    job = start_deletion(db.session, 'artist', artist_id)
+    if job is None:
+      flash('Artist ' + artist_name + ' was not found')
+      return deletion_response(None)
+    artist_name = job.name
+    db.session.commit()
+    job_id = job.id
+    page_cache.invalidate('artists', 'venues', 'shows')
+    queue_deletion(job_id)
+
+    flash('Artist ' + artist_name + ' was deleted')
+  except:
+    flash(' an error occurred and Artist ' + artist_name + ' could not be deleted')
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+  return deletion_response(job_id)
+
+#  Deletions
+#  ----------------------------------------------------------------
+
+def run_deletion(job_id):
+  # on the deletion worker thread
+  with app.app_context():
+    try:
+      run_job(db.session, job_id, app.config.get('DELETION_BATCH_SIZE', DELETION_BATCH_SIZE),
+              # each batch takes shows off the other side's counters
+              after_batch=lambda job: page_cache.invalidate('venues', 'artists', 'shows'))
+    finally:
+      db.session.remove()
+
+def queue_deletion(job_id):
+  deletion_executor.submit(run_deletion, job_id)
+
+def deletion_response(job_id):
+  if job_id is None:
+    return jsonify({'success': False})
+  return jsonify({'success': True, 'job_id': job_id,
+                  'status_url': url_for('deletion_status', job_id=job_id)})
+
+@app.route('/deletions/<int:job_id>')
+def deletion_status(job_id):
+  job = db.session.get(DeletionJob, job_id)
+  if job is None:
+    abort(404)
+  return jsonify(job_status(job))
+
+
 #  Shows
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@reads
+@page_cache.cached('shows', 'venues', 'artists')
 def shows():
-
-  data = []
-  shows = db.session.query(Show).join(Artist).join(Venue).all()
-
-  for show in shows:
-        data.append({
-          'venue_id': show.venue_id,
-          'venue_name': show.venue.name,
-          'artist_id': show.artist_id,
-          'artist_name': show.artist.name,
-          'artist_image_link': show.artist.image_link,
-          'start_time': format_datetime(str(show.start_time))
-        })
- 
-  return render_template('pages/shows.html', shows=data)
+  if request.args.get('window') == 'upcoming':
+    return upcoming_shows()
+
+  # a page of shows ordered by (start_time, id), joined to venue and artist names
+  page = paginate(show_listing(), SHOW_LISTING_ORDER, request.args)
+
+  data = [{
+    'venue_id': show.venue_id,
+    'venue_name': show.venue_name,
+    'artist_id': show.artist_id,
+    'artist_name': show.artist_name,
+    'artist_image_link': show.artist_image_link,
+    'start_time': show.start_time
+  } for show in page.rows]
+
+  return render_template('pages/shows.html', shows=data, page=page, filters={})
+
+def upcoming_shows():
+  # /shows?window=upcoming&from=&to=, read from the pre-joined calendar table
+  filters = {key: request.args[key] for key in ('window', 'from', 'to') if request.args.get(key)}
+  try:
+    start = parse_bound(filters['from']) if 'from' in filters else None
+    end = parse_bound(filters['to']) if 'to' in filters else None
+  except ValueError:
+    abort(400)
+  page = paginate(calendar(db.session, start, end), CALENDAR_ORDER, request.args)
+
+  data = [{
+    'venue_id': show.venue_id,
+    'venue_name': show.venue_name,
+    'artist_id': show.artist_id,
+    'artist_name': show.artist_name,
+    'artist_image_link': show.artist_image_link,
+    'start_time': show.start_time
+  } for show in page.rows]
+
+  return render_template('pages/shows.html', shows=data, page=page, filters=filters)
 
 @app.route('/shows/create')
 def create_shows():
@@ -492,11 +556,27 @@ def create_show_submission():
 
     artist_id = data['artist_id']
     venue_id = data['venue_id']
-    start_time = data['start_time']
+    start_time = dateutil.parser.parse(data['start_time'])
+
+    venue = db.session.get(Venue, int(venue_id))
+    artist = db.session.get(Artist, int(artist_id))
+    if venue is None or artist is None or venue.deleted_at or artist.deleted_at:
+      flash('Show could not be listed: the venue or artist does not exist.')
+      return render_template('pages/home.html')
+
+    booked = clashes(db.session, venue_id, artist_id, start_time)
+    if booked:
+      flash('Show could not be listed: the venue or artist is already booked at %s.'
+            % ', '.join(format_datetime(show.start_time, 'full') for show in booked))
+      return render_template('pages/home.html')
 
     show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
     db.session.add(show)
+    count_new_show(db.session, show)
+    db.session.flush()
+    add_upcoming_show(db.session, show)
     db.session.commit()
+    page_cache.invalidate('shows', 'venues', 'artists')
     flash('Show was successfully listed!')
   except:
     db.session.rollback()
@@ -506,6 +586,42 @@ def create_show_submission():
 
   return render_template('pages/home.html')
 
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+@app.route('/autocomplete')
+def autocomplete():
+  # ?q=&type=venue|artist&limit=, answered from memory (autocomplete.py)
+  term, limit, kinds = autocomplete_args(request.args)
+  return json_response({'data': complete(term, limit, kinds)})
+
+#  Internal
+#  ----------------------------------------------------------------
+
+@app.route('/internal/cache')
+def cache_stats():
+  if not app.config.get('INTERNAL_ENDPOINTS'):
+    abort(404)
+  return jsonify(page_cache.info())
+
+@app.route('/internal/pool')
+def pool_stats():
+  if not app.config.get('INTERNAL_ENDPOINTS'):
+    abort(404)
+  return jsonify(dict(db.pool_info(), replicas=replicas.info()))
+
+@app.route('/internal/autocomplete')
+def autocomplete_stats():
+  if not app.config.get('INTERNAL_ENDPOINTS'):
+    abort(404)
+  return jsonify(autocomplete_info())
+
+@app.route('/internal/queries')
+def query_stats():
+  if not app.config.get('INTERNAL_ENDPOINTS'):
+    abort(404)
+  return jsonify(profiler.info())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -515,6 +631,149 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('fyyur-roll-forward')
+@click.option('--window', default=60, help='Minutes of just-started shows to roll into the past.')
+def roll_forward_command(window):
+  """Recount upcoming shows for venues/artists whose shows just started."""
+  rolled = roll_forward(db.session, timedelta(minutes=window))
+  db.session.commit()
+  page_cache.invalidate('venues', 'artists')
+  click.echo('Recounted %d venues/artists.' % rolled)
+
+@app.cli.command('fyyur-refresh-upcoming')
+def refresh_upcoming_command():
+  """Rebuild the upcoming shows calendar; run on a schedule (e.g. every few minutes)."""
+  count = refresh_upcoming(db.session)
+  db.session.commit()
+  page_cache.invalidate('shows')
+  click.echo('%d upcoming shows.' % count)
+
+@app.cli.command('fyyur-check-counters')
+@click.option('--fix', is_flag=True, help='Rewrite every counter from the shows table.')
+def check_counters_command(fix):
+  """Compare the upcoming show counters against the shows table."""
+  stale = stale_counters(db.session)
+  for table, id, stored, expected in stale:
+    click.echo('%s %d: stored %d, expected %d' % (table, id, stored, expected))
+  click.echo('%d stale counters.' % len(stale))
+
+  if stale and fix:
+    recount_all(db.session)
+    db.session.commit()
+    page_cache.invalidate('venues', 'artists')
+    click.echo('Counters rebuilt.')
+  elif stale:
+    raise SystemExit(1)
+
+@app.cli.command('fyyur-geocode')
+def geocode_command():
+  """Place venues that have no coordinates yet at their city or state centroid."""
+  placed = geocode_missing(db.session)
+  db.session.commit()
+  click.echo('%d venues placed.' % placed)
+
+@app.cli.command('fyyur-conflicts')
+def conflicts_command():
+  """Report shows double booking a venue or an artist."""
+  found = 0
+  for side, entity_id, earlier_id, later_id in find_conflicts(db.session):
+    found += 1
+    click.echo('%s %d: show %d overlaps show %d' % (side, entity_id, earlier_id, later_id))
+  click.echo('%d conflicts.' % found)
+  if found:
+    raise SystemExit(1)
+
+@app.cli.command('fyyur-run-deletions')
+def run_deletions_command():
+  """Finish deletion jobs interrupted by a restart, and retry failed ones."""
+  for job_id in pending_jobs(db.session):
+    job = run_job(db.session, job_id, app.config.get('DELETION_BATCH_SIZE', DELETION_BATCH_SIZE))
+    page_cache.invalidate('venues', 'artists', 'shows')
+    click.echo('%s %d (%s): %s, %d of %d shows deleted.' % (
+      job.kind, job.entity_id, job.name, job.status, job.shows_deleted, job.shows_total))
+
+@app.cli.command('fyyur-create-partitions')
+@click.option('--months', type=int, help='Months ahead of today (default: SHOW_PARTITION_MONTHS_AHEAD).')
+def create_partitions_command(months):
+  """Create the monthly shows partitions ahead of today; run on a schedule (e.g. daily)."""
+  months = months if months is not None else app.config.get('SHOW_PARTITION_MONTHS_AHEAD', PARTITION_MONTHS_AHEAD)
+  now = datetime.now()
+  created = ensure_partitions(db.session.connection(), now, add_months(month_start(now), months))
+  db.session.commit()
+  for name in created:
+    click.echo(name)
+  click.echo('%d partitions created.' % len(created))
+
+@app.cli.command('fyyur-archive-shows')
+@click.option('--keep-months', type=int, help='Months of shows to keep, this one included (default: SHOWS_KEEP_MONTHS).')
+@click.option('--directory', type=click.Path(file_okay=False), help='Default: SHOWS_ARCHIVE_DIR.')
+def archive_shows_command(keep_months, directory):
+  """Move shows of months long past into gzipped CSV files, dropping their partitions."""
+  keep_months = keep_months if keep_months is not None else app.config.get('SHOWS_KEEP_MONTHS', KEEP_MONTHS)
+  if keep_months < 1:
+    raise click.UsageError('Keep at least the current month.')
+  directory = directory or app.config['SHOWS_ARCHIVE_DIR']
+  before = add_months(month_start(datetime.now()), 1 - keep_months)
+  for month, count in archive_shows(db.session, before, directory):
+    click.echo('%s: %d shows archived.' % (month.strftime('%Y-%m'), count))
+  page_cache.invalidate('venues', 'artists', 'shows')
+  click.echo('Shows before %s archived into %s.' % (before.strftime('%Y-%m'), directory))
+
+@app.cli.command('fyyur-compile-templates')
+@click.option('--directory', type=click.Path(file_okay=False), help='Default: TEMPLATE_BYTECODE_CACHE_DIR.')
+def compile_templates_command(directory):
+  """Precompile every template into the bytecode cache; run at deploy time."""
+  directory = directory or app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+  if not directory:
+    raise click.UsageError('Set TEMPLATE_BYTECODE_CACHE_DIR or pass --directory.')
+  click.echo('%d templates compiled into %s.' % (compile_templates(app, directory), directory))
+
+@app.cli.command('fyyur-build-assets')
+@click.option('--directory', type=click.Path(file_okay=False), help='Default: ASSETS_DIR.')
+def build_assets_command(directory):
+  """Bundle, minify, fingerprint and precompress the static assets; run at deploy time."""
+  directory = directory or app.config['ASSETS_DIR']
+  manifest = build_assets(app, directory)
+  click.echo('%d assets built into %s.' % (len(manifest), directory))
+
+@app.cli.command('fyyur-import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Rows per insert and commit.')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Rejected rows file (default: PATH.rejects.jsonl).')
+def import_command(kind, path, batch_size, rejects):
+  """Bulk load venues, artists or shows from a CSV or JSONL file."""
+  rejects = rejects or path + '.rejects.jsonl'
+  with open(rejects, 'w') as rejected:
+    report = import_file(db.session, kind, path, rejected, batch_size,
+                         progress=lambda report: click.echo(report, err=True))
+  page_cache.invalidate('venues', 'artists', 'shows')
+
+  click.echo(report)
+  if report.rejected:
+    click.echo('Rejected rows written to %s' % rejects)
+
+@app.cli.command('fyyur-seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=1000, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Same seed, same catalog.')
+@click.option('--city-skew', default=1.0, show_default=True, help='0 spreads venues and artists evenly over cities.')
+@click.option('--genre-skew', default=1.0, show_default=True, help='0 spreads genres evenly.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), help='Day shows are placed around (default: today).')
+def seed_command(venues, artists, shows, seed, city_skew, genre_skew, anchor):
+  """Fill the database with a deterministic synthetic catalog."""
+  generator = Generator(seed=seed, city_skew=city_skew, genre_skew=genre_skew, anchor=anchor)
+  generator.populate(db.session, venues, artists, shows,
+                     progress=lambda table, rows: click.echo('%s: +%d' % (table, rows), err=True))
+  page_cache.invalidate('venues', 'artists', 'shows')
+  click.echo('Seeded %d venues, %d artists and %d shows.' % (venues, artists, shows))
+
+
 if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
@@ -0,0 +1,238 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from flask import abort, current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    # optional; without it only gzip variants are written
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    # optional; without it JavaScript is bundled as is (the libraries ship minified)
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+# `flask fyyur-build-assets` concatenates the stylesheets and scripts the
+# layout loads into a few bundles, minifies them, and writes them to
+# ASSETS_DIR under content-hashed names (css/fyyur.3f2a9c1b7d4e.css) with
+# gzip and, when brotli is installed, brotli variants next to them. The
+# files and fonts the bundles point at are fingerprinted the same way, and
+# manifest.json maps every logical name to its built one. Templates ask
+# for asset_urls('css/fyyur.css') and asset_url('img/front-splash.jpg'):
+# with a manifest those resolve to /assets/<hashed name>, served with a
+# year-long immutable Cache-Control since a changed file gets a new name;
+# without one (development) they fall back to the individual files under
+# /static. Old builds are left in place so pages rendered before a deploy
+# keep resolving.
+#----------------------------------------------------------------------------#
+
+# bundle -> sources under static/, in the order layouts/main.html loads them
+BUNDLES = {
+    'css/fyyur.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                      'css/main.responsive.css', 'css/main.quickfix.css'],
+    # loaded in <head>, before the page renders
+    'js/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js', 'js/script.js'],
+    # deferred, after jQuery
+    'js/footer.js': ['js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+# referenced one by one: the jQuery fallback, an IE-only shim, page images
+FILES = ['js/libs/jquery-1.11.1.min.js', 'js/libs/respond-1.4.2.min.js', 'img/front-splash.jpg']
+
+MANIFEST = 'manifest.json'
+# a year, the longest lifetime caches honour
+MAX_AGE = 365 * 24 * 3600
+# types worth precompressing; images and woff fonts are compressed already
+COMPRESSED = ('.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.json')
+
+#----------------------------------------------------------------------------#
+# Minification.
+#----------------------------------------------------------------------------#
+
+CSS_STRING = r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'''
+# strings, then comments
+CSS_COMMENTS = re.compile(r'(%s)|/\*.*?\*/' % CSS_STRING, re.S)
+# strings, then punctuation with the space around it, a colon with the space after it, other whitespace
+CSS_TOKENS = re.compile(r'(%s)|\s*(;\s*\}|[{};,>])\s*|(:)\s+|(\s+)' % CSS_STRING)
+
+def _css_token(match):
+    string, punctuation, colon, space = match.groups()
+    if string:
+        return string
+    if punctuation:
+        # the last declaration of a block needs no semicolon
+        return '}' if punctuation.endswith('}') else punctuation
+    return colon or ' '
+
+def minify_css(text):
+    '''Drops comments and needless whitespace, leaving strings alone.'''
+    text = CSS_COMMENTS.sub(lambda match: match.group(1) or ' ', text)
+    return CSS_TOKENS.sub(_css_token, text).strip()
+
+def minify_js(text):
+    return rjsmin.jsmin(text) if rjsmin is not None else text
+
+def minified(path, text):
+    if '.min.' in posixpath.basename(path):
+        return text
+    return minify_css(text) if path.endswith('.css') else minify_js(text)
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+SOURCE_MAP = re.compile(r'^\s*(?://|/\*)# sourceMappingURL=.*$', re.M)
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+def hashed_name(path, data):
+    stem, extension = posixpath.splitext(path)
+    return '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], extension)
+
+def emit(directory, path, data):
+    '''Writes `data` under its hashed name, with compressed variants; returns that name.'''
+    name = hashed_name(path, data)
+    target = os.path.join(directory, *name.split('/'))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as output:
+        output.write(data)
+    if name.endswith(COMPRESSED):
+        # mtime=0 keeps the .gz bytes, and so their ETag, the same on every build
+        variants = [('.gz', gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                with open(target + suffix, 'wb') as output:
+                    output.write(compressed)
+    return name
+
+class AssetBuild:
+    '''One run of build_assets: reads sources from `static_folder`, writes to `directory`.'''
+
+    def __init__(self, static_folder, static_url_path, directory):
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path
+        self.directory = directory
+        self.manifest = {}
+
+    def read(self, path):
+        with open(os.path.join(self.static_folder, *path.split('/')), 'rb') as source:
+            return source.read()
+
+    def file(self, path):
+        if path not in self.manifest:
+            self.manifest[path] = emit(self.directory, path, self.read(path))
+        return self.manifest[path]
+
+    def rewrite_urls(self, css, source, bundle):
+        # url()s are relative to their source file; the bundle lives elsewhere
+        base = posixpath.dirname(source)
+
+        def rewrite(match):
+            url = match.group(2).strip()
+            if url.startswith(('data:', 'http:', 'https:', '//', '/')):
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            target = posixpath.normpath(posixpath.join(base, path))
+            if os.path.isfile(os.path.join(self.static_folder, *target.split('/'))):
+                url = posixpath.relpath(self.file(target), posixpath.dirname(bundle))
+            else:
+                # not shipped with the app; point where it always pointed
+                url = '%s/%s' % (self.static_url_path, target)
+            return 'url("%s%s")' % (url, suffix)
+
+        return CSS_URL.sub(rewrite, css)
+
+    def bundle(self, name, sources):
+        parts = []
+        for source in sources:
+            # source maps describe the file on its own, not its place in a bundle
+            text = SOURCE_MAP.sub('', minified(source, self.read(source).decode('utf-8')))
+            if name.endswith('.css'):
+                parts.append(self.rewrite_urls(text, source, name))
+            else:
+                # a file without a trailing semicolon (or ending in a comment) must not run into the next
+                parts.append(text.rstrip() + '\n;')
+        self.manifest[name] = emit(self.directory, name, '\n'.join(parts).encode('utf-8'))
+        return self.manifest[name]
+
+def build_assets(app, directory):
+    '''Builds every bundle and file into `directory` and writes its manifest; returns the manifest.'''
+    build = AssetBuild(app.static_folder, app.static_url_path, directory)
+    for path in FILES:
+        build.file(path)
+    for name, sources in BUNDLES.items():
+        build.bundle(name, sources)
+
+    # swapped in whole, so a worker never reads half a manifest
+    temporary = os.path.join(directory, MANIFEST + '.tmp')
+    with open(temporary, 'w') as output:
+        json.dump(build.manifest, output, indent=2, sort_keys=True)
+    os.replace(temporary, os.path.join(directory, MANIFEST))
+    return build.manifest
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return {}
+
+def asset_urls(name):
+    '''URLs to load for bundle `name`: the built bundle, or its sources when there is no build.'''
+    manifest = current_app.extensions['asset_manifest']
+    if name in manifest:
+        return [url_for('asset', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+def asset_url(path):
+    '''URL of one file under static/, fingerprinted when it was built.'''
+    manifest = current_app.extensions['asset_manifest']
+    if path in manifest:
+        return url_for('asset', filename=manifest[path])
+    return url_for('static', filename=path)
+
+def send_asset(filename):
+    '''Serves a built file, precompressed when the client accepts it, cached for good.'''
+    directory = current_app.config['ASSETS_DIR']
+    if filename == MANIFEST:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    max_age = current_app.config.get('ASSETS_MAX_AGE', MAX_AGE)
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        path = safe_join(directory, filename + suffix)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+def init_assets(app):
+    '''Loads the ASSETS_DIR manifest, adds the /assets/ route and the template helpers.'''
+    app.extensions['asset_manifest'] = load_manifest(app.config['ASSETS_DIR'])
+    if 'asset' not in app.view_functions:
+        app.add_url_rule('/assets/<path:filename>', 'asset', send_asset)
+    app.jinja_env.globals.update(asset_urls=asset_urls, asset_url=asset_url)
@@ -0,0 +1,339 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import logging
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes, object_session
+from werkzeug.exceptions import BadRequest
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#
+# /autocomplete?q= completes venue and artist names from an index held in
+# each worker, so it answers with a binary search and never queries the
+# database. Every word of a name starts an entry, so "hop" finds "The
+# Musical Hop". An index is a compact base, one string of folded names and
+# a sorted array of word offsets into it, plus a small delta: names created
+# or renamed through the ORM are added to the delta (and their base entries
+# hidden) when their transaction commits, and deleted ones are hidden. The
+# base is rebuilt from the database in the background once it is
+# AUTOCOMPLETE_REBUILD_SECONDS old, which folds the delta in and picks up
+# other workers' writes and bulk loads. Indexes are built on first use, or
+# at worker start with AUTOCOMPLETE_PRELOAD.
+#----------------------------------------------------------------------------#
+
+KINDS = {'venue': Venue, 'artist': Artist}
+LIMIT = 10
+MAX_LIMIT = 25
+# longest query looked up; longer ones are cut
+MAX_QUERY = 100
+# words of a name that start entries; later ones only match as part of a longer prefix
+MAX_WORDS = 8
+REBUILD_SECONDS = 300
+SEPARATOR = '\x00'
+
+# control characters other than whitespace, which fold() drops
+CONTROL = dict.fromkeys(code for code in list(range(32)) + list(range(127, 160)) if not chr(code).isspace())
+
+def fold(text):
+    '''Lowercased, accents and control characters dropped, runs of whitespace made one space.'''
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    if not text.isprintable():
+        text = text.translate(CONTROL)
+    return ' '.join(text.casefold().split())
+
+def word_starts(key):
+    starts, position = [], 0
+    for word in key.split(' ', MAX_WORDS)[:MAX_WORDS]:
+        starts.append(position)
+        position += len(word) + 1
+    return starts
+
+def offsets(parts):
+    # where each part starts in '\n'.join(parts) + '\n', with the end of the last one
+    found, position = array('I', [0]), 0
+    for part in parts:
+        position += len(part) + 1
+        found.append(position)
+    return found
+
+class PrefixIndex:
+    '''
+    Names of one table, found by the start of any of their words.
+
+        index = PrefixIndex([(1, 'The Musical Hop')])
+        index.complete('hop', 10)   # [('hop', 1, 'The Musical Hop')]
+        index.set(1, 'The Musical Hop Bar')  # or index.set(1, None) to drop it
+    '''
+
+    def __init__(self, rows):
+        keys, names, ids = [], [], array('i')
+        for id, name in rows:
+            name = ' '.join(name.split())
+            keys.append(fold(name))
+            names.append(name)
+            ids.append(id)
+        self.text = '\n'.join(keys) + '\n'
+        self.names = '\n'.join(names) + '\n'
+        self.key_starts = offsets(keys)
+        self.name_starts = offsets(names)
+        self.ids = ids
+        # every word start of every name, ordered by the text from there to the end of its name
+        starts, suffixes = array('I'), []
+        for i, key in enumerate(keys):
+            for start in word_starts(key):
+                starts.append(self.key_starts[i] + start)
+                suffixes.append(key[start:])
+        self.starts = array('I', (starts[i] for i in sorted(range(len(starts)), key=suffixes.__getitem__)))
+        self.built_at = time.monotonic()
+
+        # changes since the build: ids whose base entries are hidden, and their current names
+        self.lock = threading.Lock()
+        self.hidden = set()
+        self.added = {}
+        self.entries = []
+
+    def suffix(self, offset):
+        return self.text[offset:self.text.index('\n', offset)]
+
+    def record(self, offset):
+        # the base name holding text offset `offset`, as (id, name)
+        i = bisect_right(self.key_starts, offset) - 1
+        return self.ids[i], self.names[self.name_starts[i]:self.name_starts[i + 1] - 1]
+
+    def set(self, id, name):
+        '''Makes `name` the name of `id`, or drops `id` when `name` is None.'''
+        with self.lock:
+            self.hidden.add(id)
+            previous = self.added.pop(id, None)
+            if previous is not None:
+                for entry in self._entries(id, previous):
+                    del self.entries[bisect_left(self.entries, entry)]
+            if name is not None:
+                name = ' '.join(name.split())
+                self.added[id] = name
+                for entry in self._entries(id, name):
+                    insort(self.entries, entry)
+
+    def _entries(self, id, name):
+        key = fold(name)
+        return [SEPARATOR.join((key[start:], str(id))) for start in word_starts(key)]
+
+    def _base_matches(self, prefix, limit):
+        # first word start whose text is >= prefix, by hand: bisect has no key= before Python 3.10
+        low, high = 0, len(self.starts)
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.starts[middle]
+            if self.text[offset:offset + len(prefix)] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        found = {}
+        for i in range(low, len(self.starts)):
+            offset = self.starts[i]
+            if len(found) == limit or not self.text.startswith(prefix, offset):
+                break
+            id, name = self.record(offset)
+            # several words of one name can match; the first is the closest
+            if id not in self.hidden and id not in found:
+                found[id] = (self.suffix(offset), id, name)
+        return list(found.values())
+
+    def _added_matches(self, prefix, limit):
+        found = {}
+        for i in range(bisect_left(self.entries, prefix), len(self.entries)):
+            entry = self.entries[i]
+            if len(found) == limit or not entry.startswith(prefix):
+                break
+            key, id = entry.rsplit(SEPARATOR, 1)
+            id = int(id)
+            if id not in found:
+                found[id] = (key, id, self.added[id])
+        return list(found.values())
+
+    def complete(self, prefix, limit=LIMIT):
+        '''
+        Up to `limit` (matched text, id, name) triples for the names with a
+        word starting with `prefix`, ordered by the text from that word on.
+        '''
+        prefix = fold(prefix[:MAX_QUERY])
+        if not prefix:
+            return []
+        with self.lock:
+            # an id is in one or the other: every added id is hidden from the base
+            return sorted(self._base_matches(prefix, limit) + self._added_matches(prefix, limit))[:limit]
+
+    def info(self):
+        return {
+            'names': len(self.ids),
+            'words': len(self.starts),
+            # names created, renamed or deleted since the build
+            'changes': len(self.hidden),
+            'bytes': self.memory(),
+            'age_seconds': round(time.monotonic() - self.built_at, 1),
+        }
+
+    def memory(self):
+        '''Bytes held by the index, base and changes.'''
+        with self.lock:
+            held = sum(map(sys.getsizeof, (self.text, self.names, self.key_starts, self.name_starts,
+                                           self.ids, self.starts, self.hidden, self.added, self.entries)))
+            return held + sum(map(sys.getsizeof, self.entries)) + sum(map(sys.getsizeof, self.added.values()))
+
+#----------------------------------------------------------------------------#
+# Indexes per database.
+#----------------------------------------------------------------------------#
+
+# (model, database url) -> PrefixIndex
+_indexes = {}
+# (model, database url) -> changes committed while that index was being built
+_journals = {}
+_lock = threading.Lock()
+# one build at a time; they are slow and each would hold a copy of the table
+_build_lock = threading.Lock()
+
+def _key(model):
+    return (model, str(db.engine.url))
+
+def build(model, session):
+    '''A fresh index of the live `model` rows, with the changes committed meanwhile applied.'''
+    key = _key(model)
+    with _build_lock:
+        with _lock:
+            _journals.setdefault(key, [])
+        try:
+            rows = session.query(model.id, model.name).filter(model.deleted_at.is_(None)).yield_per(10000)
+            index = PrefixIndex(rows)
+        except Exception:
+            with _lock:
+                _journals.pop(key, None)
+            raise
+        with _lock:
+            for id, name in _journals.pop(key):
+                index.set(id, name)
+            _indexes[key] = index
+    return index
+
+def _rebuild(app, model):
+    with app.app_context():
+        try:
+            build(model, db.session)
+        except Exception:
+            logging.getLogger(__name__).exception('rebuilding the %s autocomplete index failed', model.__name__)
+            # try again after another interval
+            with _lock:
+                index = _indexes.get(_key(model))
+                if index is not None:
+                    index.built_at = time.monotonic()
+        finally:
+            db.session.remove()
+
+def index_for(model):
+    '''The index of `model` for the current app's database, built on first use.'''
+    key = _key(model)
+    with _lock:
+        index = _indexes.get(key)
+    if index is None:
+        with _build_lock:
+            # another request may have built it while this one waited
+            index = _indexes.get(key)
+        return index or build(model, db.session)
+
+    interval = current_app.config.get('AUTOCOMPLETE_REBUILD_SECONDS', REBUILD_SECONDS)
+    with _lock:
+        due = interval and key not in _journals and time.monotonic() - index.built_at >= interval
+        if due:
+            # marks the rebuild as started; this index keeps answering until the new one is in
+            _journals[key] = []
+    if due:
+        threading.Thread(target=_rebuild, args=(current_app._get_current_object(), model),
+                         name='fyyur-autocomplete', daemon=True).start()
+    return index
+
+def complete(term, limit=LIMIT, kinds=KINDS):
+    '''
+    Up to `limit` {'type', 'id', 'name'} completions of `term` across the
+    `kinds` tables, ordered by the matched text.
+    '''
+    matches = []
+    for kind in kinds:
+        matches.extend((key, name, kind, id) for key, id, name in index_for(KINDS[kind]).complete(term, limit))
+    return [{'type': kind, 'id': id, 'name': name} for key, name, kind, id in sorted(matches)[:limit]]
+
+def info():
+    '''info() of each index of the current database, None for those not built yet.'''
+    url = str(db.engine.url)
+    with _lock:
+        indexes = {kind: _indexes.get((model, url)) for kind, model in KINDS.items()}
+    return {kind: index.info() if index is not None else None for kind, index in indexes.items()}
+
+def autocomplete_args(args):
+    '''(term, limit, kinds) from ?q=&limit=&type=; BadRequest when invalid.'''
+    kind = args.get('type')
+    if kind is not None and kind not in KINDS:
+        raise BadRequest('type must be one of %s' % ', '.join(sorted(KINDS)))
+    limit = args.get('limit', LIMIT, type=int)
+    return args.get('q', ''), min(max(limit, 1), MAX_LIMIT), [kind] if kind else list(KINDS)
+
+def preload(app):
+    '''Builds every index at worker start; a failure is logged and left to the first request.'''
+    with app.app_context():
+        try:
+            for model in KINDS.values():
+                build(model, db.session)
+        except Exception:
+            logging.getLogger(__name__).exception('preloading the autocomplete indexes failed')
+        finally:
+            db.session.remove()
+
+#----------------------------------------------------------------------------#
+# Keeping indexes current.
+#----------------------------------------------------------------------------#
+
+def _record(mapper, connection, target):
+    # inserts, renames and soft deletes; applied once the transaction commits
+    if not any(attributes.get_history(target, name).has_changes() for name in ('name', 'deleted_at')):
+        return
+    session = object_session(target)
+    if session is not None:
+        name = target.name if target.deleted_at is None else None
+        session.info.setdefault('autocomplete', []).append((mapper.class_, target.id, name))
+
+def _apply(session):
+    changes = session.info.pop('autocomplete', None)
+    if not changes:
+        return
+    url = str(db.engine.url)
+    with _lock:
+        for model, id, name in changes:
+            key = (model, url)
+            if key in _journals:
+                _journals[key].append((id, name))
+            index = _indexes.get(key)
+            if index is not None:
+                index.set(id, name)
+
+def _discard(session):
+    session.info.pop('autocomplete', None)
+
+def _drop_indexes(*args, **kwargs):
+    with _lock:
+        _indexes.clear()
+
+for _model in KINDS.values():
+    event.listen(_model, 'after_insert', _record)
+    event.listen(_model, 'after_update', _record)
+event.listen(Session, 'after_commit', _apply)
+event.listen(Session, 'after_rollback', _discard)
+event.listen(db.metadata, 'after_drop', _drop_indexes)
@@ -0,0 +1,489 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import babel.dates
+import dateutil.parser
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from app import app
+from flask import render_template
+from forms import VenueForm
+from templating import compile_templates
+from assets import build_assets, init_assets
+from models import db, Venue, Artist, Show
+from sqlalchemy import func, select, text
+from instrumentation import QueryCounter
+from counters import recount_all
+from search import search, install_postgres_search
+from bookings import SHOW_LENGTH, install_postgres_bookings
+from autocomplete import PrefixIndex, _indexes as autocomplete_indexes
+from partitions import install_postgres_partitions, ensure_partitions
+from queries import shows_of
+from synthetic import Generator, VENUE_NOUNS, ARTIST_NOUNS
+from formatting import format_datetime, set_cache_size, cache_info, DEFAULT_CACHE_SIZE
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Seattle', 'WA')]
+
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk', 'Hip-Hop', 'Rock n Roll', 'Blues']
+
+@contextmanager
+def scratch_database(partitioned=False):
+  '''
+  Runs the block inside an app context on empty tables. Uses the Postgres
+  database named by BENCHMARK_DATABASE_URL when set (its tables are dropped
+  afterwards), with shows partitioned by month when `partitioned`, otherwise
+  a throwaway SQLite file.
+  '''
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  path = None
+  if url is None:
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    url = 'sqlite:///' + path
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+  # measure the database work, not the page cache
+  app.config['PAGE_CACHE_ENABLED'] = False
+  # nor slow query logging, which fires constantly under contention
+  app.config['SLOW_QUERY_MS'] = None
+
+  try:
+    with app.app_context():
+      db.create_all()
+      if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as connection:
+          install_postgres_search(connection)
+          install_postgres_bookings(connection)
+          if partitioned:
+            now = datetime.now()
+            install_postgres_partitions(connection, now, now)
+      try:
+        yield
+      finally:
+        db.session.remove()
+        db.drop_all()
+  finally:
+    if path:
+      os.unlink(path)
+
+def seed(num_venues, shows_per_venue=2):
+  now = datetime.now()
+  artist = Artist(name='Benchmark Artist', city='Austin', state='TX')
+  db.session.add(artist)
+  for i in range(num_venues):
+    city, state = CITIES[i % len(CITIES)]
+    venue = Venue(name='Venue %d' % i, city=city, state=state, address='%d Main St' % i)
+    db.session.add(venue)
+    for j in range(shows_per_venue):
+      # alternate between past and upcoming shows, one slot apart per venue
+      # so the single artist is never double booked
+      offset = timedelta(days=j + 1) + SHOW_LENGTH * i
+      offset = offset if j % 2 == 0 else -offset
+      db.session.add(Show(artist=artist, venue=venue, start_time=now + offset))
+  db.session.flush()
+  recount_all(db.session)
+  db.session.commit()
+
+def measure(path):
+  client = app.test_client()
+  client.get(path)  # warm up template and statement caches
+  with QueryCounter() as counter:
+    started = time.perf_counter()
+    response = client.get(path)
+    elapsed = time.perf_counter() - started
+  assert response.status_code == 200, response.status_code
+  return counter.count, elapsed
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+
+def bench_venues(sizes=(10, 100, 1000, 5000)):
+  '''GET /venues must cost the same number of queries at every catalog size.'''
+  print('%8s %8s %10s' % ('venues', 'queries', 'ms'))
+  counts = set()
+  for size in sizes:
+    with scratch_database():
+      seed(size)
+      queries, elapsed = measure('/venues')
+    counts.add(queries)
+    print('%8d %8d %10.1f' % (size, queries, elapsed * 1000))
+  assert len(counts) == 1, 'query count grows with venue count: %s' % sorted(counts)
+
+def bulk_seed_catalog(size, chunk=10000):
+  # core executemany inserts; the ORM is far too slow for a million rows
+  for start in range(0, size, chunk):
+    rows = []
+    for i in range(start, min(start + chunk, size)):
+      city, state = CITIES[i % len(CITIES)]
+      rows.append({
+        'name': 'Venue %d %s' % (i, GENRES[i % len(GENRES)]),
+        'city': city,
+        'state': state,
+        'address': '%d Main St' % i,
+        'genres': [GENRES[i % len(GENRES)], GENRES[(i * 7) % len(GENRES)]],
+        'num_upcoming_shows': 0
+      })
+    db.session.execute(Venue.__table__.insert(), rows)
+  db.session.commit()
+
+def bench_search(sizes=(10000, 100000, 1000000), terms=('venue 4217', 'swing', 'seattle', 'nothing like this')):
+  '''Indexed search() against the old Venue.name.ilike('%term%') scan.'''
+  print('%9s %-18s %10s %10s' % ('venues', 'term', 'ilike ms', 'search ms'))
+  for size in sizes:
+    with scratch_database():
+      bulk_seed_catalog(size)
+      search(Venue, 'warm up')  # builds the in-process index on SQLite
+      for term in terms:
+        started = time.perf_counter()
+        db.session.query(Venue.id, Venue.name, Venue.num_upcoming_shows) \
+          .filter(Venue.name.ilike('%' + term + '%')).all()
+        scan = time.perf_counter() - started
+
+        started = time.perf_counter()
+        search(Venue, term)
+        indexed = time.perf_counter() - started
+
+        print('%9d %-18s %10.2f %10.2f' % (size, term, scan * 1000, indexed * 1000))
+
+def bench_genre(sizes=(1000, 10000, 100000), genres=('Alternative', 'Folk', 'Other', 'Polka')):
+  '''GET /venues?genre= across catalog sizes, for common, rare and unknown genres.'''
+  print('%9s %-12s %10s %10s' % ('venues', 'genre', 'queries', 'ms'))
+  for size in sizes:
+    with scratch_database():
+      Generator(seed=0).populate(db.session, venues=size, artists=0, shows=0)
+      for genre in genres:
+        queries, elapsed = measure('/venues?genre=' + genre)
+        print('%9d %-12s %10d %10.1f' % (size, genre, queries, elapsed * 1000))
+
+def bench_nearby(sizes=(1000, 10000, 100000), places=(('New York', 40.7128, -74.0060),
+                                                    ('Minneapolis', 44.9778, -93.2650),
+                                                    ('Nevada desert', 39.5, -116.5))):
+  '''GET /venues/nearby across catalog sizes, around the densest city, a sparse one and nowhere.'''
+  print('%9s %-14s %10s %10s' % ('venues', 'around', 'queries', 'ms'))
+  for size in sizes:
+    with scratch_database():
+      Generator(seed=0).populate(db.session, venues=size, artists=0, shows=0)
+      for name, latitude, longitude in places:
+        queries, elapsed = measure('/venues/nearby?lat=%s&lon=%s&radius=100' % (latitude, longitude))
+        print('%9d %-14s %10d %10.1f' % (size, name, queries, elapsed * 1000))
+
+def bench_detail(clients=16, requests=40, venues=200, shows=8000):
+  '''
+  p50/p99 of venue and artist pages under `clients` concurrent clients, with
+  DETAIL_PAGE_FAN_OUT off and on. Only meaningful against a real Postgres
+  (BENCHMARK_DATABASE_URL); SQLite has no network round trips to overlap.
+  '''
+  print('%-10s %8s %8s %8s' % ('mode', 'p50 ms', 'p95 ms', 'p99 ms'))
+  with scratch_database():
+    venue_ids, artist_ids = Generator(seed=0).populate(db.session, venues=venues, artists=venues, shows=shows)
+    paths = ['/venues/%d' % id for id in venue_ids[:20]] + ['/artists/%d' % id for id in artist_ids[:20]]
+    for fan_out in (False, True):
+      app.config['DETAIL_PAGE_FAN_OUT'] = fan_out
+      timings = []
+
+      def client_loop(offset):
+        client = app.test_client()
+        for i in range(requests):
+          started = time.perf_counter()
+          response = client.get(paths[(offset + i) % len(paths)])
+          elapsed = time.perf_counter() - started
+          assert response.status_code == 200, response.status_code
+          timings.append(elapsed * 1000)
+
+      client_loop(0)  # warm up
+      timings.clear()
+      threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(clients)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+
+      timings.sort()
+      p50, p95, p99 = (timings[min(int(len(timings) * q), len(timings) - 1)] for q in (0.50, 0.95, 0.99))
+      print('%-10s %8.2f %8.2f %8.2f' % ('fan-out' if fan_out else 'serial', p50, p95, p99))
+    app.config['DETAIL_PAGE_FAN_OUT'] = False
+
+# run in a fresh interpreter: import the app, then time the first response of each page
+COLD_START = '''
+import sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+for path in sys.argv[1:]:
+  assert client.get(path).status_code == 200, path
+print(imported - started, time.perf_counter() - imported)
+'''
+
+def cold_start(env, paths, runs):
+  imports, responses = [], []
+  for i in range(runs):
+    output = subprocess.run([sys.executable, '-c', COLD_START] + list(paths), env=dict(os.environ, **env),
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                            check=True).stdout
+    imported, responded = (float(value) for value in output.split())
+    imports.append(imported)
+    responses.append(responded)
+  return statistics.median(imports), statistics.median(responses)
+
+def bench_templates(runs=5, renders=2000, paths=('/', '/venues/create', '/artists/create', '/shows/create')):
+  '''
+  Cold start of a worker (import, then first response of each page) in debug
+  mode, in production mode compiling at startup, and in production mode
+  loading a precompiled bytecode cache; then the per-render cost with
+  template auto-reload on and off.
+  '''
+  directory = tempfile.mkdtemp()
+  try:
+    compile_templates(app, directory)
+    variants = [
+      ('debug', {'FYYUR_DEBUG': '1'}),
+      ('production', {'FYYUR_DEBUG': '0'}),
+      ('production+cache', {'FYYUR_DEBUG': '0', 'TEMPLATE_BYTECODE_CACHE_DIR': directory}),
+    ]
+    print('%-18s %10s %14s %10s' % ('mode', 'import ms', 'responses ms', 'total ms'))
+    for label, env in variants:
+      imported, responded = cold_start(env, paths, runs)
+      print('%-18s %10.1f %14.1f %10.1f' % (label, imported * 1000, responded * 1000, (imported + responded) * 1000))
+  finally:
+    shutil.rmtree(directory)
+
+  print('%-18s %10s' % ('auto reload', 'us/render'))
+  auto_reload = app.jinja_env.auto_reload
+  try:
+    for enabled in (True, False):
+      app.jinja_env.auto_reload = enabled
+      with app.test_request_context('/venues/create'):
+        form = VenueForm()
+        render_template('forms/new_venue.html', form=form)
+        started = time.perf_counter()
+        for i in range(renders):
+          render_template('forms/new_venue.html', form=form)
+        elapsed = time.perf_counter() - started
+      print('%-18s %10.1f' % ('on' if enabled else 'off', elapsed / renders * 1e6))
+  finally:
+    app.jinja_env.auto_reload = auto_reload
+
+def layout_assets(headers):
+  # (requests, bytes) to fetch the local stylesheets, scripts and images the home page links to
+  client = app.test_client()
+  page = client.get('/').data.decode()
+  urls = re.findall(r'(?:href|src)="(/(?:static|assets)/[^"]+)"', page)
+  # the favicons the layout names are not shipped
+  responses = [response for response in (client.get(url, headers=headers) for url in urls)
+               if response.status_code == 200]
+  return len(responses), sum(len(response.data) for response in responses)
+
+def bench_assets():
+  '''Requests and bytes for the home page's local assets, from static/ and from a build.'''
+  directory = tempfile.mkdtemp()
+  assets_dir, page_cache_enabled = app.config['ASSETS_DIR'], app.config['PAGE_CACHE_ENABLED']
+  # each variant renders its own links
+  app.config['PAGE_CACHE_ENABLED'] = False
+  print('%-24s %8s %10s' % ('assets', 'requests', 'KiB'))
+  try:
+    variants = [('static/', None, {}), ('built', directory, {}),
+                ('built, gzip', directory, {'Accept-Encoding': 'gzip'}),
+                ('built, brotli', directory, {'Accept-Encoding': 'br, gzip'})]
+    build_assets(app, directory)
+    for label, folder, headers in variants:
+      app.config['ASSETS_DIR'] = folder or assets_dir
+      init_assets(app)
+      requests, size = layout_assets(headers)
+      print('%-24s %8d %10.1f' % (label, requests, size / 1024))
+  finally:
+    app.config.update(ASSETS_DIR=assets_dir, PAGE_CACHE_ENABLED=page_cache_enabled)
+    init_assets(app)
+    shutil.rmtree(directory)
+
+def legacy_format_datetime(value, format='medium'):
+  # the filter as it was: string round trip and a fresh babel pattern per call
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+def bench_datetime(num_shows=50000):
+  '''Per-row cost of the datetime filter on a /shows sized batch.'''
+  start = datetime(2026, 1, 1, 18, 0)
+  # shows cluster on evening slots, so many rows share a start time
+  times = [start + timedelta(days=i % 365, minutes=30 * (i % 8)) for i in range(num_shows)]
+
+  def run(label, format_one):
+    started = time.perf_counter()
+    for value in times:
+      format_one(value)
+    elapsed = time.perf_counter() - started
+    print('%-28s %8.2f us/row' % (label, elapsed / num_shows * 1e6))
+
+  # the view formatted str(start_time), then the template filter parsed it again
+  run('before', lambda value: legacy_format_datetime(legacy_format_datetime(str(value)), 'full'))
+  set_cache_size(0)
+  run('after, patterns only', lambda value: format_datetime(value, 'full'))
+  set_cache_size(DEFAULT_CACHE_SIZE)
+  run('after, with string LRU', lambda value: format_datetime(value, 'full'))
+  print(cache_info())
+
+def seed_slots(venue_ids, artist_ids, now, slots, chunk=10000):
+  # every slot books each venue and each artist once, SHOW_LENGTH apart: no clashes
+  rows = []
+  for slot in slots:
+    for j, venue_id in enumerate(venue_ids):
+      rows.append({'venue_id': venue_id, 'artist_id': artist_ids[(j + slot) % len(artist_ids)],
+                   'start_time': now + SHOW_LENGTH * slot})
+      if len(rows) == chunk:
+        db.session.execute(Show.__table__.insert(), rows)
+        rows = []
+  if rows:
+    db.session.execute(Show.__table__.insert(), rows)
+  db.session.commit()
+
+def median_ms(statement, runs):
+  timings = []
+  for _ in range(runs):
+    started = time.perf_counter()
+    db.session.execute(statement).all()
+    timings.append((time.perf_counter() - started) * 1000)
+  return statistics.median(timings)
+
+def partitions_scanned(statement):
+  compiled = statement.compile(dialect=db.engine.dialect)
+  plan = db.session.connection().exec_driver_sql('EXPLAIN ' + str(compiled), compiled.params)
+  return sum(1 for line, in plan if re.search(r' on shows_(y\d{4}m\d{2}|default)\b', line))
+
+def bench_partitions(sizes=(10000, 100000, 1000000), width=100, upcoming=1000, runs=50):
+  '''
+  Upcoming show queries, a venue page's upcoming half and a count of every
+  upcoming show, as past shows pile up behind `upcoming` future ones. Their
+  time should stay flat while the venue's past half grows with history. On
+  Postgres (BENCHMARK_DATABASE_URL) shows is partitioned by month and each
+  plan's partition count is reported: the upcoming ones must not grow.
+  '''
+  with scratch_database(partitioned=True):
+    now = datetime.now()
+    venue_ids, artist_ids = Generator(seed=0).populate(db.session, venues=width, artists=width, shows=0)
+    postgres = db.engine.dialect.name == 'postgresql'
+    if postgres:
+      ensure_partitions(db.session.connection(), now, now + SHOW_LENGTH * (upcoming // width))
+    seed_slots(venue_ids, artist_ids, now, range(1, upcoming // width + 1))
+
+    statements = {
+      'venue upcoming': shows_of(Show.venue_id, Artist, venue_ids[0], True, now),
+      'all upcoming': select(func.count()).select_from(Show).where(Show.start_time > now),
+      'venue past': shows_of(Show.venue_id, Artist, venue_ids[0], False, now),
+    }
+    print('%9s %-16s %10s %10s' % ('history', 'query', 'partitions', 'ms'))
+    seeded, scanned = 0, {}
+    for size in sizes:
+      slots = range(-size // width, -seeded // width)
+      if postgres:
+        ensure_partitions(db.session.connection(), now + SHOW_LENGTH * slots[0], now)
+        db.session.commit()
+      seed_slots(venue_ids, artist_ids, now, slots)
+      seeded = size
+      if postgres:
+        db.session.execute(text('ANALYZE shows'))
+        db.session.commit()
+      for label, statement in statements.items():
+        partitions = partitions_scanned(statement) if postgres else None
+        scanned.setdefault(label, set()).add(partitions)
+        print('%9d %-16s %10s %10.2f' % (size, label, '-' if partitions is None else partitions,
+                                        median_ms(statement, runs)))
+    for label in ('venue upcoming', 'all upcoming'):
+      assert len(scanned[label]) == 1, '%s scans more partitions as history grows' % label
+
+def percentiles(timings, quantiles=(0.50, 0.99)):
+  timings = sorted(timings)
+  return [timings[min(int(len(timings) * q), len(timings) - 1)] for q in quantiles]
+
+def bench_autocomplete(sizes=(10000, 100000, 1000000), runs=2000,
+                       prefixes=('b', 'gold', 'golden ha', 'crimson kids 4', 'zzz')):
+  '''
+  Build time and memory of an autocomplete index across name counts, then
+  lookup and rename latency, and GET /autocomplete served from the largest
+  index with no database query, next to the same request without a lookup.
+  '''
+  generator = Generator(seed=0)
+  print('%9s %9s %9s %9s %10s' % ('names', 'words', 'build s', 'MB', 'bytes/name'))
+  for size in sizes:
+    names = [(i, generator.name(VENUE_NOUNS if i % 2 else ARTIST_NOUNS, i)) for i in range(1, size + 1)]
+    started = time.perf_counter()
+    index = PrefixIndex(names)
+    elapsed = time.perf_counter() - started
+    info = index.info()
+    print('%9d %9d %9.2f %9.1f %10.1f' % (size, info['words'], elapsed, info['bytes'] / 2 ** 20,
+                                           info['bytes'] / size))
+    del names
+
+  print('%-16s %10s %10s' % ('lookup', 'p50 us', 'p99 us'))
+  for prefix in prefixes:
+    timings = []
+    for _ in range(runs):
+      started = time.perf_counter()
+      index.complete(prefix, 10)
+      timings.append((time.perf_counter() - started) * 1e6)
+    print('%-16s %10.1f %10.1f' % (prefix, *percentiles(timings)))
+
+  timings = []
+  for i in range(runs):
+    started = time.perf_counter()
+    index.set(i + 1, 'Renamed Venue %d' % i)
+    timings.append((time.perf_counter() - started) * 1e6)
+  print('%-16s %10.1f %10.1f' % ('rename', *percentiles(timings)))
+
+  with scratch_database():
+    # the largest index stands in for both tables; the view never reads the database
+    for model in (Venue, Artist):
+      autocomplete_indexes[(model, str(db.engine.url))] = index
+    client = app.test_client()
+    # an empty query skips the lookup: what is left is the request's own cost
+    for label, queries in (('GET, no lookup', ['']), ('GET', prefixes)):
+      timings = []
+      with QueryCounter() as counter:
+        for i in range(runs):
+          started = time.perf_counter()
+          response = client.get('/autocomplete?q=' + queries[i % len(queries)])
+          timings.append((time.perf_counter() - started) * 1e6)
+          assert response.status_code == 200, response.status_code
+      assert counter.count == 0, '/autocomplete queried the database'
+      print('%-16s %10.1f %10.1f' % (label, *percentiles(timings)))
+
+BENCHMARKS = {
+  'venues': bench_venues,
+  'search': bench_search,
+  'datetime': bench_datetime,
+  'genre': bench_genre,
+  'detail': bench_detail,
+  'nearby': bench_nearby,
+  'templates': bench_templates,
+  'assets': bench_assets,
+  'partitions': bench_partitions,
+  'autocomplete': bench_autocomplete,
+}
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+# usage: python benchmarks.py [name ...]
+if __name__ == '__main__':
+  for name in sys.argv[1:] or BENCHMARKS:
+    print('== %s' % name)
+    BENCHMARKS[name]()
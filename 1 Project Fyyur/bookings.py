@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from bisect import bisect_right, insort
+from collections import deque
+from datetime import timedelta
+from sqlalchemy import and_, or_
+from models import Show
+
+#----------------------------------------------------------------------------#
+# Double booking.
+#
+# A show holds its venue and its artist for SHOW_LENGTH from its start time.
+# All slots have the same length, so two slots overlap exactly when their
+# starts are less than SHOW_LENGTH apart, and checking a booking is a range
+# probe on the (venue_id, start_time) and (artist_id, start_time) indexes.
+# On Postgres, GiST exclusion constraints (POSTGRES_BOOKING_DDL) enforce the
+# same rule against concurrent writers. Once shows is partitioned by month
+# (partitions.py) each partition carries its own, and those cannot see the
+# neighbouring month: a trigger (POSTGRES_BOUNDARY_DDL) checks the shows
+# within SHOW_LENGTH of a month boundary across it, locking the venue and
+# artist rows first so two such bookings for one of them take turns.
+#----------------------------------------------------------------------------#
+
+# keep in step with the interval in POSTGRES_BOOKING_DDL and its migration
+SHOW_LENGTH = timedelta(hours=3)
+
+def clashes(session, venue_id, artist_id, start_time, length=SHOW_LENGTH):
+    '''Shows at the same venue or by the same artist overlapping a slot starting at `start_time`.'''
+    return session.query(Show) \
+        .filter(or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+                and_(Show.start_time > start_time - length, Show.start_time < start_time + length)) \
+        .order_by(Show.start_time, Show.id) \
+        .all()
+
+class Availability:
+    '''
+    Booked slots per venue and artist held in memory, for checking many
+    bookings at once (bulk imports). Each key keeps a sorted list of start
+    times, so a check is a bisect.
+
+        availability.book(('venue', 3), start_time)
+        availability.is_free(('venue', 3), other_start_time)
+    '''
+
+    def __init__(self, length=SHOW_LENGTH):
+        self.length = length
+        self.starts = {}
+
+    def is_free(self, key, start_time):
+        starts = self.starts.get(key)
+        if not starts:
+            return True
+        # first booked start after start_time - length is the only candidate
+        index = bisect_right(starts, start_time - self.length)
+        return index == len(starts) or starts[index] >= start_time + self.length
+
+    def book(self, key, start_time):
+        insort(self.starts.setdefault(key, []), start_time)
+
+def booked_around(session, rows, length=SHOW_LENGTH):
+    '''
+    Availability holding the booked shows that could clash with any of
+    `rows` (dicts with venue_id, artist_id and start_time).
+    '''
+    availability = Availability(length)
+    if not rows:
+        return availability
+    starts = [row['start_time'] for row in rows]
+    booked = session.query(Show.venue_id, Show.artist_id, Show.start_time) \
+        .filter(or_(Show.venue_id.in_({row['venue_id'] for row in rows}),
+                    Show.artist_id.in_({row['artist_id'] for row in rows})),
+                and_(Show.start_time > min(starts) - length, Show.start_time < max(starts) + length))
+    for venue_id, artist_id, start_time in booked:
+        availability.book(('venue', venue_id), start_time)
+        availability.book(('artist', artist_id), start_time)
+    return availability
+
+def find_conflicts(session, length=SHOW_LENGTH, chunk=10000):
+    '''
+    Yields (side, id, earlier show id, later show id) for every pair of
+    overlapping shows at one venue (side 'venue') or by one artist
+    ('artist'). One ordered pass over each (fk, start_time) index.
+    '''
+    for side, foreign_key in (('venue', Show.venue_id), ('artist', Show.artist_id)):
+        current, window = None, deque()
+        rows = session.query(foreign_key, Show.start_time, Show.id) \
+            .order_by(foreign_key, Show.start_time, Show.id) \
+            .yield_per(chunk)
+        for entity_id, start_time, show_id in rows:
+            if entity_id != current:
+                current, window = entity_id, deque()
+            while window and window[0][0] <= start_time - length:
+                window.popleft()
+            for earlier_start, earlier_id in window:
+                yield side, entity_id, earlier_id, show_id
+            window.append((start_time, show_id))
+
+#----------------------------------------------------------------------------#
+# Postgres schema.
+#----------------------------------------------------------------------------#
+
+# a show holds its venue and artist for SHOW_LENGTH: (constraint suffix, column)
+BOOKING_CONSTRAINTS = [('venue_no_overlap', 'venue_id'), ('artist_no_overlap', 'artist_id')]
+
+def booking_ddl(table):
+    '''Exclusion constraints keeping `table` (shows, or one of its partitions) free of double bookings.'''
+    return ["ALTER TABLE %s ADD CONSTRAINT %s_%s EXCLUDE USING gist "
+            "(%s WITH =, tsrange(start_time, start_time + interval '3 hours') WITH &&)"
+            % (table, table, suffix, column) for suffix, column in BOOKING_CONSTRAINTS]
+
+# frozen copy lives in the migration; this one is used by benchmarks.py
+POSTGRES_BOOKING_DDL = ["CREATE EXTENSION IF NOT EXISTS btree_gist"] + booking_ddl('shows')
+
+# frozen copy lives in migrations/versions/f7d3b1e9a5c2_.py; this one is used
+# by partitions.install_postgres_partitions(). A trigger on the partitioned
+# table is cloned onto every partition, present and future.
+POSTGRES_BOUNDARY_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION fyyur_check_boundary_booking() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        -- a slot inside one month is left to that partition's exclusion constraints
+        IF date_trunc('month', NEW.start_time - interval '3 hours') = date_trunc('month', NEW.start_time)
+           AND date_trunc('month', NEW.start_time + interval '3 hours') = date_trunc('month', NEW.start_time) THEN
+            RETURN NULL;
+        END IF;
+        -- bookings near a boundary for one venue or artist take turns; each
+        -- statement below then sees the ones committed before it
+        PERFORM 1 FROM venues WHERE id = NEW.venue_id FOR NO KEY UPDATE;
+        PERFORM 1 FROM artists WHERE id = NEW.artist_id FOR NO KEY UPDATE;
+        IF EXISTS (
+            SELECT 1 FROM shows
+            WHERE (venue_id = NEW.venue_id OR artist_id = NEW.artist_id)
+              AND start_time > NEW.start_time - interval '3 hours'
+              AND start_time < NEW.start_time + interval '3 hours'
+              AND date_trunc('month', start_time) <> date_trunc('month', NEW.start_time)
+        ) THEN
+            RAISE EXCEPTION 'show % overlaps a show in the neighbouring month', NEW.id
+                USING ERRCODE = 'exclusion_violation';
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS shows_boundary_booking ON shows",
+    "CREATE TRIGGER shows_boundary_booking AFTER INSERT OR UPDATE OF venue_id, artist_id, start_time "
+    "ON shows FOR EACH ROW EXECUTE FUNCTION fyyur_check_boundary_booking()",
+]
+
+def install_postgres_bookings(connection):
+    for statement in POSTGRES_BOOKING_DDL:
+        connection.exec_driver_sql(statement)
@@ -0,0 +1,205 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session, make_response
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#
+# A backend stores pickled values with a TTL and keeps one never-evicted
+# generation counter per tag. Pages are keyed by the generations of the tags
+# they depend on, so invalidating a tag is a single counter bump and stale
+# entries simply age out.
+#----------------------------------------------------------------------------#
+
+class MemoryBackend:
+    '''In-process LRU with per-entry TTL.'''
+
+    # generations only see this process's invalidations
+    shared = False
+
+    def __init__(self, max_entries=512, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        # generations restart from 0 with the process; the epoch tells runs apart
+        self.epoch = uuid.uuid4().hex
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def generation(self, tag):
+        return self.generations.get(tag, 0)
+
+    def bump(self, tag):
+        with self.lock:
+            self.generations[tag] = self.generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+            self.epoch = uuid.uuid4().hex
+
+    def info(self):
+        return dict(self.stats, entries=len(self.entries), max_entries=self.max_entries)
+
+class RedisBackend:
+    '''
+    Shared backend over any client speaking redis-py's get/set/incr
+    (a real Redis, or a local stand-in in development). Eviction is up to
+    the server; use a volatile-* policy so generation keys, which never
+    expire, are kept.
+    '''
+
+    shared = True
+
+    def __init__(self, client, prefix='fyyur:', ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        # generations are shared and outlive the process
+        self.epoch = ''
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.ttl)
+
+    def generation(self, tag):
+        return int(self.client.get(self.prefix + 'generation:' + tag) or 0)
+
+    def bump(self, tag):
+        self.client.incr(self.prefix + 'generation:' + tag)
+
+    def clear(self):
+        for tag in ('venues', 'artists', 'shows'):
+            self.bump(tag)
+
+    def info(self):
+        return dict(self.stats, evictions=None)
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+class PageCache:
+    '''
+    Caches whole GET responses per route and query string.
+
+        @app.route('/venues')
+        @page_cache.cached('venues')
+        def venues(): ...
+
+        page_cache.invalidate('venues')  # after any venue write
+    '''
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['page_cache'] = self
+        ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        redis_url = app.config.get('PAGE_CACHE_REDIS_URL')
+        if redis_url:
+            # optional dependency, only needed when a shared cache is configured
+            import redis
+            self.backend = RedisBackend(redis.Redis.from_url(redis_url), ttl=ttl)
+        else:
+            self.backend = MemoryBackend(app.config.get('PAGE_CACHE_MAX_ENTRIES', 512), ttl)
+
+    def key(self, tags):
+        query = '&'.join('%s=%s' % item for item in sorted(request.args.items(multi=True)))
+        generations = ','.join('%s%d' % (tag, self.backend.generation(tag)) for tag in tags)
+        return 'page:%s?%s|%s' % (request.path, query, generations)
+
+    def etag(self, *tags):
+        '''
+        Entity tag of the current GET response, unchanged until one of `tags`
+        is invalidated. None unless the backend is shared: per-process
+        generations miss writes made by other workers and CLI commands, so
+        a tag built from them could stay valid for stale data indefinitely.
+        '''
+        if not self.backend.shared:
+            return None
+        key = '%s|%s' % (self.key(tags), self.backend.epoch)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def cached(self, *tags):
+        '''Decorates a view whose output only changes when `tags` are invalidated.'''
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # pages carrying flashed messages are per-user
+                if not current_app.config.get('PAGE_CACHE_ENABLED', True) \
+                        or request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                key = self.key(tags)
+                hit = self.backend.get(key)
+                if hit is not None:
+                    body, mimetype = hit
+                    return current_app.response_class(body, mimetype=mimetype)
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.backend.set(key, (response.get_data(), response.mimetype))
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.bump(tag)
+
+    def clear(self):
+        self.backend.clear()
+
+    def info(self):
+        return self.backend.info()
@@ -0,0 +1,90 @@
+#----------------------------------------------------------------------------#
+# City and state centroids.
+#
+# Bundled so venues can be placed on the map offline. Coordinates are
+# (latitude, longitude) in degrees. Cities are keyed by (city, state code);
+# a venue in a city not listed here falls back to its state's centre.
+#----------------------------------------------------------------------------#
+
+CITY_CENTROIDS = {
+    ('Albuquerque', 'NM'): (35.0844, -106.6504),
+    ('Anchorage', 'AK'): (61.2181, -149.9003),
+    ('Atlanta', 'GA'): (33.7490, -84.3880),
+    ('Austin', 'TX'): (30.2672, -97.7431),
+    ('Baltimore', 'MD'): (39.2904, -76.6122),
+    ('Boise', 'ID'): (43.6150, -116.2023),
+    ('Boston', 'MA'): (42.3601, -71.0589),
+    ('Brooklyn', 'NY'): (40.6782, -73.9442),
+    ('Buffalo', 'NY'): (42.8864, -78.8784),
+    ('Burlington', 'VT'): (44.4759, -73.2121),
+    ('Charlotte', 'NC'): (35.2271, -80.8431),
+    ('Chicago', 'IL'): (41.8781, -87.6298),
+    ('Cincinnati', 'OH'): (39.1031, -84.5120),
+    ('Cleveland', 'OH'): (41.4993, -81.6944),
+    ('Columbus', 'OH'): (39.9612, -82.9988),
+    ('Dallas', 'TX'): (32.7767, -96.7970),
+    ('Denver', 'CO'): (39.7392, -104.9903),
+    ('Detroit', 'MI'): (42.3314, -83.0458),
+    ('El Paso', 'TX'): (31.7619, -106.4850),
+    ('Fort Worth', 'TX'): (32.7555, -97.3308),
+    ('Fresno', 'CA'): (36.7378, -119.7871),
+    ('Honolulu', 'HI'): (21.3069, -157.8583),
+    ('Houston', 'TX'): (29.7604, -95.3698),
+    ('Indianapolis', 'IN'): (39.7684, -86.1581),
+    ('Jacksonville', 'FL'): (30.3322, -81.6557),
+    ('Kansas City', 'MO'): (39.0997, -94.5786),
+    ('Las Vegas', 'NV'): (36.1699, -115.1398),
+    ('Los Angeles', 'CA'): (34.0522, -118.2437),
+    ('Louisville', 'KY'): (38.2527, -85.7585),
+    ('Madison', 'WI'): (43.0731, -89.4012),
+    ('Memphis', 'TN'): (35.1495, -90.0490),
+    ('Miami', 'FL'): (25.7617, -80.1918),
+    ('Milwaukee', 'WI'): (43.0389, -87.9065),
+    ('Minneapolis', 'MN'): (44.9778, -93.2650),
+    ('Nashville', 'TN'): (36.1627, -86.7816),
+    ('New Orleans', 'LA'): (29.9511, -90.0715),
+    ('New York', 'NY'): (40.7128, -74.0060),
+    ('Oakland', 'CA'): (37.8044, -122.2712),
+    ('Oklahoma City', 'OK'): (35.4676, -97.5164),
+    ('Omaha', 'NE'): (41.2565, -95.9345),
+    ('Orlando', 'FL'): (28.5383, -81.3792),
+    ('Philadelphia', 'PA'): (39.9526, -75.1652),
+    ('Phoenix', 'AZ'): (33.4484, -112.0740),
+    ('Pittsburgh', 'PA'): (40.4406, -79.9959),
+    ('Portland', 'OR'): (45.5152, -122.6784),
+    ('Providence', 'RI'): (41.8240, -71.4128),
+    ('Raleigh', 'NC'): (35.7796, -78.6382),
+    ('Richmond', 'VA'): (37.5407, -77.4360),
+    ('Sacramento', 'CA'): (38.5816, -121.4944),
+    ('Salt Lake City', 'UT'): (40.7608, -111.8910),
+    ('San Antonio', 'TX'): (29.4241, -98.4936),
+    ('San Diego', 'CA'): (32.7157, -117.1611),
+    ('San Francisco', 'CA'): (37.7749, -122.4194),
+    ('San Jose', 'CA'): (37.3382, -121.8863),
+    ('Seattle', 'WA'): (47.6062, -122.3321),
+    ('St. Louis', 'MO'): (38.6270, -90.1994),
+    ('Tampa', 'FL'): (27.9506, -82.4572),
+    ('Tucson', 'AZ'): (32.2226, -110.9747),
+    ('Tulsa', 'OK'): (36.1540, -95.9928),
+    ('Washington', 'DC'): (38.9072, -77.0369),
+}
+
+STATE_CENTROIDS = {
+    'AK': (61.3707, -152.4044), 'AL': (32.8067, -86.7911), 'AR': (34.9697, -92.3731),
+    'AZ': (33.7298, -111.4312), 'CA': (36.1162, -119.6816), 'CO': (39.0598, -105.3111),
+    'CT': (41.5978, -72.7554), 'DC': (38.8974, -77.0268), 'DE': (39.3185, -75.5071),
+    'FL': (27.7663, -81.6868), 'GA': (33.0406, -83.6431), 'HI': (21.0943, -157.4983),
+    'IA': (42.0115, -93.2105), 'ID': (44.2405, -114.4788), 'IL': (40.3495, -88.9861),
+    'IN': (39.8494, -86.2583), 'KS': (38.5266, -96.7265), 'KY': (37.6681, -84.6701),
+    'LA': (31.1695, -91.8678), 'MA': (42.2302, -71.5301), 'MD': (39.0639, -76.8021),
+    'ME': (44.6939, -69.3819), 'MI': (43.3266, -84.5361), 'MN': (45.6945, -93.9002),
+    'MO': (38.4561, -92.2884), 'MS': (32.7416, -89.6787), 'MT': (46.9219, -110.4544),
+    'NC': (35.6301, -79.8064), 'ND': (47.5289, -99.7840), 'NE': (41.1254, -98.2681),
+    'NH': (43.4525, -71.5639), 'NJ': (40.2989, -74.5210), 'NM': (34.8405, -106.2485),
+    'NV': (38.3135, -117.0554), 'NY': (42.1657, -74.9481), 'OH': (40.3888, -82.7649),
+    'OK': (35.5653, -96.9289), 'OR': (44.5720, -122.0709), 'PA': (40.5908, -77.2098),
+    'RI': (41.6809, -71.5118), 'SC': (33.8569, -80.9450), 'SD': (44.2998, -99.4388),
+    'TN': (35.7478, -86.6923), 'TX': (31.0545, -97.5635), 'UT': (40.1500, -111.8624),
+    'VA': (37.7693, -78.1700), 'VT': (44.0459, -72.7107), 'WA': (47.4009, -121.4905),
+    'WI': (44.2685, -89.6165), 'WV': (38.4912, -80.9545), 'WY': (42.7560, -107.3025),
+}
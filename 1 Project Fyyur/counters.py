@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from sqlalchemy import and_, bindparam, func, select
+from models import Venue, Artist, Show, UpcomingShow
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#
+# Venue.num_upcoming_shows and Artist.num_upcoming_shows are maintained here
+# so listing pages can read a column instead of counting shows. Every helper
+# takes the caller's session and never commits, so the counter change lands
+# in the same transaction as the write that caused it.
+#----------------------------------------------------------------------------#
+
+# (model, foreign key on shows) for each denormalized counter
+COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+def other_side(model):
+    return next((other, other_key) for other, other_key in COUNTED if other is not model)
+
+def expected_upcoming(model, foreign_key, now):
+    # correlated subquery computing the true counter value from shows;
+    # shows of a deleted venue or artist stop counting for the other side
+    other, other_key = other_side(model)
+    return select(func.count(Show.id)) \
+        .where(foreign_key == model.id, Show.start_time > now,
+               other_key.in_(select(other.id).where(other.deleted_at.is_(None)))) \
+        .scalar_subquery()
+
+def count_new_show(session, show, now=None):
+    '''Counts a freshly added show against its venue and artist.'''
+    now = now or datetime.now()
+    if show.start_time <= now:
+        return
+
+    for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        session.query(model).filter(model.id == entity_id).update(
+            {model.num_upcoming_shows: model.num_upcoming_shows + 1},
+            synchronize_session=False)
+
+def add_upcoming(session, model, counts):
+    '''Adds {id: number of new upcoming shows} to `model` counters in one executemany.'''
+    if not counts:
+        return
+
+    table = model.__table__
+    session.execute(
+        table.update()
+             .where(table.c.id == bindparam('counted_id'))
+             .values(num_upcoming_shows=table.c.num_upcoming_shows + bindparam('added')),
+        [{'counted_id': id, 'added': added} for id, added in counts.items()])
+
+def hide_shows(session, foreign_key, entity_id, now=None):
+    '''
+    Takes the upcoming shows of a venue (foreign_key=Show.venue_id) or artist
+    (Show.artist_id) being deleted off the counters of the other side, so
+    listings stop counting them as soon as the row is hidden.
+    '''
+    now = now or datetime.now()
+    hidden = and_(foreign_key == entity_id, Show.start_time > now)
+
+    for model, other_key in COUNTED:
+        if other_key is foreign_key:
+            continue
+        lost = select(func.count(Show.id)) \
+            .where(hidden, other_key == model.id) \
+            .scalar_subquery()
+        session.query(model).filter(model.id.in_(select(other_key).where(hidden))).update(
+            {model.num_upcoming_shows: model.num_upcoming_shows - lost},
+            synchronize_session=False)
+
+def forget_shows(session, show_ids):
+    '''
+    Deletes the shows `show_ids` of a venue or artist being deleted, and their
+    upcoming shows calendar rows. hide_shows() already took them off the
+    counters when the row was hidden.
+    '''
+    session.query(UpcomingShow).filter(UpcomingShow.show_id.in_(show_ids)).delete(synchronize_session=False)
+    session.query(Show).filter(Show.id.in_(show_ids)).delete(synchronize_session=False)
+
+def roll_forward(session, window, now=None):
+    '''
+    Recounts every venue and artist with a show that started during the last
+    `window` (a timedelta), i.e. shows that just moved into the past. Recounts
+    are idempotent, so the window should overlap the job's schedule.
+    '''
+    now = now or datetime.now()
+    rolled = 0
+
+    for model, foreign_key in COUNTED:
+        passed = select(foreign_key).where(Show.start_time > now - window, Show.start_time <= now)
+        rolled += session.query(model).filter(model.id.in_(passed)).update(
+            {model.num_upcoming_shows: expected_upcoming(model, foreign_key, now)},
+            synchronize_session=False)
+
+    return rolled
+
+def stale_counters(session, now=None):
+    '''Returns (table, id, stored, expected) for every counter that drifted.'''
+    now = now or datetime.now()
+    stale = []
+
+    for model, foreign_key in COUNTED:
+        expected = expected_upcoming(model, foreign_key, now)
+        # a deleted row keeps its own counter until the row itself goes
+        rows = session.query(model.id, model.num_upcoming_shows, expected) \
+            .filter(model.num_upcoming_shows != expected, model.deleted_at.is_(None)) \
+            .order_by(model.id) \
+            .all()
+        stale.extend((model.__tablename__, id, stored, count) for id, stored, count in rows)
+
+    return stale
+
+def recount_all(session, now=None):
+    '''Backfills every counter from shows.'''
+    now = now or datetime.now()
+
+    for model, foreign_key in COUNTED:
+        session.query(model).update(
+            {model.num_upcoming_shows: expected_upcoming(model, foreign_key, now)},
+            synchronize_session=False)
@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import logging
+from datetime import datetime
+from sqlalchemy import func
+from models import Venue, Artist, Show, DeletionJob
+from counters import hide_shows, forget_shows
+from genres import LINKS as GENRE_LINKS
+from upcoming import forget_upcoming
+
+#----------------------------------------------------------------------------#
+# Background deletion.
+#
+# Deleting a venue or artist used to load and delete every one of its shows
+# inside the request. Now the request only stamps deleted_at, which hides
+# the row (and its shows) from every page, search and API response, takes
+# its upcoming shows off the other side's counters, drops its calendar rows
+# and queues a DeletionJob. A background worker then deletes the shows
+# DELETION_BATCH_SIZE at a time, one short transaction per batch, and
+# finally deletes the row itself. Jobs record their progress, so an
+# interrupted one is picked up again by `flask fyyur-run-deletions`.
+#----------------------------------------------------------------------------#
+
+BATCH_SIZE = 1000
+
+# job kind -> (model, foreign key on shows)
+KINDS = {
+    'venue': (Venue, Show.venue_id),
+    'artist': (Artist, Show.artist_id),
+}
+
+# jobs still to be worked: not started, interrupted, or failed and worth a retry
+PENDING = ('queued', 'running', 'failed')
+
+def start_deletion(session, kind, entity_id, now=None):
+    '''
+    Hides the `kind` row `entity_id` and queues the job that deletes it.
+    Returns the job, or None when there is no such row (or it is already
+    being deleted). Never commits.
+    '''
+    model, foreign_key = KINDS[kind]
+    row = session.get(model, entity_id)
+    if row is None or row.deleted_at is not None:
+        return None
+
+    # an ORM update, so the version and search index events see it
+    row.deleted_at = now or datetime.now()
+    forget_upcoming(session, foreign_key, row.id)
+    hide_shows(session, foreign_key, row.id, row.deleted_at)
+    job = DeletionJob(kind=kind, entity_id=row.id, name=row.name,
+                      shows_total=session.query(func.count(Show.id)).filter(foreign_key == row.id).scalar())
+    session.add(job)
+    session.flush()
+    return job
+
+def delete_batch(session, job, batch_size=BATCH_SIZE):
+    '''Deletes up to `batch_size` more shows of `job`; returns how many. Never commits.'''
+    foreign_key = KINDS[job.kind][1]
+    show_ids = [id for id, in session.query(Show.id)
+                                     .filter(foreign_key == job.entity_id)
+                                     .order_by(Show.id)
+                                     .limit(batch_size)]
+    if show_ids:
+        forget_shows(session, show_ids)
+        job.shows_deleted += len(show_ids)
+    return len(show_ids)
+
+def finish(session, job):
+    # Core deletes: the ORM would load the relationship it no longer has rows for
+    model = KINDS[job.kind][0]
+    table, column = GENRE_LINKS[model]
+    session.execute(table.delete().where(column == job.entity_id))
+    session.execute(model.__table__.delete().where(model.__table__.c.id == job.entity_id))
+    job.status = 'done'
+    job.finished_at = datetime.now()
+
+def run_job(session, job_id, batch_size=BATCH_SIZE, after_batch=None):
+    '''
+    Works `job_id` to completion, committing after every batch of shows and
+    calling `after_batch(job)` once each batch is committed. A job that
+    fails is marked failed with the error and is retried by the next run.
+    '''
+    job = session.get(DeletionJob, job_id)
+    if job is None or job.status == 'done':
+        return job
+    job.status = 'running'
+    job.error = None
+    session.commit()
+
+    try:
+        while delete_batch(session, job, batch_size):
+            session.commit()
+            if after_batch:
+                after_batch(job)
+        finish(session, job)
+        session.commit()
+    except Exception as error:
+        session.rollback()
+        logging.getLogger(__name__).exception('deletion job %d failed', job_id)
+        job = session.get(DeletionJob, job_id)
+        job.status = 'failed'
+        job.error = str(error)
+        session.commit()
+    if after_batch:
+        after_batch(job)
+    return job
+
+def pending_jobs(session):
+    '''Ids of the jobs left to run, oldest first.'''
+    return [id for id, in session.query(DeletionJob.id)
+                                 .filter(DeletionJob.status.in_(PENDING))
+                                 .order_by(DeletionJob.id)]
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'entity_id': job.entity_id,
+        'name': job.name,
+        'status': job.status,
+        'shows_total': job.shows_total,
+        'shows_deleted': job.shows_deleted,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,64 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from sqlalchemy.orm.exc import StaleDataError
+from models import Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Edits.
+#
+# An edit only touches the columns whose values actually changed, so the
+# unit of work flushes a single UPDATE of those columns, and an edit that
+# changes nothing writes nothing at all. Venues and artists carry a version
+# column (the mapper's version_id_col): the edit form posts the version it
+# was rendered from, and the UPDATE only matches that version, so of two
+# editors working from the same version the second one is told to reload
+# instead of silently overwriting the first.
+#----------------------------------------------------------------------------#
+
+# form fields an edit form writes back to its model, named as the columns
+EDITABLE = {
+    Venue: ['name', 'genres', 'address', 'city', 'state', 'phone', 'facebook_link', 'image_link',
+            'website_link', 'seeking_talent', 'seeking_description'],
+    Artist: ['name', 'genres', 'city', 'state', 'phone', 'facebook_link', 'image_link',
+             'website_link', 'seeking_venue', 'seeking_description'],
+}
+
+# a blank form field matches a column that was never filled in
+EMPTY = ('', None, [])
+
+class EditConflict(Exception):
+    '''The row was changed by someone else since the editor loaded it.'''
+
+def form_values(model, form):
+    return {name: getattr(form, name).data for name in EDITABLE[model]}
+
+def same(current, submitted):
+    return current == submitted or (current in EMPTY and submitted in EMPTY)
+
+def apply_edit(session, model, entity_id, values, version=None):
+    '''
+    Copies the `values` that differ onto the `model` row and flushes them as
+    one UPDATE of just those columns. Returns the changed names; an empty
+    list means nothing was sent to the database. Raises EditConflict when
+    the row is no longer at `version` (the one the editor saw; None skips
+    that check) or another writer updates it before the flush, and
+    LookupError when the row does not exist or is being deleted. Never
+    commits.
+    '''
+    row = session.get(model, entity_id)
+    if row is None or row.deleted_at is not None:
+        raise LookupError('%s %s does not exist' % (model.__name__, entity_id))
+    if version is not None and row.version != version:
+        raise EditConflict('%s %s is at version %d, not %d' % (model.__name__, entity_id, row.version, version))
+
+    changed = [name for name, value in values.items() if not same(getattr(row, name), value)]
+    for name in changed:
+        setattr(row, name, values[name])
+    if changed:
+        try:
+            session.flush()
+        except StaleDataError as error:
+            raise EditConflict('%s %s was updated concurrently' % (model.__name__, entity_id)) from error
+    return changed
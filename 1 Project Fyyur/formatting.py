@@ -0,0 +1,55 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+import dateutil.parser
+from babel import Locale
+from babel.dates import parse_pattern, format_datetime as babel_format_datetime
+
+#----------------------------------------------------------------------------#
+# Datetime formatting.
+#
+# Babel re-parses the pattern and the locale on every format_datetime() call,
+# which dominates rendering pages full of shows. Patterns are compiled once
+# per (format, locale) and formatted strings are kept in a bounded LRU.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+# babel's own locale dependent formats, not compiled here
+LOCALE_FORMATS = ('long', 'short')
+
+DEFAULT_LOCALE = 'en'
+DEFAULT_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format, locale):
+    # a handful of (format, locale) pairs exist, so this cache is unbounded
+    return parse_pattern(DATETIME_FORMATS.get(format, format)), Locale.parse(locale)
+
+def _format(value, format, locale):
+    if format in LOCALE_FORMATS:
+        return babel_format_datetime(value, format, locale=locale)
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(value, locale)
+
+_format_cached = lru_cache(maxsize=DEFAULT_CACHE_SIZE)(_format)
+
+def set_cache_size(size):
+    '''Resizes the formatted string LRU; 0 turns string caching off.'''
+    global _format_cached
+    _format_cached = lru_cache(maxsize=size)(_format) if size else _format
+
+def cache_info():
+    return _format_cached.cache_info() if hasattr(_format_cached, 'cache_info') else None
+
+def format_datetime(value, format='medium', locale=DEFAULT_LOCALE):
+    # native datetimes skip the string round trip; strings are still accepted
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(str(value))
+    return _format_cached(value, format, locale)
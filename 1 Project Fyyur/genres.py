@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from sqlalchemy import event, exists, false, select
+from sqlalchemy.orm import attributes
+from forms import VenueForm
+from models import Venue, Artist, Genre, venue_genres, artist_genres
+
+#----------------------------------------------------------------------------#
+# Genre dimension.
+#
+# The genres arrays on venues and artists stay the source the pages display;
+# the venue_genres/artist_genres link tables mirror them so ?genre= filters
+# are an index lookup instead of a scan over every row's array. ORM writes
+# keep the links in step through mapper events, and bulk loads that insert
+# through Core call link_unlinked() afterwards.
+#----------------------------------------------------------------------------#
+
+GENRES = [value for value, label in VenueForm.genres.kwargs['choices']]
+
+# model -> (link table, its column pointing back at the model)
+LINKS = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+LINK_CHUNK_SIZE = 5000
+
+def genre_ids(connection, names):
+    '''Returns name -> id for `names`, adding the ones the genres table lacks.'''
+    names = set(names)
+    if not names:
+        return {}
+    table = Genre.__table__
+    found = dict(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+    missing = names - found.keys()
+    if missing:
+        connection.execute(table.insert(), [{'name': name} for name in sorted(missing)])
+        found.update(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(missing))).all())
+    return found
+
+def link_genres(connection, model, rows):
+    '''Replaces the genre links of `rows`, (id, genres) pairs, with their arrays.'''
+    table, column = LINKS[model]
+    rows = [(id, set(genres or [])) for id, genres in rows]
+    if not rows:
+        return
+    ids = genre_ids(connection, set().union(*(genres for id, genres in rows)))
+
+    connection.execute(table.delete().where(column.in_([id for id, genres in rows])))
+    links = [{column.key: id, 'genre_id': ids[name]} for id, genres in rows for name in genres]
+    if links:
+        connection.execute(table.insert(), links)
+
+def link_unlinked(session, model, chunk=LINK_CHUNK_SIZE):
+    '''Links every `model` row that has genres but no links yet; returns how many.'''
+    table, column = LINKS[model]
+    ids = [id for id, in session.query(model.id)
+                                .filter(model.genres.isnot(None), ~exists().where(column == model.id))]
+    connection = session.connection()
+    for start in range(0, len(ids), chunk):
+        rows = session.query(model.id, model.genres).filter(model.id.in_(ids[start:start + chunk])).all()
+        link_genres(connection, model, rows)
+    return len(ids)
+
+def with_genre(query, model, genre):
+    '''Restricts a `model` listing query to rows tagged with `genre`.'''
+    table, column = LINKS[model]
+    # resolved up front: an unknown genre never reaches the listing, and a
+    # literal id lets the planner use the per-genre statistics of the links
+    genre_id = query.session.query(Genre.id).filter(Genre.name == genre).scalar()
+    if genre_id is None:
+        return query.filter(false())
+    return query.filter(exists().where(column == model.id, table.c.genre_id == genre_id))
+
+def _relink(mapper, connection, target):
+    if attributes.get_history(target, 'genres').has_changes():
+        link_genres(connection, type(target), [(target.id, target.genres)])
+
+def _seed_genres(target, connection, **kw):
+    # same starting set as the migration
+    connection.execute(target.insert(), [{'name': name} for name in GENRES])
+
+for _model in LINKS:
+    event.listen(_model, 'after_insert', _relink)
+    event.listen(_model, 'after_update', _relink)
+event.listen(Genre.__table__, 'after_create', _seed_genres)
@@ -0,0 +1,148 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import math
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.orm import attributes
+from werkzeug.exceptions import BadRequest
+from models import Venue, VenuePoint
+from centroids import CITY_CENTROIDS, STATE_CENTROIDS
+
+#----------------------------------------------------------------------------#
+# Geocoding.
+#
+# Venues are placed at the centroid of their city, or of their state when
+# the city is not in the bundled table, so no geocoding service is called.
+# ORM writes are placed by mapper events; bulk loads that insert through
+# Core call geocode_missing() afterwards. Every distinct location is also
+# kept in venue_points, the index the nearby search starts from.
+#----------------------------------------------------------------------------#
+
+_CITIES = {(city.lower(), state): point for (city, state), point in CITY_CENTROIDS.items()}
+
+def geocode(city, state):
+    '''(latitude, longitude) of a city, of its state when the city is unknown, or None.'''
+    state = (state or '').strip().upper()
+    return _CITIES.get(((city or '').strip().lower(), state)) or STATE_CENTROIDS.get(state)
+
+def remember_points(connection, points):
+    '''Adds the (latitude, longitude) `points` venue_points lacks.'''
+    points = set(points)
+    if not points:
+        return
+    table = VenuePoint.__table__
+    latitudes = sorted({lat for lat, lon in points})
+    known = {tuple(row) for row in connection.execute(
+        select(table.c.latitude, table.c.longitude).where(table.c.latitude.in_(latitudes)))}
+    missing = points - known
+    if missing:
+        connection.execute(table.insert(), [{'latitude': lat, 'longitude': lon} for lat, lon in sorted(missing)])
+
+def geocode_missing(session):
+    '''Places every venue without coordinates in a known city or state; returns how many.'''
+    table = Venue.__table__
+    places = session.query(Venue.city, Venue.state).filter(Venue.latitude.is_(None)).distinct().all()
+    connection = session.connection()
+    placed, points = 0, set()
+    # one UPDATE per place, however many venues it has
+    for city, state in places:
+        point = geocode(city, state)
+        if point is None:
+            continue
+        placed += connection.execute(
+            table.update()
+                 .where(table.c.city == city, table.c.state == state, table.c.latitude.is_(None))
+                 .values(latitude=point[0], longitude=point[1])).rowcount
+        points.add(point)
+    remember_points(connection, points)
+    return placed
+
+def _place(mapper, connection, target):
+    moved = any(attributes.get_history(target, name).has_changes() for name in ('city', 'state'))
+    if moved or target.latitude is None:
+        latitude, longitude = geocode(target.city, target.state) or (None, None)
+        if (latitude, longitude) != (target.latitude, target.longitude):
+            target.latitude, target.longitude = latitude, longitude
+
+def _remember(mapper, connection, target):
+    if target.latitude is not None and attributes.get_history(target, 'latitude').has_changes():
+        remember_points(connection, [(target.latitude, target.longitude)])
+
+event.listen(Venue, 'before_insert', _place)
+event.listen(Venue, 'before_update', _place)
+event.listen(Venue, 'after_insert', _remember)
+event.listen(Venue, 'after_update', _remember)
+
+#----------------------------------------------------------------------------#
+# Nearby search.
+#----------------------------------------------------------------------------#
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 500
+NEARBY_LIMIT = 10
+MAX_NEARBY_LIMIT = 50
+
+NEARBY_COLUMNS = (Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude,
+                  Venue.num_upcoming_shows)
+
+def distance_km(lat1, lon1, lat2, lon2):
+    '''Great-circle (haversine) distance between two points in degrees.'''
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 \
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(latitude, longitude, radius_km):
+    '''Criteria on VenuePoint matching every point within `radius_km` of the given one.'''
+    spread = radius_km / EARTH_RADIUS_KM
+    criteria = [VenuePoint.latitude.between(latitude - math.degrees(spread), latitude + math.degrees(spread))]
+    # widest longitude span of the circle; unbounded when it reaches a pole
+    ratio = math.sin(spread) / max(math.cos(math.radians(latitude)), 1e-12)
+    if ratio < 1:
+        width = math.degrees(math.asin(ratio))
+        west, east = longitude - width, longitude + width
+        if west < -180:
+            criteria.append(or_(VenuePoint.longitude >= west + 360, VenuePoint.longitude <= east))
+        elif east > 180:
+            criteria.append(or_(VenuePoint.longitude >= west, VenuePoint.longitude <= east - 360))
+        else:
+            criteria.append(VenuePoint.longitude.between(west, east))
+    return and_(*criteria)
+
+def nearby(session, latitude, longitude, radius_km=DEFAULT_RADIUS_KM, limit=NEARBY_LIMIT):
+    '''
+    Up to `limit` venues within `radius_km` of a point as (distance in km,
+    row) pairs, nearest first, then by id. Finds the venue points in the
+    bounding box, then reads the venues at each point, nearest point first,
+    off the (latitude, longitude, id) index until `limit` are found: one
+    query for the points and one per point visited, however many venues
+    there are.
+    '''
+    points = session.query(VenuePoint.latitude, VenuePoint.longitude) \
+        .filter(bounding_box(latitude, longitude, radius_km)).all()
+    ranked = sorted((distance_km(latitude, longitude, lat, lon), lat, lon) for lat, lon in points)
+
+    found = []
+    for distance, lat, lon in ranked:
+        if distance > radius_km or len(found) >= limit:
+            break
+        rows = session.query(*NEARBY_COLUMNS) \
+            .filter(Venue.latitude == lat, Venue.longitude == lon, Venue.deleted_at.is_(None)) \
+            .order_by(Venue.id) \
+            .limit(limit - len(found)).all()
+        found.extend((distance, row) for row in rows)
+    return found
+
+def nearby_args(args):
+    '''(latitude, longitude, radius km, limit) from ?lat=&lon=&radius=&limit=; BadRequest when invalid.'''
+    latitude = args.get('lat', type=float)
+    longitude = args.get('lon', type=float)
+    radius = args.get('radius', DEFAULT_RADIUS_KM, type=float)
+    limit = args.get('limit', NEARBY_LIMIT, type=int)
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise BadRequest('lat and lon must be a point in degrees')
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise BadRequest('radius must be between 0 and %d km' % MAX_RADIUS_KM)
+    return latitude, longitude, radius, min(max(limit, 1), MAX_NEARBY_LIMIT)
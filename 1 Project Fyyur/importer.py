@@ -0,0 +1,208 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from models import Venue, Artist, Show
+from counters import add_upcoming
+from genres import LINKS as GENRE_LINKS, link_unlinked
+from upcoming import refresh_upcoming
+from geo import geocode_missing
+from bookings import booked_around
+from search import drop_indexes
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Streams CSV or JSONL rows, validates each one with the same WTForms form
+# the create pages use, and inserts the survivors with one executemany per
+# batch, committing once per batch. Rows that fail are written with their
+# errors to a JSONL rejection file instead of aborting the run.
+#----------------------------------------------------------------------------#
+
+BATCH_SIZE = 1000
+
+# kind -> (model, form, columns copied from form.data)
+KINDS = {
+    'venues': (Venue, VenueForm, ['name', 'city', 'state', 'address', 'phone', 'image_link', 'genres',
+                                  'facebook_link', 'website_link', 'seeking_talent', 'seeking_description']),
+    'artists': (Artist, ArtistForm, ['name', 'city', 'state', 'phone', 'image_link', 'genres',
+                                     'facebook_link', 'website_link', 'seeking_venue', 'seeking_description']),
+    'shows': (Show, ShowForm, ['start_time']),
+}
+
+def read_rows(path):
+    '''Yields (line number, dict) from a .csv file or a JSON-lines file.'''
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.csv'):
+            for number, row in enumerate(csv.DictReader(source), start=2):
+                yield number, row
+        else:
+            for number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                # anything but an object is rejected by the caller
+                yield number, row if isinstance(row, dict) else {'_raw': line.rstrip('\n')}
+
+def as_formdata(row, fields):
+    # genres arrive as a JSON list or a "Jazz;Blues" cell; forms want repeated keys
+    formdata = MultiDict()
+    # absent fields are posted empty so they fail validation instead of
+    # silently taking the form's defaults
+    for field in fields:
+        if field not in row:
+            formdata.add(field, '')
+    for key, value in row.items():
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(';') if genre.strip()]
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, item)
+        elif value is not None:
+            formdata.add(key, str(value))
+    return formdata
+
+class Lookup:
+    '''
+    In-memory id sets and name -> id maps for venues and artists, loaded once
+    per import so show rows resolve their foreign keys without a query each.
+    '''
+
+    def __init__(self, session):
+        self.ids = {}
+        self.names = {}
+        for kind, model in (('venue', Venue), ('artist', Artist)):
+            self.ids[kind] = set()
+            self.names[kind] = {}
+            for id, name in session.query(model.id, model.name).filter(model.deleted_at.is_(None)):
+                self.ids[kind].add(id)
+                # None marks a name shared by several rows
+                self.names[kind][name] = None if name in self.names[kind] else id
+
+    def resolve(self, kind, row):
+        '''Returns (id, error) for the venue/artist a show row points at.'''
+        raw_id = row.get(kind + '_id')
+        if raw_id not in (None, ''):
+            try:
+                id = int(raw_id)
+            except ValueError:
+                return None, 'invalid %s_id' % kind
+            return (id, None) if id in self.ids[kind] else (None, 'unknown %s_id %s' % (kind, id))
+
+        name = row.get(kind + '_name')
+        if name not in self.names[kind]:
+            return None, 'unknown %s %r' % (kind, name)
+        if self.names[kind][name] is None:
+            return None, 'ambiguous %s name %r' % (kind, name)
+        return self.names[kind][name], None
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    def __str__(self):
+        elapsed = time.perf_counter() - self.started
+        return '%s: %d read, %d imported, %d rejected (%.0f rows/s)' % (
+            self.kind, self.read, self.imported, self.rejected, self.read / elapsed if elapsed else 0)
+
+def import_file(session, kind, path, rejects, batch_size=BATCH_SIZE, progress=None, now=None):
+    '''
+    Imports every valid row of `path` as `kind` ('venues', 'artists' or
+    'shows'). Rejected rows go to the open `rejects` file. `progress` is
+    called with the ImportReport after every batch.
+    '''
+    model, form_class, columns = KINDS[kind]
+    lookup = Lookup(session) if kind == 'shows' else None
+    now = now or datetime.now()
+    report = ImportReport(kind)
+    batch = []
+    # (line number, source row) of each batch entry, for late rejections
+    sources = []
+
+    def reject(number, row, errors):
+        report.rejected += 1
+        rejects.write(json.dumps({'line': number, 'row': row, 'errors': errors}, default=str) + '\n')
+
+    def flush():
+        if kind == 'shows':
+            # double bookings are checked per batch, against the database and each other
+            availability = booked_around(session, batch)
+            kept = []
+            for (number, row), values in zip(sources, batch):
+                slots = (('venue', values['venue_id']), ('artist', values['artist_id']))
+                if not all(availability.is_free(slot, values['start_time']) for slot in slots):
+                    reject(number, row, {'start_time': ['overlaps another show at this venue or by this artist']})
+                    continue
+                for slot in slots:
+                    availability.book(slot, values['start_time'])
+                kept.append(values)
+            batch[:] = kept
+        sources.clear()
+        if not batch:
+            return
+        session.execute(model.__table__.insert(), batch)
+        if kind == 'shows':
+            # keep the denormalized upcoming show counters in the same transaction
+            upcoming = [row for row in batch if row['start_time'] > now]
+            add_upcoming(session, Venue, Counter(row['venue_id'] for row in upcoming))
+            add_upcoming(session, Artist, Counter(row['artist_id'] for row in upcoming))
+        session.commit()
+        if kind != 'shows':
+            # core inserts skip the ORM events that drop the search index
+            drop_indexes()
+        report.imported += len(batch)
+        batch.clear()
+        if progress:
+            progress(report)
+
+    for number, row in read_rows(path):
+        report.read += 1
+        if '_raw' in row:
+            reject(number, row, {'_row': ['not a JSON object']})
+            continue
+
+        form = form_class(formdata=as_formdata(row, columns), meta={'csrf': False})
+        errors = {} if form.validate() else dict(form.errors)
+
+        values = {column: form.data[column] for column in columns}
+        if kind == 'shows':
+            for side in ('venue', 'artist'):
+                values[side + '_id'], error = lookup.resolve(side, row)
+                if error:
+                    errors.setdefault(side + '_id', []).append(error)
+
+        if errors:
+            reject(number, row, errors)
+            continue
+
+        batch.append(values)
+        sources.append((number, row))
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    if model in GENRE_LINKS:
+        # core inserts skip the ORM events that maintain the genre links
+        link_unlinked(session, model)
+        session.commit()
+    if model is Venue:
+        geocode_missing(session)
+        session.commit()
+    if kind == 'shows' and report.imported:
+        refresh_upcoming(session, now)
+        session.commit()
+    return report
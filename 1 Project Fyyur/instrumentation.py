@@ -0,0 +1,241 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Query counting.
+#----------------------------------------------------------------------------#
+
+class QueryCounter:
+    '''
+    Counts the SQL statements the current thread sends to any engine while
+    the block is active.
+
+        with QueryCounter() as counter:
+            client.get('/venues')
+        print(counter.count, counter.statements)
+
+    `parameters` holds the DBAPI parameters of each statement, in order.
+    Statements run by worker threads on behalf of this thread (see
+    RequestScope) are counted too.
+    '''
+
+    def __init__(self):
+        self.statements = []
+        self.parameters = []
+        self.thread_id = threading.get_ident()
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        scope = conn.get_execution_options().get('request_scope')
+        if (scope.thread_id if scope else threading.get_ident()) == self.thread_id:
+            self.statements.append(statement)
+            self.parameters.append(parameters)
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+def query_budget(limit):
+    '''
+    Decorates a view that must not issue more than `limit` statements.
+    Going over budget fails the request under TESTING and is logged as a
+    warning otherwise.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with QueryCounter() as counter:
+                response = view(*args, **kwargs)
+
+            if counter.count > limit:
+                message = '%s issued %d queries (budget %d)' % (view.__name__, counter.count, limit)
+                if current_app.testing:
+                    raise AssertionError(message)
+                current_app.logger.warning(message)
+
+            return response
+        return wrapper
+    return decorator
+
+#----------------------------------------------------------------------------#
+# Request profiling.
+#
+# Every request gets its own tally of statements, database time and rows
+# returned (as reported by the driver's rowcount, which psycopg2 sets for
+# SELECTs and SQLite does not). Slow statements are logged with their
+# parameters and route, and a statement shape repeated more than
+# QUERY_REPEAT_THRESHOLD times in one request is logged as a likely N+1.
+#----------------------------------------------------------------------------#
+
+# collapse literals and expanded IN lists so repeats of one query compare equal
+_SHAPE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|\?|\b\d+\b'), '?'),
+    (re.compile(r'\?(?:\s*,\s*\?)+'), '?'),
+    (re.compile(r'\s+'), ' '),
+]
+
+def statement_shape(statement):
+    for pattern, replacement in _SHAPE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+class RequestStats:
+    def __init__(self):
+        # fanned-out statements report from several threads at once
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.shapes = Counter()
+
+class RequestScope:
+    '''
+    What a worker thread needs to attribute its statements to the request
+    that started it. Pass it as the `request_scope` execution option:
+
+        scope = RequestScope.current()
+        connection.execution_options(request_scope=scope).execute(...)
+    '''
+
+    def __init__(self, thread_id, stats, app, route):
+        self.thread_id = thread_id
+        self.stats = stats
+        self.app = app
+        self.route = route
+
+    @classmethod
+    def current(cls):
+        if not has_request_context():
+            return cls(threading.get_ident(), None, None, None)
+        return cls(threading.get_ident(), g.get('query_stats'), current_app._get_current_object(),
+                   request.endpoint or request.path)
+
+class RequestProfiler:
+    '''
+    Counts queries, database time and rows per request.
+
+        profiler = RequestProfiler(app)
+        profiler.info()  # per-endpoint aggregates and recent slow queries
+
+    Adds X-Query-Count, X-Query-Time-Ms and X-Query-Rows response headers
+    when QUERY_STATS_HEADERS is set.
+    '''
+
+    def __init__(self, app=None, recent=50):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.slow = deque(maxlen=recent)
+        self.repeats = deque(maxlen=recent)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['request_profiler'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+    def _start(self):
+        g.query_stats = RequestStats()
+
+    def _finish(self, response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        config = current_app.config
+        route = request.endpoint or request.path
+
+        threshold = config.get('QUERY_REPEAT_THRESHOLD', 5)
+        repeated = [(shape, count) for shape, count in stats.shapes.items() if count > threshold]
+        for shape, count in repeated:
+            current_app.logger.warning('possible N+1 in %s: %d x %s', route, count, shape)
+
+        with self.lock:
+            endpoint = self.endpoints.setdefault(route, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'rows': 0, 'repeats': 0})
+            endpoint['requests'] += 1
+            endpoint['queries'] += stats.queries
+            endpoint['max_queries'] = max(endpoint['max_queries'], stats.queries)
+            endpoint['db_ms'] += stats.seconds * 1000
+            endpoint['rows'] += stats.rows
+            endpoint['repeats'] += len(repeated)
+            self.repeats.extend({'route': route, 'count': count, 'statement': shape} for shape, count in repeated)
+
+        if config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-Query-Count'] = str(stats.queries)
+            response.headers['X-Query-Time-Ms'] = '%.2f' % (stats.seconds * 1000)
+            response.headers['X-Query-Rows'] = str(stats.rows)
+        return response
+
+    def record_slow(self, route, statement, parameters, seconds):
+        with self.lock:
+            self.slow.append({'route': route, 'ms': round(seconds * 1000, 2),
+                              'statement': statement, 'parameters': repr(parameters)})
+
+    def info(self):
+        with self.lock:
+            endpoints = {route: dict(stats,
+                                     db_ms=round(stats['db_ms'], 2),
+                                     mean_queries=round(stats['queries'] / stats['requests'], 2))
+                         for route, stats in self.endpoints.items()}
+            return {'endpoints': endpoints, 'slow': list(self.slow), 'repeats': list(self.repeats)}
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+            self.slow.clear()
+            self.repeats.clear()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    scope = conn.get_execution_options().get('request_scope')
+    if scope is None:
+        scope = RequestScope.current()
+    stats = scope.stats
+    if stats is None:
+        return
+
+    with stats.lock:
+        stats.queries += 1
+        stats.seconds += elapsed
+        if cursor.rowcount > 0 and cursor.description is not None:
+            stats.rows += cursor.rowcount
+        if not executemany:
+            stats.shapes[statement_shape(statement)] += 1
+
+    threshold = scope.app.config.get('SLOW_QUERY_MS')
+    if threshold is not None and elapsed * 1000 >= threshold:
+        scope.app.logger.warning('slow query in %s (%.1fms): %s %r', scope.route, elapsed * 1000, statement, parameters)
+        profiler = scope.app.extensions.get('request_profiler')
+        if profiler is not None:
+            profiler.record_slow(scope.route, statement, parameters, elapsed)
@@ -0,0 +1,273 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import math
+import platform
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from werkzeug.datastructures import MultiDict
+
+from app import app
+from models import db
+from instrumentation import QueryCounter
+from synthetic import Generator, CITIES
+from geo import geocode
+from benchmarks import scratch_database
+
+#----------------------------------------------------------------------------#
+# Requests.
+#
+# One builder per endpoint in app.py. Each returns (method, path, form data)
+# for a random but seeded target, so two runs over the same catalog send the
+# same requests. Endpoints without a builder are listed as skipped in the
+# report, which is how a new route shows up here.
+#----------------------------------------------------------------------------#
+
+SEARCH_TERMS = ['blue', 'hall', 'new york', 'jazz', 'band 1', 'nothing like this']
+
+def listing(path):
+  return lambda target: ('GET', path, None)
+
+def search_get(path):
+  return lambda target: ('GET', '%s?search_term=%s' % (path, target.pick(SEARCH_TERMS).replace(' ', '+')), None)
+
+def search_post(path):
+  return lambda target: ('POST', path, {'search_term': target.pick(SEARCH_TERMS)})
+
+def venue_form(row):
+  return MultiDict([('name', row['name']), ('city', row['city']), ('state', row['state']),
+                    ('address', row['address']), ('phone', row['phone']), ('image_link', ''),
+                    ('facebook_link', row['facebook_link']), ('website_link', row['website_link']),
+                    # the create view reads seeking_venue for venues too
+                    ('seeking_talent', 'y'), ('seeking_venue', 'y'), ('seeking_description', '')]
+                   + [('genres', genre) for genre in row['genres']])
+
+def artist_form(row):
+  return MultiDict([('name', row['name']), ('city', row['city']), ('state', row['state']),
+                    ('phone', ''), ('image_link', ''), ('facebook_link', row['facebook_link']),
+                    ('website_link', ''), ('seeking_venue', 'y'), ('seeking_description', '')]
+                   + [('genres', genre) for genre in row['genres']])
+
+class Target:
+  '''Seeded choices of ids and rows for the request builders.'''
+
+  def __init__(self, venue_ids, artist_ids, seed=0):
+    self.random = random.Random(seed)
+    self.generator = Generator(seed=seed)
+    self.venue_ids = venue_ids
+    self.artist_ids = artist_ids
+    self.created = 0
+
+  def pick(self, items):
+    return self.random.choice(items)
+
+  def venue(self):
+    return self.pick(self.venue_ids)
+
+  def artist(self):
+    return self.pick(self.artist_ids)
+
+  def point(self):
+    # somewhere the synthetic catalog places venues
+    return geocode(*self.pick(CITIES))
+
+  def new_row(self, make):
+    self.created += 1
+    return make(1000000 + self.created)
+
+BUILDERS = {
+  'index': listing('/'),
+  'venues': listing('/venues'),
+  'artists': listing('/artists'),
+  'shows': listing('/shows'),
+  'search_venues': search_get('/venues/search'),
+  'search_artists': search_get('/artists/search'),
+  'nearby_venues': lambda t: ('GET', '/venues/nearby?lat=%s&lon=%s' % t.point(), None),
+  'show_venue': lambda t: ('GET', '/venues/%d' % t.venue(), None),
+  'show_artist': lambda t: ('GET', '/artists/%d' % t.artist(), None),
+  'create_venue_form': listing('/venues/create'),
+  'create_artist_form': listing('/artists/create'),
+  'create_shows': listing('/shows/create'),
+  'edit_venue': lambda t: ('GET', '/venues/%d/edit' % t.venue(), None),
+  'edit_artist': lambda t: ('GET', '/artists/%d/edit' % t.artist(), None),
+  'create_venue_submission': lambda t: ('POST', '/venues/create', venue_form(t.new_row(t.generator.venue))),
+  'create_artist_submission': lambda t: ('POST', '/artists/create', artist_form(t.new_row(t.generator.artist))),
+  'edit_venue_submission': lambda t: ('POST', '/venues/%d/edit' % t.venue(), venue_form(t.new_row(t.generator.venue))),
+  'edit_artist_submission': lambda t: ('POST', '/artists/%d/edit' % t.artist(), artist_form(t.new_row(t.generator.artist))),
+  'api.venues': listing('/api/v1/venues'),
+  'api.artists': listing('/api/v1/artists'),
+  'api.shows': listing('/api/v1/shows'),
+  'api.nearby_venues': lambda t: ('GET', '/api/v1/venues/nearby?lat=%s&lon=%s' % t.point(), None),
+  'api.venue': lambda t: ('GET', '/api/v1/venues/%d' % t.venue(), None),
+  'api.artist': lambda t: ('GET', '/api/v1/artists/%d' % t.artist(), None),
+  'create_show_submission': lambda t: ('POST', '/shows/create', {
+    'venue_id': t.venue(), 'artist_id': t.artist(),
+    'start_time': (datetime.now() + timedelta(days=t.random.randint(-30, 90))).strftime('%Y-%m-%d %H:%M:%S')}),
+}
+
+# POST-only twins of GET routes share an endpoint name with different methods
+POST_BUILDERS = {
+  'search_venues': search_post('/venues/search'),
+  'search_artists': search_post('/artists/search'),
+}
+
+# deletes would shrink the id pools the other builders draw from
+NOT_DRIVEN = {'static', 'delete_venue', 'delete_artist', 'cache_stats', 'pool_stats', 'query_stats'}
+
+def routes():
+  '''Returns ([(label, builder)], [skipped labels]) for every rule in app.url_map.'''
+  driven, skipped = [], []
+  for rule in sorted(app.url_map.iter_rules(), key=lambda rule: (rule.rule, sorted(rule.methods))):
+    for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+      label = '%s %s' % (method, rule.rule)
+      if method == 'POST' and 'GET' in rule.methods:
+        builder = POST_BUILDERS.get(rule.endpoint)
+      else:
+        builder = BUILDERS.get(rule.endpoint)
+      if rule.endpoint in NOT_DRIVEN or builder is None:
+        skipped.append(label)
+      else:
+        driven.append((label, builder))
+  return driven, skipped
+
+#----------------------------------------------------------------------------#
+# Measurement.
+#----------------------------------------------------------------------------#
+
+def percentile(values, fraction):
+  # nearest-rank percentile of an already sorted list
+  if not values:
+    return None
+  rank = max(math.ceil(fraction * len(values)) - 1, 0)
+  return values[min(rank, len(values) - 1)]
+
+def peak_rss_kb():
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # bytes on macOS, kilobytes elsewhere
+  return peak // 1024 if sys.platform == 'darwin' else peak
+
+def drive(builder, target, requests):
+  client = app.test_client()
+  timings, queries, errors = [], [], 0
+  for i in range(requests + 1):
+    method, path, data = builder(target)
+    # the first request warms templates and statement caches and is not kept
+    with QueryCounter() as counter:
+      started = time.perf_counter()
+      response = client.open(path, method=method, data=data)
+      # streamed bodies only run their queries as they are read
+      response.get_data()
+      elapsed = time.perf_counter() - started
+    db.session.remove()
+    if i == 0:
+      continue
+    timings.append(elapsed * 1000)
+    queries.append(counter.count)
+    if response.status_code >= 400:
+      errors += 1
+
+  timings.sort()
+  return {
+    'requests': requests,
+    'errors': errors,
+    'p50_ms': round(percentile(timings, 0.50), 3),
+    'p95_ms': round(percentile(timings, 0.95), 3),
+    'p99_ms': round(percentile(timings, 0.99), 3),
+    'mean_ms': round(sum(timings) / len(timings), 3),
+    'queries_per_request': round(sum(queries) / len(queries), 2),
+    'max_queries': max(queries),
+    'peak_rss_kb': peak_rss_kb(),
+  }
+
+def run(venues=1000, artists=1000, shows=20000, requests=50, seed=0, page_cache=False, only=None):
+  '''Seeds a scratch database, drives every route and returns the report dict.'''
+  with scratch_database():
+    app.config['PAGE_CACHE_ENABLED'] = page_cache
+    # a failing view counts as an error response instead of ending the run
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    venue_ids, artist_ids = Generator(seed=seed).populate(db.session, venues, artists, shows)
+    target = Target(venue_ids, artist_ids, seed)
+    driven, skipped = routes()
+    report = {
+      'meta': {
+        'venues': venues, 'artists': artists, 'shows': shows, 'seed': seed,
+        'requests_per_route': requests, 'page_cache': page_cache,
+        'database': db.engine.dialect.name, 'python': platform.python_version(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+      },
+      'routes': {},
+      'skipped': skipped,
+    }
+    for label, builder in driven:
+      if only and not any(pattern in label for pattern in only):
+        continue
+      report['routes'][label] = drive(builder, target, requests)
+    report['peak_rss_kb'] = peak_rss_kb()
+  return report
+
+def compare(baseline, current, tolerance=0.25, floor_ms=1.0):
+  '''
+  Returns the regressions of `current` against `baseline`: p95 latency more
+  than `tolerance` (and `floor_ms`) slower, or more queries per request.
+  '''
+  regressions = []
+  for label, now in sorted(current['routes'].items()):
+    before = baseline['routes'].get(label)
+    if before is None:
+      continue
+    if now['p95_ms'] > before['p95_ms'] * (1 + tolerance) and now['p95_ms'] - before['p95_ms'] > floor_ms:
+      regressions.append('%s: p95 %.1fms -> %.1fms' % (label, before['p95_ms'], now['p95_ms']))
+    if now['queries_per_request'] > before['queries_per_request']:
+      regressions.append('%s: %.2f -> %.2f queries per request'
+                         % (label, before['queries_per_request'], now['queries_per_request']))
+  if current['peak_rss_kb'] > baseline['peak_rss_kb'] * (1 + tolerance):
+    regressions.append('peak RSS %dkB -> %dkB' % (baseline['peak_rss_kb'], current['peak_rss_kb']))
+  return regressions
+
+def print_report(report):
+  print('%-42s %8s %8s %8s %8s %6s' % ('route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'errors'))
+  for label, route in sorted(report['routes'].items()):
+    print('%-42s %8.2f %8.2f %8.2f %8.2f %6d' % (label, route['p50_ms'], route['p95_ms'], route['p99_ms'],
+                                                 route['queries_per_request'], route['errors']))
+  print('peak RSS %d kB' % report['peak_rss_kb'])
+  if report['skipped']:
+    print('not driven: %s' % ', '.join(report['skipped']))
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+# usage: python loadtest.py [--venues N] [--save baseline.json] [--compare baseline.json]
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Drive every Fyyur route against a synthetic catalog.')
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=1000)
+  parser.add_argument('--shows', type=int, default=20000)
+  parser.add_argument('--requests', type=int, default=50, help='measured requests per route')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--page-cache', action='store_true', help='leave the page cache on')
+  parser.add_argument('--only', action='append', help='only routes whose label contains this')
+  parser.add_argument('--save', metavar='PATH', help='write the report as a JSON baseline')
+  parser.add_argument('--compare', metavar='PATH', help='fail on regressions against a saved baseline')
+  parser.add_argument('--tolerance', type=float, default=0.25)
+  args = parser.parse_args()
+
+  report = run(args.venues, args.artists, args.shows, args.requests, args.seed, args.page_cache, args.only)
+  print_report(report)
+
+  if args.save:
+    with open(args.save, 'w') as baseline:
+      json.dump(report, baseline, indent=2, sort_keys=True)
+  if args.compare:
+    with open(args.compare) as baseline:
+      regressions = compare(json.load(baseline), report, args.tolerance)
+    for regression in regressions:
+      print('REGRESSION %s' % regression)
+    if regressions:
+      sys.exit(1)
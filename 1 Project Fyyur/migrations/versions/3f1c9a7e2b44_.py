@@ -0,0 +1,40 @@
+"""upcoming show counters on venues and artists
+
+Revision ID: 3f1c9a7e2b44
+Revises: dac353d7d74c
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7e2b44'
+down_revision = 'dac353d7d74c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill from shows; `flask fyyur-check-counters` verifies the result
+    op.execute("""
+        UPDATE venues SET num_upcoming_shows = (
+            SELECT count(*) FROM shows
+            WHERE shows.venue_id = venues.id AND shows.start_time > LOCALTIMESTAMP
+        )
+    """)
+    op.execute("""
+        UPDATE artists SET num_upcoming_shows = (
+            SELECT count(*) FROM shows
+            WHERE shows.artist_id = artists.id AND shows.start_time > LOCALTIMESTAMP
+        )
+    """)
+
+
+def downgrade():
+    op.drop_column('artists', 'num_upcoming_shows')
+    op.drop_column('venues', 'num_upcoming_shows')
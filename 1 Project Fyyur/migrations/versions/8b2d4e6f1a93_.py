@@ -0,0 +1,37 @@
+"""trigram search indexes on venues and artists
+
+Revision ID: 8b2d4e6f1a93
+Revises: 3f1c9a7e2b44
+Create Date: 2026-10-17 11:40:05.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4e6f1a93'
+down_revision = '3f1c9a7e2b44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # immutable wrapper so the search text can be indexed as an expression
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_text(name text, city text, state text, genres varchar[])
+        RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(concat_ws(' ', name, city, state, array_to_string(genres, ' ')))
+        $$
+    """)
+    op.execute("CREATE INDEX ix_venues_search_trgm ON venues "
+               "USING gin (fyyur_search_text(name, city, state, genres) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_artists_search_trgm ON artists "
+               "USING gin (fyyur_search_text(name, city, state, genres) gin_trgm_ops)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_artists_search_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_venues_search_trgm")
+    op.execute("DROP FUNCTION IF EXISTS fyyur_search_text(text, text, text, varchar[])")
@@ -0,0 +1,36 @@
+"""no double booking of venues or artists
+
+Revision ID: a7c3e9d1b5f4
+Revises: f3b9c5d2e7a1
+Create Date: 2026-10-17 16:48:31.207153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d1b5f4'
+down_revision = 'f3b9c5d2e7a1'
+branch_labels = None
+depends_on = None
+
+# a show holds its venue and artist for three hours (bookings.SHOW_LENGTH)
+CONSTRAINTS = [
+    ('shows_venue_no_overlap', 'venue_id'),
+    ('shows_artist_no_overlap', 'artist_id'),
+]
+
+
+def upgrade():
+    # existing double bookings make this fail; list them with `flask fyyur-conflicts`
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    for name, column in CONSTRAINTS:
+        op.execute("ALTER TABLE shows ADD CONSTRAINT %s EXCLUDE USING gist "
+                   "(%s WITH =, tsrange(start_time, start_time + interval '3 hours') WITH &&)"
+                   % (name, column))
+
+
+def downgrade():
+    for name, column in reversed(CONSTRAINTS):
+        op.drop_constraint(name, 'shows')
@@ -0,0 +1,27 @@
+"""version columns for optimistic concurrency on edits
+
+Revision ID: b2e8f4a6c0d3
+Revises: a7c3e9d1b5f4
+Create Date: 2026-10-17 17:21:44.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e8f4a6c0d3'
+down_revision = 'a7c3e9d1b5f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a constant server default is a catalog-only change on Postgres 11+
+    op.add_column('venues', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('artists', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('artists', 'version')
+    op.drop_column('venues', 'version')
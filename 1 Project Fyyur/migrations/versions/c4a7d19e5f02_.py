@@ -0,0 +1,37 @@
+"""composite indexes for shows, venues and artists listings
+
+Revision ID: c4a7d19e5f02
+Revises: 8b2d4e6f1a93
+Create Date: 2026-10-17 14:03:27.551890
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a7d19e5f02'
+down_revision = '8b2d4e6f1a93'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time']),
+    ('ix_shows_start_time_id', 'shows', ['start_time', 'id']),
+    ('ix_venues_state_city_name_id', 'venues', ['state', 'city', 'name', 'id']),
+    ('ix_artists_name_id', 'artists', ['name', 'id']),
+]
+
+
+def upgrade():
+    # built concurrently so a live shows table keeps taking writes
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
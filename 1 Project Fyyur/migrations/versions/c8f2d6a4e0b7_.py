@@ -0,0 +1,109 @@
+"""partition shows by month on start_time
+
+Revision ID: c8f2d6a4e0b7
+Revises: e9c4b2a8d6f1
+Create Date: 2026-10-17 21:06:14.538920
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f2d6a4e0b7'
+down_revision = 'e9c4b2a8d6f1'
+branch_labels = None
+depends_on = None
+
+# partitions ahead of today; `flask fyyur-create-partitions` keeps them coming
+MONTHS_AHEAD = 12
+
+INDEXES = [
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_shows_start_time_id', ['start_time', 'id']),
+]
+
+# a show holds its venue and artist for three hours (bookings.SHOW_LENGTH)
+BOOKINGS = [
+    ('venue_no_overlap', 'venue_id'),
+    ('artist_no_overlap', 'artist_id'),
+]
+
+COLUMNS = 'id, artist_id, venue_id, start_time'
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def add_bookings(table):
+    # exclusion constraints cannot span partitions, so each one gets its own
+    for suffix, column in BOOKINGS:
+        op.execute("ALTER TABLE %s ADD CONSTRAINT %s_%s EXCLUDE USING gist "
+                   "(%s WITH =, tsrange(start_time, start_time + interval '3 hours') WITH &&)"
+                   % (table, table, suffix, column))
+
+
+def create_table(name, partitioned):
+    op.execute("CREATE TABLE %s ("
+               "id integer NOT NULL DEFAULT nextval('shows_id_seq'), "
+               "artist_id integer NOT NULL, "
+               "venue_id integer NOT NULL, "
+               "start_time timestamp without time zone NOT NULL)%s"
+               % (name, ' PARTITION BY RANGE (start_time)' if partitioned else ''))
+
+
+def finish_table(primary_key):
+    # keys and indexes are built once the rows are in
+    op.execute("ALTER SEQUENCE shows_id_seq OWNED BY shows.id")
+    op.create_primary_key('shows_pkey', 'shows', primary_key)
+    op.create_foreign_key('shows_artist_id_fkey', 'shows', 'artists', ['artist_id'], ['id'])
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'])
+    for name, columns in INDEXES:
+        op.create_index(name, 'shows', columns)
+
+
+def upgrade():
+    # takes shows offline while its rows are copied; run in a maintenance window
+    today = datetime.now()
+    oldest = op.get_bind().execute(sa.text("SELECT min(start_time) FROM shows")).scalar() or today
+
+    # a partitioned table has no unique index on id alone for it to reference
+    op.drop_constraint('upcoming_shows_show_id_fkey', 'upcoming_shows', type_='foreignkey')
+    op.execute("ALTER SEQUENCE shows_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE shows RENAME TO shows_unpartitioned")
+
+    create_table('shows', partitioned=True)
+    # anything outside the monthly partitions, such as bookings far ahead
+    op.execute("CREATE TABLE shows_default PARTITION OF shows DEFAULT")
+    add_bookings('shows_default')
+    month = datetime(oldest.year, oldest.month, 1)
+    end = add_months(datetime(today.year, today.month, 1), MONTHS_AHEAD + 1)
+    while month < end:
+        name = 'shows_y%04dm%02d' % (month.year, month.month)
+        op.execute("CREATE TABLE %s PARTITION OF shows FOR VALUES FROM ('%s') TO ('%s')"
+                   % (name, month.isoformat(' '), add_months(month, 1).isoformat(' ')))
+        add_bookings(name)
+        month = add_months(month, 1)
+
+    op.execute("INSERT INTO shows (%s) SELECT %s FROM shows_unpartitioned" % (COLUMNS, COLUMNS))
+    op.execute("DROP TABLE shows_unpartitioned")
+    finish_table(['id', 'start_time'])
+
+
+def downgrade():
+    # shows archived by `flask fyyur-archive-shows` stay in their archive files
+    op.execute("ALTER SEQUENCE shows_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE shows RENAME TO shows_partitioned")
+    create_table('shows', partitioned=False)
+    op.execute("INSERT INTO shows (%s) SELECT %s FROM shows_partitioned" % (COLUMNS, COLUMNS))
+    op.execute("DROP TABLE shows_partitioned")
+    finish_table(['id'])
+    add_bookings('shows')
+
+    op.execute("DELETE FROM upcoming_shows WHERE show_id NOT IN (SELECT id FROM shows)")
+    op.create_foreign_key('upcoming_shows_show_id_fkey', 'upcoming_shows', 'shows',
+                          ['show_id'], ['id'], ondelete='CASCADE')
@@ -0,0 +1,39 @@
+"""venue coordinates and the venue_points index
+
+Revision ID: d5a1c7e3f9b2
+Revises: b2e8f4a6c0d3
+Create Date: 2026-10-17 17:58:09.336140
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a1c7e3f9b2'
+down_revision = 'b2e8f4a6c0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venues', sa.Column('longitude', sa.Float(), nullable=True))
+    op.create_index('ix_venues_latitude_longitude_id', 'venues', ['latitude', 'longitude', 'id'])
+    op.create_table('venue_points',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_venue_points_latitude_longitude', 'venue_points', ['latitude', 'longitude'], unique=True)
+    # existing venues are placed afterwards with `flask fyyur-geocode`, which
+    # reads the bundled centroid table the migration should not depend on
+
+
+def downgrade():
+    op.drop_index('ix_venue_points_latitude_longitude', table_name='venue_points')
+    op.drop_table('venue_points')
+    op.drop_index('ix_venues_latitude_longitude_id', table_name='venues')
+    op.drop_column('venues', 'longitude')
+    op.drop_column('venues', 'latitude')
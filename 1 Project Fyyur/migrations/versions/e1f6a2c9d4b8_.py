@@ -0,0 +1,67 @@
+"""genres table and venue/artist genre links
+
+Revision ID: e1f6a2c9d4b8
+Revises: c4a7d19e5f02
+Create Date: 2026-10-17 15:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f6a2c9d4b8'
+down_revision = 'c4a7d19e5f02'
+branch_labels = None
+depends_on = None
+
+# frozen copy of the genre choices in forms.py at the time of this revision
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+LINKS = [('venue_genres', 'venues', 'venue_id'), ('artist_genres', 'artists', 'artist_id')]
+
+
+def upgrade():
+    genres = op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genres, [{'name': name} for name in GENRES])
+
+    for link, table, column in LINKS:
+        op.create_table(link,
+        sa.Column(column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([column], [table + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(column, 'genre_id')
+        )
+
+        # backfill from the arrays; names outside the form choices join the table too
+        op.execute(
+            "INSERT INTO genres (name) "
+            "SELECT DISTINCT genre.value FROM {table} t "
+            "CROSS JOIN LATERAL unnest(t.genres) AS genre(value) "
+            "WHERE genre.value IS NOT NULL "
+            "ON CONFLICT (name) DO NOTHING".format(table=table))
+        op.execute(
+            "INSERT INTO {link} ({column}, genre_id) "
+            "SELECT DISTINCT t.id, g.id FROM {table} t "
+            "CROSS JOIN LATERAL unnest(t.genres) AS genre(value) "
+            "JOIN genres g ON g.name = genre.value".format(link=link, table=table, column=column))
+
+        # built after the backfill so the load is not slowed by index upkeep
+        op.create_index('ix_{}_genre_id_{}'.format(link, column), link, ['genre_id', column])
+
+
+def downgrade():
+    for link, table, column in reversed(LINKS):
+        op.drop_index('ix_{}_genre_id_{}'.format(link, column), table_name=link)
+        op.drop_table(link)
+    op.drop_table('genres')
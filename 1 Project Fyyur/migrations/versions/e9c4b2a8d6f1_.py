@@ -0,0 +1,46 @@
+"""soft-deleted venues and artists, and background deletion jobs
+
+Revision ID: e9c4b2a8d6f1
+Revises: d5a1c7e3f9b2
+Create Date: 2026-10-17 18:42:51.207316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9c4b2a8d6f1'
+down_revision = 'd5a1c7e3f9b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_venues_deleted_at', 'venues', ['deleted_at'])
+    op.add_column('artists', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_artists_deleted_at', 'artists', ['deleted_at'])
+    op.create_table('deletion_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='queued', nullable=False),
+    sa.Column('shows_total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('shows_deleted', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deletion_jobs_status', 'deletion_jobs', ['status'])
+
+
+def downgrade():
+    op.drop_index('ix_deletion_jobs_status', table_name='deletion_jobs')
+    op.drop_table('deletion_jobs')
+    op.drop_index('ix_artists_deleted_at', table_name='artists')
+    op.drop_column('artists', 'deleted_at')
+    op.drop_index('ix_venues_deleted_at', table_name='venues')
+    op.drop_column('venues', 'deleted_at')
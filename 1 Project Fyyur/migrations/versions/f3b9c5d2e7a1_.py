@@ -0,0 +1,49 @@
+"""upcoming shows calendar table
+
+Revision ID: f3b9c5d2e7a1
+Revises: e1f6a2c9d4b8
+Create Date: 2026-10-17 16:05:12.904716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9c5d2e7a1'
+down_revision = 'e1f6a2c9d4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upcoming_shows',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('venue_name', sa.String(), nullable=False),
+    sa.Column('venue_image_link', sa.String(length=500), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('artist_name', sa.String(), nullable=False),
+    sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+    sa.ForeignKeyConstraint(['show_id'], ['shows.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+
+    # backfill; `flask fyyur-refresh-upcoming` rebuilds it the same way
+    op.execute("""
+        INSERT INTO upcoming_shows (show_id, start_time, venue_id, venue_name, venue_image_link,
+                                    artist_id, artist_name, artist_image_link)
+        SELECT shows.id, shows.start_time, venues.id, venues.name, venues.image_link,
+               artists.id, artists.name, artists.image_link
+        FROM shows
+        JOIN venues ON venues.id = shows.venue_id
+        JOIN artists ON artists.id = shows.artist_id
+        WHERE shows.start_time > LOCALTIMESTAMP
+    """)
+    op.create_index('ix_upcoming_shows_start_time_show_id', 'upcoming_shows', ['start_time', 'show_id'])
+
+
+def downgrade():
+    op.drop_index('ix_upcoming_shows_start_time_show_id', table_name='upcoming_shows')
+    op.drop_table('upcoming_shows')
@@ -0,0 +1,55 @@
+"""refuse double bookings across month partitions of shows
+
+Revision ID: f7d3b1e9a5c2
+Revises: c8f2d6a4e0b7
+Create Date: 2026-10-17 23:12:40.318275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7d3b1e9a5c2'
+down_revision = 'c8f2d6a4e0b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # each partition's exclusion constraints only see its own month; this
+    # checks the slots within three hours (bookings.SHOW_LENGTH) of a boundary
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_check_boundary_booking() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            -- a slot inside one month is left to that partition's exclusion constraints
+            IF date_trunc('month', NEW.start_time - interval '3 hours') = date_trunc('month', NEW.start_time)
+               AND date_trunc('month', NEW.start_time + interval '3 hours') = date_trunc('month', NEW.start_time) THEN
+                RETURN NULL;
+            END IF;
+            -- bookings near a boundary for one venue or artist take turns; each
+            -- statement below then sees the ones committed before it
+            PERFORM 1 FROM venues WHERE id = NEW.venue_id FOR NO KEY UPDATE;
+            PERFORM 1 FROM artists WHERE id = NEW.artist_id FOR NO KEY UPDATE;
+            IF EXISTS (
+                SELECT 1 FROM shows
+                WHERE (venue_id = NEW.venue_id OR artist_id = NEW.artist_id)
+                  AND start_time > NEW.start_time - interval '3 hours'
+                  AND start_time < NEW.start_time + interval '3 hours'
+                  AND date_trunc('month', start_time) <> date_trunc('month', NEW.start_time)
+            ) THEN
+                RAISE EXCEPTION 'show % overlaps a show in the neighbouring month', NEW.id
+                    USING ERRCODE = 'exclusion_violation';
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    # cloned onto every partition, present and future
+    op.execute("CREATE TRIGGER shows_boundary_booking AFTER INSERT OR UPDATE OF venue_id, artist_id, start_time "
+               "ON shows FOR EACH ROW EXECUTE FUNCTION fyyur_check_boundary_booking()")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS shows_boundary_booking ON shows")
+    op.execute("DROP FUNCTION IF EXISTS fyyur_check_boundary_booking()")
@@ -2,21 +2,15 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from flask import Flask
-from flask_migrate import Migrate
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from pool import PooledSQLAlchemy
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app,db)
+# bound to the app in app.py; every module shares this one engine
+db = PooledSQLAlchemy()
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -24,6 +18,12 @@ migrate = Migrate(app,db)
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        # /venues keyset order; also serves city/state lookups
+        db.Index('ix_venues_state_city_name_id', 'state', 'city', 'name', 'id'),
+        # /venues/nearby reads the venues at one point at a time
+        db.Index('ix_venues_latitude_longitude_id', 'latitude', 'longitude', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -33,38 +33,70 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres =  db.Column("genres", db.ARRAY(db.String()))
+    genres =  db.Column("genres", db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite'))
     website_link = db.Column(db.String(250))
     seeking_talent = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(500))
+    # city/state centroid, filled in by geo.py; NULL when the place is unknown
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # maintained by counters.py, read by the listing and search pages
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # bumped by every ORM update; edits match on it to catch concurrent editors (edits.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # set when deletion starts; the row is hidden until deletions.py removes it
+    deleted_at = db.Column(db.DateTime, index=True)
     shows = db.relationship('Show', backref='venue', lazy=True)
 
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
           return f'<Venue {self.id} name: {self.name}>'
 
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        # /artists keyset order
+        db.Index('ix_artists_name_id', 'name', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column("genres", db.ARRAY(db.String()))
+    genres = db.Column("genres", db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite'))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(120))
+    # maintained by counters.py, read by the listing and search pages
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # bumped by every ORM update; edits match on it to catch concurrent editors (edits.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # set when deletion starts; the row is hidden until deletions.py removes it
+    deleted_at = db.Column(db.DateTime, index=True)
     shows = db.relationship('Show', backref='artist', lazy=True)
 
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
           return f'<Artist {self.id} name: {self.name}>'
 
 class Show(db.Model):
      __tablename__ = 'shows'
+     __table_args__ = (
+         # every venue/artist page and counter filters shows on (fk, start_time)
+         db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+         db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+         # /shows keyset order
+         db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+     )
      
+     # on Postgres shows is partitioned by month (partitions.py) and keyed on
+     # (id, start_time); id alone stays unique, drawn from one sequence
      id = db.Column(db.Integer, primary_key=True)
      artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
      venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
@@ -73,3 +105,91 @@ class Show(db.Model):
      def __repr__(self):
            return f'<Show {self.id}, Artist {self.artist_id}, Venue {self.venue_id}>'
      
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Genre {self.id} name: {self.name}>'
+
+# genre links, kept in step with the genres arrays by genres.py; the
+# (genre_id, id) indexes serve the ?genre= filters
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+class VenuePoint(db.Model):
+    '''
+    Every distinct venue location, maintained by geo.py. Nearby searches
+    look for points here first, so their cost follows the number of places
+    around, not the number of venues.
+    '''
+    __tablename__ = 'venue_points'
+    __table_args__ = (
+        db.Index('ix_venue_points_latitude_longitude', 'latitude', 'longitude', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<VenuePoint {self.latitude}, {self.longitude}>'
+
+class DeletionJob(db.Model):
+    '''
+    A venue or artist whose shows are being removed in the background by
+    deletions.py, with its progress for the /deletions/<id> status page.
+    '''
+    __tablename__ = 'deletion_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # 'venue' or 'artist'
+    kind = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String, nullable=False)
+    # queued, running, done or failed
+    status = db.Column(db.String(20), nullable=False, default='queued', server_default='queued', index=True)
+    shows_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows_deleted = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    error = db.Column(db.String)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<DeletionJob {self.id} {self.kind} {self.entity_id}: {self.status}>'
+
+class UpcomingShow(db.Model):
+    '''
+    Upcoming shows with their venue and artist names pre-joined, maintained
+    by upcoming.py for the /shows?window=upcoming calendar.
+    '''
+    __tablename__ = 'upcoming_shows'
+    __table_args__ = (
+        # calendar keyset order and date range scans
+        db.Index('ix_upcoming_shows_start_time_show_id', 'start_time', 'show_id'),
+    )
+
+    # no foreign key: partitioned shows has no unique index on id alone to point at
+    show_id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    venue_name = db.Column(db.String, nullable=False)
+    venue_image_link = db.Column(db.String(500))
+    artist_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String, nullable=False)
+    artist_image_link = db.Column(db.String(500))
+
+    def __repr__(self):
+        return f'<UpcomingShow {self.show_id} at {self.start_time}>'
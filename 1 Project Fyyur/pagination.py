@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+from werkzeug.exceptions import BadRequest
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#
+# Listing pages seek past the last row they showed instead of using OFFSET,
+# so every page costs the same index range scan and only `per_page` rows are
+# ever loaded. Cursors are the sort key of the first/last row on a page,
+# JSON encoded into an opaque URL-safe token.
+#----------------------------------------------------------------------------#
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+class Page:
+    def __init__(self, rows, prev_cursor, next_cursor, per_page):
+        self.rows = rows
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_value(column, value):
+    # a hand-edited cursor must not reach SQL with a value of the wrong type
+    expected = column.type.python_type
+    if expected is datetime:
+        if not isinstance(value, str):
+            raise ValueError('invalid cursor')
+        return datetime.fromisoformat(value)
+    # JSON has no separate boolean and integer checks: True is an int to Python
+    if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+        raise ValueError('invalid cursor')
+    return value
+
+def decode_cursor(cursor, columns):
+    '''Decodes a cursor for `columns`, raising ValueError when it is malformed.'''
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as error:
+        raise ValueError('invalid cursor') from error
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('invalid cursor')
+
+    return [decode_value(column, value) for column, value in zip(columns, values)]
+
+def page_size(requested):
+    return min(max(requested or PER_PAGE, 1), MAX_PER_PAGE)
+
+def keyset_page(query, columns, after=None, before=None, per_page=PER_PAGE):
+    '''
+    Returns the Page of `query` rows ordered by `columns` (ascending, the
+    last one unique) that comes right after the `after` cursor, right before
+    the `before` cursor, or the first page when neither is given. Rows must
+    expose every column by its key.
+    '''
+    per_page = page_size(per_page)
+    key = tuple_(*columns)
+    backwards = before is not None
+
+    if backwards:
+        query = query.filter(key < tuple_(*decode_cursor(before, columns))) \
+                     .order_by(*[column.desc() for column in columns])
+    else:
+        if after is not None:
+            query = query.filter(key > tuple_(*decode_cursor(after, columns)))
+        query = query.order_by(*columns)
+
+    # one extra row tells us whether there is another page in this direction
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+
+    if not rows:
+        return Page(rows, None, None, per_page)
+    if backwards:
+        return Page(rows, cursor(rows[0]) if more else None, cursor(rows[-1]), per_page)
+    return Page(rows, cursor(rows[0]) if after is not None else None,
+                cursor(rows[-1]) if more else None, per_page)
+
+def paginate(query, columns, args):
+    '''keyset_page() driven by ?after=, ?before= and ?per_page= request args.'''
+    try:
+        return keyset_page(query, columns,
+                           after=args.get('after'),
+                           before=args.get('before'),
+                           per_page=args.get('per_page', PER_PAGE, type=int))
+    except ValueError:
+        raise BadRequest('invalid page cursor')
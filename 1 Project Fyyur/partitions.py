@@ -0,0 +1,226 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import gzip
+import os
+from datetime import datetime
+from sqlalchemy import and_, func, select, table, column
+from models import Show
+from bookings import booking_ddl, POSTGRES_BOUNDARY_DDL
+
+#----------------------------------------------------------------------------#
+# Monthly show partitions.
+#
+# On Postgres, shows is partitioned by month on start_time (shows_y2026m10
+# holds October 2026), so a query bounded on start_time, like the upcoming
+# and past halves of a detail page, only reads the partitions on its side
+# of now. Rows outside every partition land in shows_default, so a booking
+# far ahead never fails; `flask fyyur-create-partitions`, run on a schedule,
+# keeps SHOW_PARTITION_MONTHS_AHEAD months of partitions ahead of today and
+# moves any rows waiting in shows_default into them. `flask
+# fyyur-archive-shows` writes every month older than SHOWS_KEEP_MONTHS to a
+# gzipped CSV file and then detaches and drops its partition, so the table
+# stops growing with history. Other databases have no partitions: archiving
+# deletes the archived rows instead, and creating partitions does nothing.
+#----------------------------------------------------------------------------#
+
+MONTHS_AHEAD = 12
+KEEP_MONTHS = 24
+DEFAULT_PARTITION = 'shows_default'
+ARCHIVE_COLUMNS = ['id', 'artist_id', 'venue_id', 'start_time']
+# rows fetched per round trip while writing an archive
+ARCHIVE_CHUNK = 10000
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def months_between(first, end):
+    '''Start of every month from the one holding `first` up to, not including, `end`.'''
+    month = month_start(first)
+    while month < end:
+        yield month
+        month = add_months(month, 1)
+
+def partition_name(month):
+    return 'shows_y%04dm%02d' % (month.year, month.month)
+
+def partition_month(name):
+    '''The month partition `name` holds, or None for shows_default and other tables.'''
+    try:
+        return datetime.strptime(name, 'shows_y%Ym%m')
+    except ValueError:
+        return None
+
+#----------------------------------------------------------------------------#
+# Postgres schema.
+#----------------------------------------------------------------------------#
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.exec_driver_sql(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('shows')").scalar() == 'p'
+
+def partitions(connection):
+    '''Names of the partitions of shows; empty when it is not partitioned.'''
+    if not is_partitioned(connection):
+        return []
+    return [name for name, in connection.exec_driver_sql(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'shows'::regclass ORDER BY c.relname")]
+
+def create_partition(connection, month):
+    name = partition_name(month)
+    connection.exec_driver_sql("CREATE TABLE %s PARTITION OF shows FOR VALUES FROM ('%s') TO ('%s')"
+                               % (name, month.isoformat(' '), add_months(month, 1).isoformat(' ')))
+    for statement in booking_ddl(name):
+        connection.exec_driver_sql(statement)
+    return name
+
+def ensure_partitions(connection, first, last):
+    '''
+    Creates the missing partitions for every month from the one holding
+    `first` through the one holding `last`, moving their rows out of
+    shows_default. Returns the names created; does nothing unless shows is
+    partitioned. Never commits.
+    '''
+    existing = set(partitions(connection))
+    if not existing:
+        return []
+
+    created = []
+    for month in months_between(first, add_months(month_start(last), 1)):
+        if partition_name(month) in existing:
+            continue
+        bounds = (month, add_months(month, 1))
+        waiting = connection.exec_driver_sql(
+            "SELECT count(*) FROM %s WHERE start_time >= %%s AND start_time < %%s" % DEFAULT_PARTITION,
+            bounds).scalar()
+        if waiting:
+            # the new partition cannot be attached while the default one holds its rows
+            connection.exec_driver_sql("ALTER TABLE shows DETACH PARTITION %s" % DEFAULT_PARTITION)
+            create_partition(connection, month)
+            connection.exec_driver_sql(
+                "WITH moved AS (DELETE FROM %s WHERE start_time >= %%s AND start_time < %%s RETURNING *) "
+                "INSERT INTO shows (%s) SELECT %s FROM moved"
+                % (DEFAULT_PARTITION, ', '.join(ARCHIVE_COLUMNS), ', '.join(ARCHIVE_COLUMNS)), bounds)
+            connection.exec_driver_sql("ALTER TABLE shows ATTACH PARTITION %s DEFAULT" % DEFAULT_PARTITION)
+        else:
+            create_partition(connection, month)
+        created.append(partition_name(month))
+    return created
+
+# frozen copy lives in the migration, which also moves existing rows; this one is used by benchmarks.py
+POSTGRES_PARTITION_DDL = [
+    "DROP TABLE shows CASCADE",
+    "CREATE TABLE shows ("
+    "id serial, "
+    "artist_id integer NOT NULL REFERENCES artists (id), "
+    "venue_id integer NOT NULL REFERENCES venues (id), "
+    "start_time timestamp without time zone NOT NULL, "
+    "PRIMARY KEY (id, start_time)"
+    ") PARTITION BY RANGE (start_time)",
+    "CREATE INDEX ix_shows_venue_id_start_time ON shows (venue_id, start_time)",
+    "CREATE INDEX ix_shows_artist_id_start_time ON shows (artist_id, start_time)",
+    "CREATE INDEX ix_shows_start_time_id ON shows (start_time, id)",
+    "CREATE TABLE %s PARTITION OF shows DEFAULT" % DEFAULT_PARTITION,
+] + booking_ddl(DEFAULT_PARTITION) + POSTGRES_BOUNDARY_DDL
+
+def install_postgres_partitions(connection, first, last):
+    '''Replaces an empty shows table with a partitioned one covering `first` through `last`.'''
+    for statement in POSTGRES_PARTITION_DDL:
+        connection.exec_driver_sql(statement)
+    ensure_partitions(connection, first, last)
+
+#----------------------------------------------------------------------------#
+# Archival.
+#----------------------------------------------------------------------------#
+
+def archive_path(directory, month):
+    return os.path.join(directory, partition_name(month) + '.csv.gz')
+
+def write_archive(connection, source, month, path):
+    '''Writes the shows of `month` in `source` to `path` as gzipped CSV; returns how many.'''
+    start, end = month, add_months(month, 1)
+    columns = [source.c[name] for name in ARCHIVE_COLUMNS]
+    rows = connection.execution_options(stream_results=True).execute(
+        select(*columns)
+            .where(source.c.start_time >= start, source.c.start_time < end)
+            .order_by(source.c.start_time, source.c.id))
+
+    count = 0
+    # swapped in whole, so a file under its final name is always complete
+    temporary = path + '.tmp'
+    with gzip.open(temporary, 'wt', encoding='utf-8', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for chunk in rows.partitions(ARCHIVE_CHUNK):
+            writer.writerows((id, artist_id, venue_id, start_time.isoformat())
+                             for id, artist_id, venue_id, start_time in chunk)
+            count += len(chunk)
+    if count:
+        os.replace(temporary, path)
+    else:
+        os.unlink(temporary)
+    return count
+
+def archive_month(session, month, directory):
+    '''
+    Writes the shows of `month` to an archive file in `directory`, then
+    removes them: by detaching and dropping the month's partition when there
+    is one, else by deleting them. Returns how many were archived. Raises
+    RuntimeError when the month's shows change meanwhile; the caller must
+    then roll back. Never commits.
+    '''
+    connection = session.connection()
+    name = partition_name(month)
+    partitioned = name in partitions(connection)
+    path = archive_path(directory, month)
+
+    if partitioned:
+        source = table(name, *[column(key) for key in ARCHIVE_COLUMNS])
+        archived = write_archive(connection, source, month, path)
+        # a detached partition takes no more writes; it must still hold exactly what was written
+        connection.exec_driver_sql("ALTER TABLE shows DETACH PARTITION %s" % name)
+        removed = connection.execute(select(func.count()).select_from(source)).scalar()
+    else:
+        archived = write_archive(connection, Show.__table__, month, path)
+        removed = session.query(Show) \
+            .filter(and_(Show.start_time >= month, Show.start_time < add_months(month, 1))) \
+            .delete(synchronize_session=False)
+
+    if removed != archived:
+        if archived:
+            os.unlink(path)
+        raise RuntimeError('shows of %s changed while archiving; run again' % name)
+    if partitioned:
+        connection.exec_driver_sql("DROP TABLE %s" % name)
+    return archived
+
+def archive_shows(session, before, directory):
+    '''
+    Archives every month of shows older than the month starting `before`
+    (see archive_month()), committing after each. Returns (month, shows
+    archived) pairs, oldest first.
+    '''
+    if before > month_start(datetime.now()):
+        raise ValueError('only months that have ended can be archived')
+    os.makedirs(directory, exist_ok=True)
+
+    oldest = session.query(func.min(Show.start_time)).filter(Show.start_time < before).scalar()
+    months = set(months_between(oldest, before)) if oldest else set()
+    # empty partitions are dropped too
+    months.update(month for month in map(partition_month, partitions(session.connection()))
+                  if month is not None and month < before)
+
+    archived = []
+    for month in sorted(months):
+        archived.append((month, archive_month(session, month, directory)))
+        session.commit()
+    return archived
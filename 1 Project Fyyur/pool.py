@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+import weakref
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, exc, orm
+from sqlalchemy.pool import QueuePool
+from routing import RoutingSession
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#
+# Every module shares the one `db` made in models.py, so each worker holds a
+# single engine and a single pool. Pool sizing, pre-ping, recycling and the
+# Postgres statement timeout come from the DB_* settings in config.py; SQLite
+# (tests, benchmarks) keeps Flask-SQLAlchemy's defaults, which do not pool.
+# Replica engines (routing.py) are made with the same settings.
+#----------------------------------------------------------------------------#
+
+class PoolMetrics:
+    '''Running totals for one engine's pool, fed by pool events.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {'checkouts': 0, 'checkins': 0, 'connects': 0, 'invalidations': 0,
+                      'soft_invalidations': 0, 'timeouts': 0}
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.stats['timeouts'] += 1
+
+    def watch(self, engine):
+        event.listen(engine, 'checkout', lambda *args: self._count('checkouts'))
+        event.listen(engine, 'checkin', lambda *args: self._count('checkins'))
+        event.listen(engine, 'connect', lambda *args: self._count('connects'))
+        event.listen(engine, 'invalidate', lambda *args: self._count('invalidations'))
+        event.listen(engine, 'soft_invalidate', lambda *args: self._count('soft_invalidations'))
+        if isinstance(engine.pool, MeteredQueuePool):
+            engine.pool.metrics = self
+
+    def info(self, pool):
+        with self.lock:
+            info = dict(self.stats,
+                        wait_ms_total=round(self.wait_total * 1000, 3),
+                        wait_ms_max=round(self.wait_max * 1000, 3),
+                        wait_ms_mean=round(self.wait_total * 1000 / self.stats['checkouts'], 3)
+                                     if self.stats['checkouts'] else 0.0)
+        info['pool'] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            # a worker can hold up to size + max_overflow server connections
+            info.update(size=pool.size(), max_overflow=pool._max_overflow,
+                        checked_in=pool.checkedin(), checked_out=pool.checkedout(),
+                        overflow=pool.overflow(), max_connections=pool.size() + max(pool._max_overflow, 0))
+        return info
+
+class MeteredQueuePool(QueuePool):
+    '''QueuePool that reports how long each checkout waited for a connection.'''
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics:
+                self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep reporting into the same totals
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+class PooledSQLAlchemy(SQLAlchemy):
+    '''SQLAlchemy extension that applies the DB_* pool settings and meters the pool.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_metrics = weakref.WeakKeyDictionary()
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername.startswith('sqlite'):
+            return sa_url, options
+
+        config = app.config
+        options.update(poolclass=MeteredQueuePool,
+                       pool_size=config.get('DB_POOL_SIZE', 5),
+                       max_overflow=config.get('DB_MAX_OVERFLOW', 10),
+                       pool_timeout=config.get('DB_POOL_TIMEOUT', 30),
+                       pool_recycle=config.get('DB_POOL_RECYCLE', -1),
+                       pool_pre_ping=config.get('DB_POOL_PRE_PING', True))
+        timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+        if timeout and sa_url.drivername.startswith('postgresql'):
+            options.setdefault('connect_args', {})['options'] = '-c statement_timeout=%d' % timeout
+        return sa_url, options
+
+    def create_session(self, options):
+        # read-only views may read from a replica
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        metrics = self.pool_metrics[engine] = PoolMetrics()
+        metrics.watch(engine)
+        return engine
+
+    def pool_info(self):
+        '''Pool status and metrics for the current app's engine.'''
+        engine = self.engine
+        return self.pool_metrics[engine].info(engine.pool)
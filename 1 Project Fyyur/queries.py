@@ -0,0 +1,222 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from itertools import groupby
+from sqlalchemy import select
+from models import db, Venue, Artist, Show
+from instrumentation import RequestScope
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+# /venues seeks on the area first so each area stays contiguous across pages
+VENUE_LISTING_ORDER = (Venue.state, Venue.city, Venue.name, Venue.id)
+
+def venue_listing():
+    return db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.num_upcoming_shows
+    ).filter(Venue.deleted_at.is_(None))
+
+def venue_areas(rows=None):
+    '''
+    Groups venue listing rows into the city/state -> venues ->
+    num_upcoming_shows structure used by the /venues page, reading the
+    maintained upcoming show counter. Every area appears once. Without
+    `rows`, every venue is listed from a single query.
+    '''
+    if rows is None:
+        rows = venue_listing().order_by(*VENUE_LISTING_ORDER).all()
+
+    areas = []
+    for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        areas.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'num_upcoming_shows': venue.num_upcoming_shows
+            } for venue in venues]
+        })
+
+    return areas
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+def venue_page(venue, past_shows, upcoming_shows):
+    # `venue` is a row of the venues table
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres or [],
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "website_link": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows)
+    }
+
+def artist_page(artist, past_shows, upcoming_shows):
+    # `artist` is a row of the artists table
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres or [],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "website_link": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows)
+    }
+
+def shows_of(foreign_key, other, entity_id, upcoming, now):
+    '''
+    Upcoming or past shows of one venue (foreign_key=Show.venue_id,
+    other=Artist) or artist (Show.artist_id, Venue), oldest first, with the
+    other side's id, name and image link labelled as the templates expect.
+    '''
+    other_key = Show.artist_id if other is Artist else Show.venue_id
+    prefix = other.__name__.lower()
+    return select(
+        other_key.label(prefix + '_id'),
+        other.name.label(prefix + '_name'),
+        other.image_link.label(prefix + '_image_link'),
+        Show.start_time
+    ).join(other, other.id == other_key) \
+     .where(foreign_key == entity_id, other.deleted_at.is_(None),
+            Show.start_time > now if upcoming else Show.start_time <= now) \
+     .order_by(Show.start_time, Show.id)
+
+def detail_statements(model, entity_id, now):
+    '''
+    The three statements of a venue or artist page: its row, its upcoming
+    shows and its past shows. Each half is bounded on start_time, so on a
+    partitioned shows table (partitions.py) the upcoming one only reads the
+    partitions from this month on, however much history there is.
+    '''
+    foreign_key, other = (Show.venue_id, Artist) if model is Venue else (Show.artist_id, Venue)
+    return [
+        select(model.__table__).where(model.id == entity_id, model.deleted_at.is_(None)),
+        shows_of(foreign_key, other, entity_id, True, now),
+        shows_of(foreign_key, other, entity_id, False, now),
+    ]
+
+def venue_detail(venue_id, now=None):
+    '''
+    Loads a venue with its past and upcoming shows and their artists in three
+    queries, no matter how many shows the venue has. Returns None when the
+    venue does not exist or is being deleted.
+    '''
+    now = now or datetime.now()
+
+    venue, upcoming, past = detail_statements(Venue, venue_id, now)
+    venue = db.session.execute(venue).first()
+    if venue is None:
+        return None
+
+    return venue_page(venue, [dict(row._mapping) for row in db.session.execute(past)],
+                      [dict(row._mapping) for row in db.session.execute(upcoming)])
+
+def artist_detail(artist_id, now=None):
+    '''
+    Loads an artist with its past and upcoming shows and their venues in
+    three queries, no matter how many shows the artist has. Returns None when
+    the artist does not exist or is being deleted.
+    '''
+    now = now or datetime.now()
+
+    artist, upcoming, past = detail_statements(Artist, artist_id, now)
+    artist = db.session.execute(artist).first()
+    if artist is None:
+        return None
+
+    return artist_page(artist, [dict(row._mapping) for row in db.session.execute(past)],
+                       [dict(row._mapping) for row in db.session.execute(upcoming)])
+
+#----------------------------------------------------------------------------#
+# Fanned-out detail pages.
+#
+# The same pages with their three statements (the row, its upcoming shows,
+# its past shows) run concurrently on their own pooled connections, so a
+# page waits for the slowest round trip instead of the sum of them. Each
+# statement sees its own snapshot. Enabled by DETAIL_PAGE_FAN_OUT.
+#----------------------------------------------------------------------------#
+
+def fan_out(executor, statements):
+    '''Runs `statements` concurrently on `executor`; returns their rows in order.'''
+    # the replica of a read-only view (routing.py), else the primary
+    engine = db.session.get_bind()
+    # statements are counted and profiled as part of the calling request
+    scope = RequestScope.current()
+
+    def run(statement):
+        with engine.connect() as connection:
+            return connection.execution_options(request_scope=scope).execute(statement).all()
+
+    return [future.result() for future in [executor.submit(run, statement) for statement in statements]]
+
+def venue_detail_fanned_out(venue_id, executor, now=None):
+    '''venue_detail() with its three statements run concurrently on `executor`.'''
+    now = now or datetime.now()
+
+    venues, upcoming, past = fan_out(executor, detail_statements(Venue, venue_id, now))
+    if not venues:
+        return None
+
+    return venue_page(venues[0], [dict(row._mapping) for row in past], [dict(row._mapping) for row in upcoming])
+
+def artist_detail_fanned_out(artist_id, executor, now=None):
+    '''artist_detail() with its three statements run concurrently on `executor`.'''
+    now = now or datetime.now()
+
+    artists, upcoming, past = fan_out(executor, detail_statements(Artist, artist_id, now))
+    if not artists:
+        return None
+
+    return artist_page(artists[0], [dict(row._mapping) for row in past], [dict(row._mapping) for row in upcoming])
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+SHOW_LISTING_ORDER = (Show.start_time, Show.id)
+
+def show_listing():
+    # shows with the venue and artist columns the /shows tiles need
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Artist, Show.artist_id == Artist.id) \
+     .join(Venue, Show.venue_id == Venue.id) \
+     .filter(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import itertools
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# Views decorated with @reads are read-only. When SQLALCHEMY_REPLICA_URIS
+# lists replicas, their statements go to one replica per request, chosen
+# round-robin or by fewest connections in use (REPLICA_SELECTION) among
+# the replicas that passed their last health check. Everything else stays
+# on the primary: other views, flushes, DML, CLI commands and background
+# jobs. A write request (any method but GET/HEAD/OPTIONS outside @reads)
+# sets a cookie that keeps the client's reads on the primary for
+# REPLICA_STICKY_SECONDS, so the page it is redirected to shows its own
+# write even when the replicas lag behind.
+#----------------------------------------------------------------------------#
+
+STICKY_COOKIE = 'fyyur_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def reads(view):
+    '''Marks a read-only view whose statements may be served by a replica.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only_view = True
+        return view(*args, **kwargs)
+    return wrapper
+
+class Replica:
+    '''One replica engine, its health and the connections it has checked out.'''
+
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.checking = threading.Lock()
+        self.in_use = 0
+        self.selected = 0
+        self.healthy = True
+        # never checked: the first request to consider it checks it
+        self.checked_at = None
+        event.listen(engine, 'checkout', self._checkout)
+        event.listen(engine, 'checkin', self._checkin)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _checkout(self, *args):
+        with self.lock:
+            self.in_use += 1
+
+    def _checkin(self, *args):
+        with self.lock:
+            self.in_use -= 1
+
+    def _handle_error(self, context):
+        # a lost replica is skipped until its next health check
+        if context.is_disconnect:
+            self.healthy = False
+            self.checked_at = time.monotonic()
+
+    def available(self, interval):
+        '''Whether the replica can take reads, checking it when the last check is `interval` seconds old.'''
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= interval:
+            # one checker at a time; the others go by the last result
+            if self.checking.acquire(blocking=False):
+                try:
+                    self.check()
+                finally:
+                    self.checking.release()
+        return self.healthy
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql('SELECT 1')
+            self.healthy = True
+        except Exception:
+            self.healthy = False
+        self.checked_at = time.monotonic()
+
+    def info(self):
+        return {'url': make_url(self.url).render_as_string(hide_password=True), 'healthy': self.healthy,
+                'in_use': self.in_use, 'selected': self.selected}
+
+class ReplicaRouter:
+    '''
+    Sends the statements of @reads views to healthy replicas.
+
+        replicas = ReplicaRouter(app, db)
+        replicas.info()  # health and load of every replica
+    '''
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.lock = threading.Lock()
+        self.turns = itertools.count()
+        # (app, replica urls) -> [Replica], so changing the setting makes new engines
+        self.engines = {}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.db = db or self.db
+        app.extensions['replicas'] = self
+        app.before_request(self._start)
+        app.after_request(self._stick)
+
+    def replicas(self, app):
+        urls = tuple(app.config.get('SQLALCHEMY_REPLICA_URIS') or ())
+        key = (app, urls)
+        with self.lock:
+            replicas = self.engines.get(key)
+            if replicas is None:
+                replicas = self.engines[key] = [Replica(url, self._engine(app, url)) for url in urls]
+        return replicas
+
+    def _engine(self, app, url):
+        # same pool settings and metering as the primary
+        sa_url, options = self.db.apply_driver_hacks(app, make_url(url), {})
+        return self.db.create_engine(sa_url, options)
+
+    def choose(self, app):
+        '''A healthy replica by REPLICA_SELECTION, or None when there is none.'''
+        interval = app.config.get('REPLICA_HEALTH_CHECK_INTERVAL', 10)
+        candidates = [replica for replica in self.replicas(app) if replica.available(interval)]
+        if not candidates:
+            return None
+        # rotating the start spreads ties between equally loaded replicas too
+        turn = next(self.turns) % len(candidates)
+        candidates = candidates[turn:] + candidates[:turn]
+        if app.config.get('REPLICA_SELECTION', 'round_robin') == 'least_connections':
+            replica = min(candidates, key=lambda replica: replica.in_use)
+        else:
+            replica = candidates[0]
+        replica.selected += 1
+        return replica
+
+    def read_engine(self):
+        '''The replica engine for the current request, or None to use the primary.'''
+        if not has_request_context() or not g.get('read_only_view') or self.sticky():
+            return None
+        if 'replica' not in g:
+            # one replica per request, so its statements see one snapshot
+            g.replica = self.choose(current_app._get_current_object())
+        return g.replica.engine if g.replica is not None else None
+
+    def _start(self):
+        # requests can share an app context (and its g), as in tests
+        g.pop('read_only_view', None)
+        g.pop('replica', None)
+
+    def sticky(self):
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _stick(self, response):
+        window = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        if request.method not in READ_METHODS and not g.get('read_only_view') and window:
+            response.set_cookie(STICKY_COOKIE, '%.3f' % (time.time() + window),
+                                max_age=math.ceil(window), httponly=True, samesite='Lax')
+        return response
+
+    def info(self):
+        return [replica.info() for replica in self.replicas(current_app._get_current_object())]
+
+class RoutingSession(SignallingSession):
+    '''Session sending reads of @reads views to a replica (see ReplicaRouter).'''
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        router = self.app.extensions.get('replicas')
+        # writes always go to the primary
+        if router is not None and not self._flushing and not getattr(clause, 'is_dml', False):
+            engine = router.read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
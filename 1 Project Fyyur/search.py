@@ -0,0 +1,243 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import heapq
+import threading
+import time
+from flask import current_app
+from sqlalchemy import and_, event, func
+from sqlalchemy.orm import Session, attributes, object_session
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Search backend.
+#
+# On Postgres, venues and artists are matched with ILIKE over
+# fyyur_search_text(name, city, state, genres), which is backed by a pg_trgm
+# GIN index (see migrations/versions/8b2d4e6f1a93_.py), and ranked by trigram
+# similarity to the name. Other databases (SQLite in tests and benchmarks)
+# use an in-process trigram index that gives the same matches and ranking.
+# Rows written through the ORM are updated in it as their transaction
+# commits; bulk loads that insert through Core drop it (call drop_indexes()
+# after they commit). It is rebuilt once SEARCH_INDEX_REBUILD_SECONDS old,
+# which picks up other processes' writes.
+#----------------------------------------------------------------------------#
+
+RESULTS_PER_PAGE = 20
+MAX_RESULTS_PER_PAGE = 100
+REBUILD_SECONDS = 60
+
+def search_text(name, city, state, genres):
+    # python twin of the fyyur_search_text() SQL function
+    parts = [name, city, state] + list(genres or [])
+    return ' '.join(part for part in parts if part).lower()
+
+def trigrams(text):
+    # pg_trgm style: lowercase words padded with two leading and one trailing space
+    grams = set()
+    for word in text.lower().split():
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a, b):
+    # same definition as pg_trgm's similarity(): shared / total trigrams
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+def search(model, term, page=1, per_page=RESULTS_PER_PAGE):
+    '''
+    Returns (total, rows) for one page of `model` rows matching `term`,
+    best matches first. Rows carry id, name and num_upcoming_shows.
+    '''
+    term = term.strip()
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), MAX_RESULTS_PER_PAGE)
+
+    if db.engine.dialect.name == 'postgresql':
+        return _search_postgres(model, term, page, per_page)
+    return _search_in_process(model, term, page, per_page)
+
+def _search_postgres(model, term, page, per_page):
+    pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    matches = and_(func.fyyur_search_text(model.name, model.city, model.state, model.genres).ilike(pattern),
+                   model.deleted_at.is_(None))
+
+    total = db.session.query(func.count(model.id)).filter(matches).scalar()
+    rows = db.session.query(model.id, model.name, model.num_upcoming_shows) \
+        .filter(matches) \
+        .order_by(func.similarity(model.name, term).desc(), model.name, model.id) \
+        .limit(per_page) \
+        .offset((page - 1) * per_page) \
+        .all()
+
+    return total, rows
+
+#----------------------------------------------------------------------------#
+# In-process fallback index.
+#----------------------------------------------------------------------------#
+
+class TrigramIndex:
+    '''
+    Inverted trigram index over one table's search text. Candidates are the
+    rows sharing every trigram of the term, confirmed with a substring check.
+    '''
+
+    def __init__(self, rows):
+        # id -> (name, search text, name trigrams)
+        self.rows = {}
+        self.postings = {}
+        self.lock = threading.Lock()
+        for row in rows:
+            self._add(row.id, row.name, row.city, row.state, row.genres)
+        self.built_at = time.monotonic()
+
+    def _add(self, id, name, city, state, genres):
+        text = search_text(name, city, state, genres)
+        self.rows[id] = (name, text, frozenset(trigrams(name)))
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, set()).add(id)
+
+    def _remove(self, id):
+        row = self.rows.pop(id, None)
+        if row is None:
+            return
+        for gram in trigrams(row[1]):
+            posting = self.postings[gram]
+            posting.discard(id)
+            if not posting:
+                del self.postings[gram]
+
+    def set(self, id, values):
+        '''Indexes `id` with `values` (name, city, state, genres), or drops it when `values` is None.'''
+        with self.lock:
+            self._remove(id)
+            if values is not None:
+                self._add(id, *values)
+
+    def match(self, term):
+        term = term.lower()
+        if not term:
+            return list(self.rows)
+
+        grams = trigrams(term)
+        # trigrams of a substring exclude the word padding; keep inner ones only
+        inner = [gram for gram in grams if ' ' not in gram]
+        if inner:
+            candidates = set.intersection(*(self.postings.get(gram, set()) for gram in inner))
+        else:
+            candidates = self.rows.keys()
+
+        return [id for id in candidates if term in self.rows[id][1]]
+
+    def ranked(self, term, limit):
+        '''Returns (total matches, best `limit` ids in rank order).'''
+        grams = trigrams(term)
+
+        def rank(id):
+            name, text, name_grams = self.rows[id]
+            shared = len(grams & name_grams)
+            total = len(grams) + len(name_grams) - shared
+            return (-(shared / total if total else 0.0), name, id)
+
+        with self.lock:
+            ids = self.match(term)
+            return len(ids), heapq.nsmallest(limit, ids, key=rank)
+
+# (model, database url) -> TrigramIndex, kept current by the events below
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def _index_for(model):
+    key = (model, str(db.engine.url))
+    interval = current_app.config.get('SEARCH_INDEX_REBUILD_SECONDS', REBUILD_SECONDS)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None or (interval and time.monotonic() - index.built_at >= interval):
+        rows = db.session.query(model.id, model.name, model.city, model.state, model.genres) \
+            .filter(model.deleted_at.is_(None)).all()
+        index = TrigramIndex(rows)
+        with _indexes_lock:
+            _indexes[key] = index
+    return index
+
+def _search_in_process(model, term, page, per_page):
+    total, ids = _index_for(model).ranked(term, page * per_page)
+    page_ids = ids[(page - 1) * per_page:]
+
+    found = {row.id: row for row in db.session.query(model.id, model.name, model.num_upcoming_shows)
+                                          .filter(model.id.in_(page_ids))}
+    return total, [found[id] for id in page_ids if id in found]
+
+def drop_indexes(*args, **kwargs):
+    '''Drops the in-process indexes; bulk loads call it once their Core inserts commit.'''
+    with _indexes_lock:
+        _indexes.clear()
+
+# columns that make up the search text, and deleted_at, which hides the row
+SEARCHED = ('name', 'city', 'state', 'genres', 'deleted_at')
+
+def _record(mapper, connection, target):
+    # ORM inserts, updates and soft deletes; applied to the index once the transaction commits
+    if not any(attributes.get_history(target, name).has_changes() for name in SEARCHED):
+        return
+    session = object_session(target)
+    if session is not None:
+        values = None
+        if target.deleted_at is None:
+            values = (target.name, target.city, target.state, list(target.genres or []))
+        session.info.setdefault('search', []).append((mapper.class_, target.id, values))
+
+def _record_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('search', []).append((mapper.class_, target.id, None))
+
+def _apply(session):
+    changes = session.info.pop('search', None)
+    if not changes:
+        return
+    url = str(db.engine.url)
+    with _indexes_lock:
+        indexes = [(_indexes.get((model, url)), id, values) for model, id, values in changes]
+    for index, id, values in indexes:
+        if index is not None:
+            index.set(id, values)
+
+def _discard(session):
+    session.info.pop('search', None)
+
+for _model in (Venue, Artist):
+    event.listen(_model, 'after_insert', _record)
+    event.listen(_model, 'after_update', _record)
+    event.listen(_model, 'after_delete', _record_delete)
+event.listen(Session, 'after_commit', _apply)
+event.listen(Session, 'after_rollback', _discard)
+event.listen(db.metadata, 'after_drop', drop_indexes)
+
+#----------------------------------------------------------------------------#
+# Postgres schema.
+#----------------------------------------------------------------------------#
+
+# frozen copy lives in the migration; this one is used by benchmarks.py
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION fyyur_search_text(name text, city text, state text, genres varchar[])
+    RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT lower(concat_ws(' ', name, city, state, array_to_string(genres, ' ')))
+    $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_venues_search_trgm ON venues "
+    "USING gin (fyyur_search_text(name, city, state, genres) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_artists_search_trgm ON artists "
+    "USING gin (fyyur_search_text(name, city, state, genres) gin_trgm_ops)",
+]
+
+def install_postgres_search(connection):
+    for statement in POSTGRES_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
@@ -2,3 +2,30 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// navbar search boxes suggest names from /autocomplete as they are typed in
+document.addEventListener('input', function (event) {
+  var input = event.target;
+  var kind = input.getAttribute && input.getAttribute('data-autocomplete');
+  if (!kind || !input.value.trim()) {
+    return;
+  }
+  if (input.suggesting) {
+    input.suggesting.abort();
+  }
+  var request = input.suggesting = new XMLHttpRequest();
+  request.open('GET', '/autocomplete?type=' + kind + '&q=' + encodeURIComponent(input.value));
+  request.onload = function () {
+    if (request.status !== 200) {
+      return;
+    }
+    var list = document.getElementById(input.getAttribute('list'));
+    list.innerHTML = '';
+    JSON.parse(request.responseText).data.forEach(function (result) {
+      var option = document.createElement('option');
+      option.value = result.name;
+      list.appendChild(option);
+    });
+  };
+  request.send();
+});
@@ -0,0 +1,184 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import random
+from datetime import datetime, timedelta
+from models import Venue, Artist, Show
+from counters import recount_all
+from genres import GENRES, link_unlinked
+from upcoming import refresh_upcoming
+from bookings import Availability
+from geo import geocode_missing
+from search import drop_indexes
+
+#----------------------------------------------------------------------------#
+# Synthetic catalog.
+#
+# Fills the venues, artists and shows tables with a production-shaped
+# catalog: a few big cities hold most venues and artists, a few genres
+# dominate, and popular artists and venues get most of the shows. The rows
+# only depend on the seed and the anchor date, so two runs with the same
+# arguments produce the same database.
+#----------------------------------------------------------------------------#
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+    ('Dallas', 'TX'), ('San Francisco', 'CA'), ('Austin', 'TX'), ('Seattle', 'WA'),
+    ('Denver', 'CO'), ('Nashville', 'TN'), ('Boston', 'MA'), ('Portland', 'OR'),
+    ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+]
+
+WORDS = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Crimson', 'Rusty',
+         'Lucky', 'Broken', 'Neon', 'Paper', 'Hollow', 'Little', 'Grand', 'Secret', 'Lonely']
+VENUE_NOUNS = ['Hall', 'Lounge', 'Room', 'Club', 'Tavern', 'Theatre', 'Bar', 'Garden', 'Cellar']
+ARTIST_NOUNS = ['Band', 'Collective', 'Trio', 'Orchestra', 'Quartet', 'Project', 'Ensemble', 'Kids']
+
+CHUNK_SIZE = 5000
+
+# draws per show before giving up on a clash-free slot
+SHOW_TRIES = 10
+
+def zipf_weights(count, skew):
+    '''Weights for `count` ranked items; 0 is uniform, higher is more lopsided.'''
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+class Generator:
+    '''
+    Deterministic catalog builder.
+
+        Generator(seed=7, city_skew=1.2).populate(db.session, venues=5000,
+                                                  artists=5000, shows=100000)
+
+    `genre_weights` maps genre -> relative weight and replaces the default
+    skewed distribution over the form's genre choices.
+    '''
+
+    def __init__(self, seed=0, city_skew=1.0, genre_skew=1.0, popularity_skew=0.8,
+                 genre_weights=None, anchor=None, past_days=365, future_days=180):
+        self.random = random.Random(seed)
+        self.city_weights = zipf_weights(len(CITIES), city_skew)
+        if genre_weights:
+            self.genres = list(genre_weights)
+            self.genre_weights = [genre_weights[genre] for genre in self.genres]
+        else:
+            self.genres = GENRES
+            self.genre_weights = zipf_weights(len(GENRES), genre_skew)
+        self.popularity_skew = popularity_skew
+        # shows are placed around a day boundary, not the current second
+        self.anchor = anchor or datetime.combine(datetime.now().date(), datetime.min.time())
+        self.past_days = past_days
+        self.future_days = future_days
+
+    def name(self, nouns, i):
+        return '%s %s %s %d' % (self.random.choice(WORDS), self.random.choice(WORDS),
+                                self.random.choice(nouns), i)
+
+    def pick_genres(self):
+        count = self.random.choice((1, 1, 2, 2, 3))
+        return sorted(set(self.random.choices(self.genres, self.genre_weights, k=count)))
+
+    def venue(self, i):
+        city, state = self.random.choices(CITIES, self.city_weights)[0]
+        return {
+            'name': self.name(VENUE_NOUNS, i),
+            'city': city,
+            'state': state,
+            'address': '%d %s St' % (self.random.randint(1, 9999), self.random.choice(WORDS)),
+            'phone': '%03d-%03d-%04d' % (self.random.randint(200, 999), self.random.randint(200, 999),
+                                         self.random.randint(0, 9999)),
+            'image_link': None,
+            'facebook_link': 'https://www.facebook.com/venue%d' % i,
+            'website_link': 'https://venue%d.example.com' % i,
+            'genres': self.pick_genres(),
+            'seeking_talent': self.random.random() < 0.3,
+            'seeking_description': None,
+            'num_upcoming_shows': 0,
+        }
+
+    def artist(self, i):
+        city, state = self.random.choices(CITIES, self.city_weights)[0]
+        return {
+            'name': self.name(ARTIST_NOUNS, i),
+            'city': city,
+            'state': state,
+            'phone': None,
+            'image_link': None,
+            'facebook_link': 'https://www.facebook.com/artist%d' % i,
+            'website_link': None,
+            'genres': self.pick_genres(),
+            'seeking_venue': self.random.random() < 0.3,
+            'seeking_description': None,
+            'num_upcoming_shows': 0,
+        }
+
+    def show(self, venue_ids, venue_weights, artist_ids, artist_weights):
+        # evening slots on the half hour
+        day = self.random.randint(-self.past_days, self.future_days)
+        start_time = self.anchor + timedelta(days=day, hours=self.random.randint(18, 23),
+                                             minutes=self.random.choice((0, 30)))
+        return {
+            'venue_id': self.random.choices(venue_ids, cum_weights=venue_weights)[0],
+            'artist_id': self.random.choices(artist_ids, cum_weights=artist_weights)[0],
+            'start_time': start_time,
+        }
+
+    def shows(self, count, venue_ids, venue_weights, artist_ids, artist_weights):
+        '''Yields up to `count` shows, none double booking a venue or an artist.'''
+        availability = Availability()
+        for i in range(count):
+            for attempt in range(SHOW_TRIES):
+                show = self.show(venue_ids, venue_weights, artist_ids, artist_weights)
+                venue, artist = ('venue', show['venue_id']), ('artist', show['artist_id'])
+                if availability.is_free(venue, show['start_time']) \
+                        and availability.is_free(artist, show['start_time']):
+                    availability.book(venue, show['start_time'])
+                    availability.book(artist, show['start_time'])
+                    yield show
+                    break
+
+    def populate(self, session, venues=1000, artists=1000, shows=20000, progress=None):
+        '''Inserts the catalog in chunks and commits; returns (venue ids, artist ids).'''
+        for model, make, count in ((Venue, self.venue, venues), (Artist, self.artist, artists)):
+            insert(session, model, (make(i) for i in range(count)), progress)
+
+        # ids in insertion order, so the popular ones are stable across runs
+        venue_ids = [id for id, in session.query(Venue.id).order_by(Venue.id)]
+        artist_ids = [id for id, in session.query(Artist.id).order_by(Artist.id)]
+        if shows and venue_ids and artist_ids:
+            venue_weights = cumulative(zipf_weights(len(venue_ids), self.popularity_skew))
+            artist_weights = cumulative(zipf_weights(len(artist_ids), self.popularity_skew))
+            insert(session, Show, self.shows(shows, venue_ids, venue_weights, artist_ids, artist_weights),
+                   progress)
+
+        link_unlinked(session, Venue)
+        link_unlinked(session, Artist)
+        geocode_missing(session)
+        recount_all(session)
+        refresh_upcoming(session)
+        session.commit()
+        # core inserts skip the ORM events that drop the search index
+        drop_indexes()
+        return venue_ids, artist_ids
+
+def cumulative(weights):
+    total, sums = 0, []
+    for weight in weights:
+        total += weight
+        sums.append(total)
+    return sums
+
+def insert(session, model, rows, progress=None):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            session.execute(model.__table__.insert(), chunk)
+            if progress:
+                progress(model.__tablename__, len(chunk))
+            chunk = []
+    if chunk:
+        session.execute(model.__table__.insert(), chunk)
+        if progress:
+            progress(model.__tablename__, len(chunk))
@@ -0,0 +1,49 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+from jinja2 import FileSystemBytecodeCache
+
+#----------------------------------------------------------------------------#
+# Template loading.
+#
+# Jinja compiles a template to Python on its first render in each worker,
+# and with auto-reload on it also stats the source on every render. In
+# production, `flask fyyur-compile-templates` writes the compiled bytecode
+# of every template to TEMPLATE_BYTECODE_CACHE_DIR at deploy time. Workers
+# then load templates from there instead of compiling them, with
+# TEMPLATE_PRELOAD doing it before the first request arrives. Bytecode is
+# keyed on the template source, so a stale cache only costs a recompile.
+#----------------------------------------------------------------------------#
+
+def template_names(env):
+    # pages/home.css lives among the templates but is not one
+    return env.list_templates(extensions=['html'])
+
+def load_templates(env):
+    '''Loads every template into `env`'s cache, compiling those the bytecode cache lacks; returns their names.'''
+    names = template_names(env)
+    for name in names:
+        env.get_template(name)
+    return names
+
+def init_templates(app):
+    '''Installs the bytecode cache named by TEMPLATE_BYTECODE_CACHE_DIR and honours TEMPLATE_PRELOAD.'''
+    directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    if app.config.get('TEMPLATE_PRELOAD'):
+        load_templates(app.jinja_env)
+
+def compile_templates(app, directory):
+    '''Writes the bytecode of every template to `directory`; returns how many were compiled.'''
+    os.makedirs(directory, exist_ok=True)
+    # a fresh environment, so templates already loaded by the app compile again
+    env = app.create_jinja_environment()
+    env.filters.update(app.jinja_env.filters)
+    env.tests.update(app.jinja_env.tests)
+    env.globals.update(app.jinja_env.globals)
+    env.bytecode_cache = FileSystemBytecodeCache(directory)
+    return len(load_templates(env))
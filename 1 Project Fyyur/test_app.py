@@ -0,0 +1,1236 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from app import app, page_cache, profiler, replicas, detail_executor, deletion_executor
+from models import db, Venue, Artist, Show, UpcomingShow
+from instrumentation import QueryCounter
+from queries import venue_areas, venue_detail, artist_detail, venue_detail_fanned_out, artist_detail_fanned_out
+from counters import count_new_show, roll_forward, stale_counters, recount_all
+from search import search, install_postgres_search
+from pagination import keyset_page, encode_cursor
+from formatting import format_datetime
+from cache import MemoryBackend, RedisBackend, PageCache
+from pool import MeteredQueuePool
+from synthetic import Generator
+from genres import link_unlinked, GENRES
+from upcoming import refresh_upcoming
+from bookings import Availability, find_conflicts, install_postgres_bookings
+from edits import apply_edit, EditConflict
+from geo import geocode_missing, distance_km
+from centroids import CITY_CENTROIDS
+from templating import init_templates, template_names
+from assets import init_assets, load_manifest, minify_css, BUNDLES, FILES
+from routing import STICKY_COOKIE
+from autocomplete import PrefixIndex
+from partitions import archive_shows, add_months, month_start, partition_name, partition_month, \
+    install_postgres_partitions
+from jinja2 import FileSystemBytecodeCache
+import loadtest
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+
+
+class RedisStandIn:
+    '''The redis-py calls RedisBackend makes, held in a dict.'''
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key) or 0) + 1).encode()
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.db_fd, self.database_path = tempfile.mkstemp(suffix='.db')
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.database_path
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['PAGE_CACHE_ENABLED'] = False
+        self.client = app.test_client
+
+        # binds the app to the current context
+        self.ctx = app.app_context()
+        self.ctx.push()
+        # create all tables
+        db.create_all()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        os.close(self.db_fd)
+        os.unlink(self.database_path)
+
+    def create_venue(self, name, city='San Francisco', state='CA'):
+        venue = Venue(name=name, city=city, state=state, address='1 Main St')
+        db.session.add(venue)
+        db.session.commit()
+        return venue
+
+    def create_artist(self, name):
+        artist = Artist(name=name, city='San Francisco', state='CA')
+        db.session.add(artist)
+        db.session.commit()
+        return artist
+
+    def wait_for_deletions(self):
+        # the deletion worker is one thread, so this runs after every job queued so far
+        deletion_executor.submit(lambda: None).result()
+        db.session.remove()
+
+    def create_show(self, artist, venue, days_from_now):
+        show = Show(artist_id=artist.id, venue_id=venue.id,
+                    start_time=datetime.now() + timedelta(days=days_from_now))
+        db.session.add(show)
+        count_new_show(db.session, show)
+        db.session.commit()
+        return show
+
+    # test that venues are grouped once per city/state with upcoming counts
+    def test_venue_areas_grouped_by_city_and_state(self):
+        artist = self.create_artist('The Wild Sax Band')
+        musical_hop = self.create_venue('The Musical Hop')
+        dueling_pianos = self.create_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        self.create_venue('Park Square Live Music & Coffee')
+        self.create_show(artist, musical_hop, 1)
+        self.create_show(artist, musical_hop, 2)
+        self.create_show(artist, musical_hop, -1)
+
+        areas = venue_areas()
+
+        self.assertEqual([(area['city'], area['state']) for area in areas],
+                         [('San Francisco', 'CA'), ('New York', 'NY')])
+        counts = {venue['name']: venue['num_upcoming_shows'] for area in areas for venue in area['venues']}
+        self.assertEqual(counts, {
+            'The Musical Hop': 2,
+            'Park Square Live Music & Coffee': 0,
+            'The Dueling Pianos Bar': 0,
+        })
+
+    # test that the venues page costs the same queries however many venues exist
+    def test_venues_page_query_count_is_constant(self):
+        artist = self.create_artist('The Wild Sax Band')
+        venue = self.create_venue('The Musical Hop')
+        self.create_show(artist, venue, 1)
+
+        with QueryCounter() as small:
+            response = self.client().get('/venues')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'The Musical Hop', response.data)
+
+        for i in range(20):
+            venue = self.create_venue('Venue %d' % i, 'City %d' % i, 'NY')
+            self.create_show(artist, venue, 1)
+
+        with QueryCounter() as large:
+            response = self.client().get('/venues')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(small.count, large.count)
+
+    # test that the venue page splits past and upcoming shows with their artists
+    def test_show_venue_splits_past_and_upcoming(self):
+        artist = self.create_artist('Guns N Petals')
+        venue = self.create_venue('The Musical Hop')
+        self.create_show(artist, venue, 1)
+        self.create_show(artist, venue, -1)
+        self.create_show(artist, venue, -2)
+
+        data = venue_detail(venue.id)
+
+        self.assertEqual(data['upcoming_shows_count'], 1)
+        self.assertEqual(data['past_shows_count'], 2)
+        self.assertEqual(data['upcoming_shows'][0]['artist_name'], 'Guns N Petals')
+
+    # test that detail pages stay within their query budget however many shows exist
+    def test_detail_pages_query_budget(self):
+        venue = self.create_venue('The Musical Hop')
+        artist = self.create_artist('Guns N Petals')
+        for i in range(10):
+            other = self.create_artist('Artist %d' % i)
+            self.create_show(other, venue, i - 5)
+            self.create_show(artist, self.create_venue('Venue %d' % i), i - 5)
+        # read before counting; the committed instances would reload
+        venue_id, artist_id = venue.id, artist.id
+
+        with QueryCounter() as counter:
+            response = self.client().get('/venues/%d' % venue_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(counter.count, 3)
+
+        with QueryCounter() as counter:
+            response = self.client().get('/artists/%d' % artist_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Venue 9', response.data)
+        self.assertLessEqual(counter.count, 3)
+
+    # test that fanned-out detail pages match the eager loaded ones and count their queries
+    def test_detail_pages_fanned_out(self):
+        venue = self.create_venue('The Musical Hop')
+        artist = self.create_artist('Guns N Petals')
+        for days in (-3, -1, 2, 5):
+            self.create_show(artist, venue, days)
+        venue_id, now = venue.id, datetime.now()
+
+        with QueryCounter() as counter:
+            data = venue_detail_fanned_out(venue_id, detail_executor, now)
+        self.assertEqual(counter.count, 3)
+        self.assertEqual(data, venue_detail(venue_id, now))
+        self.assertEqual(artist_detail_fanned_out(artist.id, detail_executor, now), artist_detail(artist.id, now))
+        self.assertIsNone(venue_detail_fanned_out(1000, detail_executor))
+
+        app.config['DETAIL_PAGE_FAN_OUT'] = True
+        self.addCleanup(app.config.update, DETAIL_PAGE_FAN_OUT=False)
+        response = self.client().get('/artists/%d' % artist.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'The Musical Hop', response.data)
+        self.assertEqual(self.client().get('/venues/1000').status_code, 404)
+
+    # test that the upcoming calendar lists upcoming shows in range and follows writes
+    def test_upcoming_shows_calendar(self):
+        artist = self.create_artist('Guns N Petals')
+        venue = self.create_venue('The Musical Hop')
+        other = self.create_venue('Park Square Live Music & Coffee')
+        self.create_show(artist, venue, -1)
+        self.create_show(artist, venue, 2)
+        self.create_show(artist, other, 10)
+        self.assertEqual(refresh_upcoming(db.session), 2)
+        db.session.commit()
+        artist_id, venue_id, other_id = artist.id, venue.id, other.id
+        db.session.remove()
+
+        # created shows join the calendar without a refresh
+        start_time = (datetime.now() + timedelta(days=4)).strftime('%Y-%m-%d %H:%M:%S')
+        self.client().post('/shows/create', data={'artist_id': artist_id, 'venue_id': other_id, 'start_time': start_time})
+        self.assertEqual(UpcomingShow.query.count(), 3)
+
+        response = self.client().get('/shows?window=upcoming&per_page=2')
+        self.assertEqual(response.data.count(b'playing at'), 2)
+        self.assertIn(b'window=upcoming', response.data)
+        to = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d')
+        response = self.client().get('/shows?window=upcoming&to=' + to)
+        self.assertEqual(response.data.count(b'playing at'), 1)
+        self.assertEqual(self.client().get('/shows?window=upcoming&from=someday').status_code, 400)
+
+        # renames are copied over, deletes take their calendar rows along
+        db.session.get(Venue, venue_id).name = 'The Musical Hop Annex'
+        db.session.commit()
+        self.assertIn(b'The Musical Hop Annex', self.client().get('/shows?window=upcoming').data)
+        db.session.remove()
+        self.client().delete('/venues/%d' % other_id)
+        self.assertEqual([row.venue_id for row in UpcomingShow.query], [venue_id])
+
+    # test that a missing venue or artist is a 404
+    def test_404_missing_detail_page(self):
+        self.assertEqual(self.client().get('/venues/1000').status_code, 404)
+        self.assertEqual(self.client().get('/artists/1000').status_code, 404)
+
+    # test that posting a show bumps both upcoming show counters
+    def test_create_show_counts_upcoming(self):
+        artist_id = self.create_artist('Guns N Petals').id
+        venue_id = self.create_venue('The Musical Hop').id
+        start_time = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+        db.session.remove()
+
+        response = self.client().post('/shows/create', data={
+            'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.get(Venue, venue_id).num_upcoming_shows, 1)
+        self.assertEqual(db.session.get(Artist, artist_id).num_upcoming_shows, 1)
+
+    # test that a show double booking a venue or an artist is refused
+    def test_create_show_refuses_double_booking(self):
+        artist_id = self.create_artist('Guns N Petals').id
+        other_artist_id = self.create_artist('Matt Quevedo').id
+        venue_id = self.create_venue('The Musical Hop').id
+        other_venue_id = self.create_venue('The Dueling Pianos Bar').id
+        start = datetime.now() + timedelta(days=3)
+        db.session.remove()
+
+        def post(artist_id, venue_id, start_time):
+            return self.client().post('/shows/create', data={
+                'artist_id': artist_id, 'venue_id': venue_id,
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')})
+
+        post(artist_id, venue_id, start)
+        self.assertIn(b'already booked', post(other_artist_id, venue_id, start + timedelta(hours=2)).data)
+        self.assertIn(b'already booked', post(artist_id, other_venue_id, start - timedelta(hours=1)).data)
+        self.assertIn(b'successfully listed', post(other_artist_id, venue_id, start + timedelta(hours=3)).data)
+        self.assertEqual(Show.query.count(), 2)
+        self.assertEqual(list(find_conflicts(db.session)), [])
+
+        result = app.test_cli_runner().invoke(args=['fyyur-conflicts'])
+        self.assertIn('0 conflicts.', result.output)
+        self.assertEqual(result.exit_code, 0)
+
+    # test that availability checks and the conflict report agree on overlaps
+    def test_availability_and_conflict_report(self):
+        start = datetime(2026, 5, 1, 20, 0)
+        availability = Availability()
+        availability.book(('venue', 1), start)
+        self.assertFalse(availability.is_free(('venue', 1), start + timedelta(hours=2, minutes=59)))
+        self.assertFalse(availability.is_free(('venue', 1), start - timedelta(hours=1)))
+        self.assertTrue(availability.is_free(('venue', 1), start + timedelta(hours=3)))
+        self.assertTrue(availability.is_free(('venue', 1), start - timedelta(hours=3)))
+        self.assertTrue(availability.is_free(('venue', 2), start))
+
+        artist = self.create_artist('Guns N Petals')
+        venue = self.create_venue('The Musical Hop')
+        other = self.create_venue('The Dueling Pianos Bar')
+        first = Show(artist_id=artist.id, venue_id=venue.id, start_time=start)
+        second = Show(artist_id=artist.id, venue_id=other.id, start_time=start + timedelta(hours=1))
+        db.session.add_all([first, second, Show(artist_id=artist.id, venue_id=venue.id,
+                                                start_time=start + timedelta(days=1))])
+        db.session.commit()
+        self.assertEqual(list(find_conflicts(db.session)), [('artist', artist.id, first.id, second.id)])
+
+        result = app.test_cli_runner().invoke(args=['fyyur-conflicts'])
+        self.assertIn('artist %d: show %d overlaps show %d' % (artist.id, first.id, second.id), result.output)
+        self.assertEqual(result.exit_code, 1)
+
+    # test that read-only views read from healthy replicas and writers read their own writes
+    def test_replica_routing(self):
+        venue_id = self.create_venue('The Musical Hop').id
+        db.session.remove()
+        # two replicas caught up with the primary, and one that is down
+        replica_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, replica_dir)
+        urls = []
+        for name in ('first.db', 'second.db'):
+            shutil.copy(self.database_path, os.path.join(replica_dir, name))
+            urls.append('sqlite:///' + os.path.join(replica_dir, name))
+        urls.append('sqlite:///' + os.path.join(replica_dir, 'missing', 'down.db'))
+        self.addCleanup(app.config.update, SQLALCHEMY_REPLICA_URIS=app.config['SQLALCHEMY_REPLICA_URIS'])
+        app.config['SQLALCHEMY_REPLICA_URIS'] = urls
+        # written after the copy, so the replicas have not seen it yet
+        self.create_venue('The Dueling Pianos Bar')
+        db.session.remove()
+
+        client = self.client()
+        for i in range(4):
+            response = client.get('/venues')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'The Musical Hop', response.data)
+            self.assertNotIn(b'The Dueling Pianos Bar', response.data)
+        self.assertEqual([(replica['healthy'], replica['selected']) for replica in replicas.info()],
+                         [(True, 2), (True, 2), (False, 0)])
+        # forms and other write views read from the primary
+        self.assertIn(b'name="version" value="1"', client.get('/venues/%d/edit' % venue_id).data)
+
+        form = {'name': 'The Musical Hop Annex', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+                'phone': '', 'image_link': '', 'facebook_link': '', 'website_link': '',
+                'seeking_talent': 'y', 'seeking_description': '', 'version': '1'}
+        response = client.post('/venues/%d/edit' % venue_id, data=form, follow_redirects=True)
+        self.assertIn(b'The Musical Hop Annex', response.data)
+        self.assertIn(b'The Dueling Pianos Bar', client.get('/venues').data)
+        # other clients, and this one once the window has passed, go back to the replicas
+        self.assertNotIn(b'The Musical Hop Annex', self.client().get('/venues').data)
+        client.delete_cookie('localhost', STICKY_COOKIE)
+        self.assertNotIn(b'The Musical Hop Annex', client.get('/venues/%d' % venue_id).data)
+
+        app.config['REPLICA_SELECTION'] = 'least_connections'
+        self.addCleanup(app.config.update, REPLICA_SELECTION='round_robin')
+        self.assertIn(b'The Musical Hop', self.client().get('/api/v1/venues').data)
+
+    # test that an edit writes only changed columns, skips no-ops and refuses stale versions
+    def test_edit_statement_count_and_versions(self):
+        venue_id = self.create_venue('The Musical Hop').id
+        db.session.remove()
+        self.assertIn(b'name="version" value="1"', self.client().get('/venues/%d/edit' % venue_id).data)
+        form = {'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+                'phone': '', 'image_link': '', 'facebook_link': '', 'website_link': '',
+                'seeking_talent': 'y', 'seeking_description': '', 'version': '1'}
+
+        with QueryCounter() as counter:
+            self.client().post('/venues/%d/edit' % venue_id, data=form)
+        self.assertEqual(counter.count, 1)
+
+        with QueryCounter() as counter:
+            self.client().post('/venues/%d/edit' % venue_id, data=dict(form, phone='123-123-1234'))
+        self.assertEqual(counter.count, 2)
+        self.assertIn('phone', counter.statements[1])
+        self.assertNotIn('address', counter.statements[1])
+        venue = db.session.get(Venue, venue_id)
+        self.assertEqual((venue.phone, venue.version), ('123-123-1234', 2))
+        db.session.remove()
+
+        # a second editor still holding version 1 is turned away
+        with QueryCounter() as counter:
+            response = self.client().post('/venues/%d/edit' % venue_id, data=dict(form, address='2 Main St'),
+                                          follow_redirects=True)
+        self.assertIn(b'changed by someone else', response.data)
+        self.assertNotIn('UPDATE', ' '.join(counter.statements))
+        self.assertEqual(db.session.get(Venue, venue_id).address, '1 Main St')
+
+        # and so is one overtaken between loading the row and flushing it
+        db.session.get(Venue, venue_id)
+        with db.engine.begin() as connection:
+            connection.execute(Venue.__table__.update().values(version=Venue.version + 1))
+        with self.assertRaises(EditConflict):
+            apply_edit(db.session, Venue, venue_id, {'name': 'The Musical Hop Annex'}, 2)
+
+    # test that deleting a venue takes its shows off the artists' counters
+    def test_delete_venue_updates_artist_counter(self):
+        artist = self.create_artist('Guns N Petals')
+        kept = self.create_venue('The Musical Hop')
+        doomed = self.create_venue('The Dueling Pianos Bar')
+        self.create_show(artist, kept, 1)
+        self.create_show(artist, doomed, 1)
+        self.create_show(artist, doomed, 2)
+        artist_id, doomed_id = artist.id, doomed.id
+        db.session.remove()
+
+        response = self.client().delete('/venues/%d' % doomed_id)
+        self.assertEqual(response.status_code, 200)
+        self.wait_for_deletions()
+
+        self.assertIsNone(db.session.get(Venue, doomed_id))
+        self.assertEqual(db.session.get(Artist, artist_id).num_upcoming_shows, 1)
+        self.assertEqual(stale_counters(db.session), [])
+
+    # test that a deleted venue disappears at once and its shows go in batches
+    def test_soft_delete_with_background_cascade(self):
+        self.addCleanup(app.config.update, DELETION_BATCH_SIZE=app.config['DELETION_BATCH_SIZE'])
+        app.config['DELETION_BATCH_SIZE'] = 2
+        artist = self.create_artist('Guns N Petals')
+        kept = self.create_venue('The Musical Hop')
+        doomed = self.create_venue('The Dueling Pianos Bar')
+        self.create_show(artist, kept, 1)
+        for days in (2, 3, 4, -1, -2):
+            self.create_show(artist, doomed, days)
+        refresh_upcoming(db.session)
+        db.session.commit()
+        artist_id, doomed_id = artist.id, doomed.id
+        db.session.remove()
+
+        # hold the worker back until the hidden venue has been checked everywhere
+        gate = threading.Event()
+        deletion_executor.submit(gate.wait)
+        try:
+            response = self.client().delete('/venues/%d' % doomed_id)
+            self.assertEqual(response.status_code, 200)
+            job = response.get_json()
+            self.assertTrue(job['success'])
+            status = self.client().get(job['status_url']).get_json()
+            self.assertEqual((status['status'], status['shows_total'], status['shows_deleted']), ('queued', 5, 0))
+            self.assertEqual(self.client().get('/venues/%d' % doomed_id).status_code, 404)
+            self.assertEqual(self.client().get('/venues/%d/edit' % doomed_id).status_code, 404)
+            self.assertNotIn(b'The Dueling Pianos Bar', self.client().get('/venues').data)
+            self.assertNotIn(b'The Dueling Pianos Bar', self.client().get('/shows').data)
+            self.assertNotIn(b'The Dueling Pianos Bar', self.client().get('/shows?window=upcoming').data)
+            self.assertNotIn(b'The Dueling Pianos Bar', self.client().get('/venues/search?search_term=Pianos').data)
+            self.assertNotIn(b'The Dueling Pianos Bar', self.client().get('/artists/%d' % artist_id).data)
+            self.assertNotIn(b'The Dueling Pianos Bar', self.client().get('/api/v1/venues').data)
+            self.assertEqual(len(self.client().get('/api/v1/shows?fields=id').get_json()['data']), 1)
+            # the listings stop counting its upcoming shows right away
+            artists = self.client().get('/api/v1/artists?fields=id,num_upcoming_shows').get_json()['data']
+            self.assertEqual(artists, [{'id': artist_id, 'num_upcoming_shows': 1}])
+            self.assertEqual(stale_counters(db.session), [])
+            self.assertEqual(self.client().delete('/venues/%d' % doomed_id).get_json(), {'success': False})
+            db.session.remove()
+        finally:
+            gate.set()
+        self.wait_for_deletions()
+
+        status = self.client().get(job['status_url']).get_json()
+        self.assertEqual((status['status'], status['shows_deleted']), ('done', 5))
+        self.assertIsNone(db.session.get(Venue, doomed_id))
+        self.assertEqual(Show.query.count(), 1)
+        self.assertEqual(db.session.get(Artist, artist_id).num_upcoming_shows, 1)
+        self.assertEqual(stale_counters(db.session), [])
+        self.assertEqual(self.client().get('/deletions/%d' % (job['job_id'] + 1)).status_code, 404)
+
+    # test that deleting a missing or already deleted row fails cleanly
+    def test_delete_missing_or_deleted(self):
+        venue_id = self.create_venue('The Musical Hop').id
+        artist_id = self.create_artist('Guns N Petals').id
+        db.session.remove()
+
+        client = self.client()
+        for path in ('/venues/%d' % (venue_id + 1), '/artists/%d' % (artist_id + 1)):
+            self.assertEqual(client.delete(path).get_json(), {'success': False})
+        for path in ('/venues/%d' % venue_id, '/artists/%d' % artist_id):
+            self.assertTrue(client.delete(path).get_json()['success'])
+            self.assertEqual(client.delete(path).get_json(), {'success': False})
+        self.wait_for_deletions()
+
+        with client.session_transaction() as session:
+            flashes = [message for category, message in session['_flashes']]
+        self.assertEqual(flashes, ['Venue %d was not found' % (venue_id + 1),
+                                   'Artist %d was not found' % (artist_id + 1),
+                                   'Venue The Musical Hop was deleted', 'Venue %d was not found' % venue_id,
+                                   'Artist Guns N Petals was deleted', 'Artist %d was not found' % artist_id])
+
+    # test that rolling forward recounts shows that moved into the past
+    def test_roll_forward_counters(self):
+        artist = self.create_artist('Guns N Petals')
+        venue = self.create_venue('The Musical Hop')
+        show = self.create_show(artist, venue, 1)
+        self.create_show(artist, venue, 5)
+
+        later = show.start_time + timedelta(minutes=10)
+        self.assertEqual(len(stale_counters(db.session, now=later)), 2)
+        roll_forward(db.session, timedelta(hours=1), now=later)
+        db.session.commit()
+
+        self.assertEqual(stale_counters(db.session, now=later), [])
+        self.assertEqual(db.session.get(Venue, venue.id).num_upcoming_shows, 1)
+
+    # test that drifted counters are reported and rebuilt
+    def test_check_and_recount_counters(self):
+        venue = self.create_venue('The Musical Hop')
+        self.create_show(self.create_artist('Guns N Petals'), venue, 1)
+        venue.num_upcoming_shows = 7
+        db.session.commit()
+
+        self.assertEqual(stale_counters(db.session), [('venues', venue.id, 7, 1)])
+        recount_all(db.session)
+        db.session.commit()
+        self.assertEqual(stale_counters(db.session), [])
+
+    # test that search matches name, city and genres and ranks by name similarity
+    def test_search_ranks_matches(self):
+        self.create_venue('The Musical Hop')
+        self.create_venue('Musical Hop Annex', 'Seattle', 'WA')
+        self.create_venue('Park Square Live Music & Coffee')
+        dueling = self.create_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        dueling.genres = ['Classical', 'R&B']
+        db.session.commit()
+
+        total, rows = search(Venue, 'musical hop')
+        self.assertEqual(total, 2)
+        self.assertEqual([row.name for row in rows], ['The Musical Hop', 'Musical Hop Annex'])
+        self.assertEqual([row.name for row in search(Venue, 'SEATTLE')[1]], ['Musical Hop Annex'])
+        self.assertEqual([row.name for row in search(Venue, 'classical')[1]], ['The Dueling Pianos Bar'])
+        self.assertEqual(search(Venue, 'no such venue'), (0, []))
+
+    # test that search results are paginated
+    def test_search_pagination(self):
+        for i in range(25):
+            self.create_artist('Band %02d' % i)
+
+        response = self.client().post('/artists/search', data={'search_term': 'band'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b': 25</h3>', response.data)
+        self.assertIn(b'Band 19', response.data)
+        self.assertNotIn(b'Band 20', response.data)
+
+        response = self.client().get('/artists/search?search_term=band&page=2')
+        self.assertIn(b'Band 24', response.data)
+        self.assertNotIn(b'Band 19', response.data)
+
+    # test that search sees rows bulk loaded through Core, here and in other processes
+    def test_search_sees_bulk_loads(self):
+        self.create_venue('The Musical Hop')
+        self.assertEqual(search(Venue, 'hall'), (0, []))
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        venues_path = os.path.join(directory, 'venues.csv')
+        with open(venues_path, 'w') as venues:
+            venues.write('name,city,state,address,genres,facebook_link\n')
+            venues.write('Green Hall,San Francisco,CA,2 Main St,Jazz,https://www.facebook.com/greenhall\n')
+        app.test_cli_runner().invoke(args=['fyyur-import', 'venues', venues_path])
+        self.assertEqual([row.name for row in search(Venue, 'hall')[1]], ['Green Hall'])
+
+        # as another process would: nothing here drops the index
+        db.session.execute(Venue.__table__.insert(), [{'name': 'Blue Hall', 'city': 'San Francisco',
+                                                      'state': 'CA', 'address': '3 Main St',
+                                                      'genres': ['Jazz'], 'num_upcoming_shows': 0}])
+        db.session.commit()
+        self.assertEqual(search(Venue, 'hall')[0], 1)
+        app.config['SEARCH_INDEX_REBUILD_SECONDS'] = 0.01
+        self.addCleanup(app.config.update, SEARCH_INDEX_REBUILD_SECONDS=60)
+        time.sleep(0.02)
+        self.assertEqual([row.name for row in search(Venue, 'hall')[1]], ['Blue Hall', 'Green Hall'])
+
+    # test that ORM writes update the search index in place instead of dropping it
+    def test_search_index_follows_orm_writes(self):
+        hop = self.create_venue('The Musical Hop')
+        self.create_venue('Park Square Live Music & Coffee')
+        self.assertEqual(search(Venue, 'hall'), (0, []))
+
+        def searched(term):
+            # one query for the page rows: the index was not rebuilt
+            with QueryCounter() as counter:
+                names = [row.name for row in search(Venue, term)[1]]
+            self.assertEqual(counter.count, 1)
+            return names
+
+        self.create_venue('Green Hall')
+        hop.name = 'The Musical Hall'
+        db.session.commit()
+        self.assertEqual(searched('hall'), ['Green Hall', 'The Musical Hall'])
+        self.assertEqual(searched('hop'), [])
+
+        hop.deleted_at = datetime.now()
+        db.session.commit()
+        self.assertEqual(searched('hall'), ['Green Hall'])
+
+        park = Venue.query.filter_by(name='Park Square Live Music & Coffee').one()
+        park.city = 'Hall Town'
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(searched('hall'), ['Green Hall'])
+
+    # test that listings seek forwards and backwards with cursors
+    def test_keyset_pagination(self):
+        for i in range(5):
+            self.create_artist('Band %d' % i)
+
+        first = keyset_page(Artist.query.with_entities(Artist.id, Artist.name), (Artist.name, Artist.id), per_page=2)
+        self.assertEqual([row.name for row in first.rows], ['Band 0', 'Band 1'])
+        self.assertFalse(first.has_prev)
+
+        second = keyset_page(Artist.query.with_entities(Artist.id, Artist.name), (Artist.name, Artist.id),
+                             after=first.next_cursor, per_page=2)
+        self.assertEqual([row.name for row in second.rows], ['Band 2', 'Band 3'])
+
+        back = keyset_page(Artist.query.with_entities(Artist.id, Artist.name), (Artist.name, Artist.id),
+                           before=second.prev_cursor, per_page=2)
+        self.assertEqual([row.name for row in back.rows], ['Band 0', 'Band 1'])
+        self.assertFalse(back.has_prev)
+        self.assertEqual(back.next_cursor, first.next_cursor)
+
+    # test that the listing pages render one page at a time with pager links
+    def test_listing_pages_are_paginated(self):
+        artist = self.create_artist('Guns N Petals')
+        for i in range(3):
+            self.create_show(artist, self.create_venue('Venue %d' % i), i + 1)
+
+        response = self.client().get('/shows?per_page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.count(b'tile-show'), 2)
+        self.assertIn(b'Next', response.data)
+
+        response = self.client().get('/venues?per_page=2')
+        self.assertIn(b'Venue 1', response.data)
+        self.assertNotIn(b'Venue 2', response.data)
+
+        response = self.client().get('/artists')
+        self.assertIn(b'Guns N Petals', response.data)
+        self.assertNotIn(b'Next', response.data)
+
+    # test that a tampered cursor is a bad request
+    def test_400_invalid_cursor(self):
+        self.assertEqual(self.client().get('/shows?after=not-a-cursor').status_code, 400)
+        # well-formed JSON with values of the wrong type
+        for path, values in (('/shows', [12, 1]), ('/shows', [['2026-05-21T21:30:00'], 1]),
+                             ('/shows', ['2026-05-21T21:30:00', '1']), ('/artists', ['Band', True]),
+                             ('/artists', [None, 1])):
+            self.assertEqual(self.client().get('%s?after=%s' % (path, encode_cursor(values))).status_code, 400)
+
+    # test that the datetime filter takes datetimes and strings alike
+    def test_format_datetime(self):
+        value = datetime(2026, 5, 21, 21, 30)
+        self.assertEqual(format_datetime(value, 'full'), 'Thursday May, 21, 2026 at 9:30PM')
+        self.assertEqual(format_datetime(str(value), 'full'), 'Thursday May, 21, 2026 at 9:30PM')
+        self.assertEqual(format_datetime(value), 'Thu 05, 21, 2026 9:30PM')
+        self.assertEqual(format_datetime(value, 'yyyy-MM-dd'), '2026-05-21')
+
+    # test that cached pages are served without queries until a write invalidates them
+    def test_page_cache_invalidated_by_writes(self):
+        app.config['PAGE_CACHE_ENABLED'] = True
+        page_cache.clear()
+        artist_id = self.create_artist('Guns N Petals').id
+        venue_id = self.create_venue('The Musical Hop').id
+        self.create_show(db.session.get(Artist, artist_id), db.session.get(Venue, venue_id), 1)
+        db.session.remove()
+
+        self.assertEqual(self.client().get('/shows').data.count(b'tile-show'), 1)
+        with QueryCounter() as counter:
+            response = self.client().get('/shows')
+        self.assertEqual(counter.count, 0)
+        self.assertEqual(response.data.count(b'tile-show'), 1)
+
+        start_time = (datetime.now() + timedelta(days=2)).strftime('%Y-%m-%d %H:%M:%S')
+        self.client().post('/shows/create', data={
+            'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time})
+
+        self.assertEqual(self.client().get('/shows').data.count(b'tile-show'), 2)
+        self.assertGreaterEqual(page_cache.info()['hits'], 1)
+
+    # test the LRU backend's eviction and expiry accounting
+    def test_memory_cache_backend(self):
+        backend = MemoryBackend(max_entries=2, ttl=60)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), 1)
+
+        backend.set('stale', 4, ttl=-1)
+        self.assertIsNone(backend.get('c'))
+        self.assertIsNone(backend.get('stale'))
+        self.assertEqual(backend.info()['evictions'], 2)
+        self.assertEqual(backend.info()['expirations'], 1)
+
+    # test the redis backend against an in-memory stand-in client
+    def test_redis_cache_backend(self):
+        backend = RedisBackend(RedisStandIn())
+        backend.set('page', (b'<html>', 'text/html'))
+        self.assertEqual(backend.get('page'), (b'<html>', 'text/html'))
+        self.assertEqual(backend.generation('venues'), 0)
+        backend.bump('venues')
+        self.assertEqual(backend.generation('venues'), 1)
+        self.assertEqual(backend.info()['hits'], 1)
+
+    # test that bulk import validates with the forms, resolves names and counts shows
+    def test_bulk_import(self):
+        self.create_artist('Guns N Petals')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        venues_path = os.path.join(directory, 'venues.csv')
+        with open(venues_path, 'w') as venues:
+            venues.write('name,city,state,address,genres,facebook_link\n')
+            venues.write('The Musical Hop,San Francisco,CA,1015 Folsom Street,Jazz;Reggae,https://www.facebook.com/TheMusicalHop\n')
+            venues.write('Nowhere,San Francisco,ZZ,1 Main St,Jazz,https://www.facebook.com/nowhere\n')
+        shows_path = os.path.join(directory, 'shows.jsonl')
+        start_time = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+        with open(shows_path, 'w') as shows:
+            shows.write(json.dumps({'venue_name': 'The Musical Hop', 'artist_name': 'Guns N Petals', 'start_time': start_time}) + '\n')
+            shows.write(json.dumps({'venue_name': 'The Musical Hop', 'artist_name': 'Nobody', 'start_time': start_time}) + '\n')
+            shows.write('not json\n')
+            overlap = (datetime.now() + timedelta(days=1, hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+            shows.write(json.dumps({'venue_name': 'The Musical Hop', 'artist_name': 'Guns N Petals', 'start_time': overlap}) + '\n')
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['fyyur-import', 'venues', venues_path, '--batch-size', '1'])
+        self.assertIn('venues: 2 read, 1 imported, 1 rejected', result.output)
+        result = runner.invoke(args=['fyyur-import', 'shows', shows_path])
+        self.assertIn('shows: 4 read, 1 imported, 3 rejected', result.output)
+
+        venue = Venue.query.filter_by(name='The Musical Hop').one()
+        self.assertEqual(venue.genres, ['Jazz', 'Reggae'])
+        self.assertEqual(venue.num_upcoming_shows, 1)
+        self.assertEqual(stale_counters(db.session), [])
+        with open(shows_path + '.rejects.jsonl') as rejects:
+            rejected = [json.loads(line) for line in rejects]
+        self.assertEqual([row['line'] for row in rejected], [2, 3, 4])
+        self.assertIn("unknown artist 'Nobody'", rejected[0]['errors']['artist_id'])
+        self.assertIn('overlaps', rejected[2]['errors']['start_time'][0])
+        self.assertIn(b'The Musical Hop', self.client().get('/venues?genre=Reggae').data)
+
+    # test that pool settings reach the engine and the pool is metered
+    def test_connection_pool_settings_and_metrics(self):
+        app.config.update(DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0, DB_POOL_TIMEOUT=1, DB_STATEMENT_TIMEOUT_MS=5000)
+        self.addCleanup(app.config.update, DB_POOL_SIZE=5, DB_MAX_OVERFLOW=10, DB_POOL_TIMEOUT=30,
+                        DB_STATEMENT_TIMEOUT_MS=0)
+        url, options = db.apply_driver_hacks(app, make_url('postgresql://fyyur@localhost/fyyur'), {})
+        self.assertIs(options['poolclass'], MeteredQueuePool)
+        self.assertEqual((options['pool_size'], options['max_overflow']), (1, 0))
+        self.assertEqual(options['connect_args']['options'], '-c statement_timeout=5000')
+
+        # the same pool over SQLite, so checkouts can actually run
+        options.update(pool_timeout=0.05, connect_args={})
+        engine = db.create_engine(make_url('sqlite:///' + self.database_path), options)
+        self.addCleanup(engine.dispose)
+        with engine.connect():
+            self.assertRaises(exc.TimeoutError, engine.connect)
+            info = db.pool_metrics[engine].info(engine.pool)
+            self.assertEqual((info['checked_out'], info['overflow'], info['max_connections']), (1, 0, 1))
+        info = db.pool_metrics[engine].info(engine.pool)
+        self.assertEqual((info['checkouts'], info['checkins'], info['timeouts']), (1, 1, 1))
+        self.assertGreaterEqual(info['wait_ms_max'], 50)
+
+        app.config['INTERNAL_ENDPOINTS'] = False
+        self.assertEqual(self.client().get('/internal/pool').status_code, 404)
+        app.config['INTERNAL_ENDPOINTS'] = True
+        self.addCleanup(app.config.update, INTERNAL_ENDPOINTS=False)
+        res = self.client().get('/internal/pool')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['pool'], 'NullPool')
+
+    # test that the synthetic catalog is deterministic, skewed and consistently counted
+    def test_synthetic_catalog(self):
+        anchor = datetime(2026, 1, 1)
+        Generator(seed=3, city_skew=2.0, anchor=anchor).populate(db.session, venues=200, artists=50, shows=500)
+        first = db.session.query(Venue.name, Venue.city, Venue.genres).order_by(Venue.id).all()
+        shows = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).order_by(Show.id).all()
+        self.assertEqual((len(first), len(shows)), (200, 500))
+        self.assertEqual(stale_counters(db.session), [])
+        cities = [city for name, city, genres in first]
+        self.assertGreater(cities.count('New York'), cities.count('Minneapolis'))
+
+        db.drop_all()
+        db.create_all()
+        Generator(seed=3, city_skew=2.0, anchor=anchor).populate(db.session, venues=200, artists=50, shows=500)
+        self.assertEqual(db.session.query(Venue.name, Venue.city, Venue.genres).order_by(Venue.id).all(), first)
+        self.assertEqual(db.session.query(Show.venue_id, Show.artist_id, Show.start_time).order_by(Show.id).all(), shows)
+
+    # test that the load test drives every route and flags regressions
+    def test_load_test_routes_and_compare(self):
+        driven, skipped = loadtest.routes()
+        labels = {label for label, builder in driven}
+        self.assertIn('GET /venues/<int:venue_id>', labels)
+        self.assertIn('POST /venues/search', labels)
+        self.assertIn('POST /shows/create', labels)
+        self.assertEqual(len(labels) + len(skipped), sum(len(rule.methods - {'HEAD', 'OPTIONS'})
+                                                         for rule in app.url_map.iter_rules()))
+        self.assertEqual(loadtest.percentile(list(range(1, 101)), 0.95), 95)
+
+        baseline = {'peak_rss_kb': 1000, 'routes': {'GET /venues': {'p95_ms': 10.0, 'queries_per_request': 1}}}
+        current = {'peak_rss_kb': 1100, 'routes': {'GET /venues': {'p95_ms': 11.0, 'queries_per_request': 1}}}
+        self.assertEqual(loadtest.compare(baseline, current), [])
+        current['routes']['GET /venues'] = {'p95_ms': 20.0, 'queries_per_request': 2}
+        self.assertEqual(len(loadtest.compare(baseline, current)), 2)
+
+    # test that requests report their queries and repeated or slow statements are logged
+    def test_request_query_profiling(self):
+        venue_ids = [self.create_venue('Venue %d' % i).id for i in range(8)]
+        db.session.remove()
+        profiler.reset()
+        app.config['QUERY_STATS_HEADERS'] = True
+        self.addCleanup(app.config.update, QUERY_STATS_HEADERS=app.config['QUERY_STATS_HEADERS'],
+                        SLOW_QUERY_MS=app.config['SLOW_QUERY_MS'])
+
+        response = self.client().get('/venues')
+        self.assertEqual(response.headers['X-Query-Count'], '1')
+        self.assertIn('X-Query-Time-Ms', response.headers)
+        self.assertEqual(profiler.info()['endpoints']['venues']['requests'], 1)
+
+        app.config['SLOW_QUERY_MS'] = 0
+        with self.assertLogs(app.logger, 'WARNING') as logs, app.test_request_context('/venues'):
+            app.preprocess_request()
+            for venue_id in venue_ids:
+                db.session.query(Venue.name).filter(Venue.id == venue_id).one()
+            app.process_response(app.response_class('ok'))
+        self.assertTrue(any('possible N+1 in venues: 8 x SELECT' in line for line in logs.output))
+        info = profiler.info()
+        self.assertEqual(len(info['slow']), 8)
+        self.assertEqual(info['repeats'][0]['count'], 8)
+
+    # test that ?genre= lists only tagged venues/artists and follows genre edits
+    def test_genre_filters(self):
+        jazz = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1 Main St',
+                     genres=['Jazz', 'Reggae'])
+        folk = Venue(name='The Dueling Pianos Bar', city='New York', state='NY', address='2 Main St',
+                     genres=['Folk'])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Jazz', 'Polka'])
+        db.session.add_all([jazz, folk, artist])
+        db.session.commit()
+
+        response = self.client().get('/venues?genre=Jazz')
+        self.assertIn(b'The Musical Hop', response.data)
+        self.assertNotIn(b'The Dueling Pianos Bar', response.data)
+        self.assertIn(b'Guns N Petals', self.client().get('/artists?genre=Polka').data)
+        self.assertNotIn(b'Guns N Petals', self.client().get('/artists?genre=Folk').data)
+
+        folk.genres = ['Folk', 'Jazz']
+        db.session.commit()
+        self.assertIn(b'The Dueling Pianos Bar', self.client().get('/venues?genre=Jazz').data)
+
+        # rows inserted through Core are linked afterwards
+        db.session.execute(Venue.__table__.insert(), [{'name': 'Park Square', 'city': 'San Francisco',
+                                                      'state': 'CA', 'address': '3 Main St',
+                                                      'genres': ['Jazz'], 'num_upcoming_shows': 0}])
+        self.assertEqual(link_unlinked(db.session, Venue), 1)
+        db.session.commit()
+        self.assertIn(b'Park Square', self.client().get('/venues?genre=Jazz').data)
+
+    # test that venues are geocoded from the bundled centroids and found nearest first
+    def test_nearby_venues(self):
+        self.create_venue('The Musical Hop')
+        self.create_venue('Oakland Bowl', 'Oakland')
+        self.create_venue('Somewhere Hall', 'Nowhereville')
+        moving = self.create_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        self.create_venue('Lost Club', 'Atlantis', 'ZZ')
+        self.assertAlmostEqual(distance_km(37.7749, -122.4194, 40.7128, -74.0060), 4129, delta=5)
+
+        with QueryCounter() as counter:
+            response = self.client().get('/venues/nearby?lat=37.78&lon=-122.41&radius=30')
+        body = response.data.decode()
+        self.assertLess(body.index('The Musical Hop'), body.index('Oakland Bowl'))
+        self.assertNotIn('Somewhere Hall', body)
+        self.assertNotIn('The Dueling Pianos Bar', body)
+        # the points in range, then the venues at each of the two points
+        self.assertEqual(counter.count, 3)
+
+        data = self.client().get('/api/v1/venues/nearby?lat=37.7749&lon=-122.4194&radius=500&limit=2').get_json()['data']
+        self.assertEqual([venue['name'] for venue in data], ['The Musical Hop', 'Oakland Bowl'])
+        self.assertEqual(data[0]['distance_km'], 0.0)
+        self.assertIn('Somewhere Hall', self.client().get('/venues/nearby?lat=36.1&lon=-119.7').data.decode())
+
+        # moving a venue moves its point; core inserts are placed afterwards
+        moving.city, moving.state = 'San Francisco', 'CA'
+        db.session.commit()
+        db.session.execute(Venue.__table__.insert(), [{'name': 'Park Square', 'city': 'San Francisco',
+                                                      'state': 'CA', 'address': '3 Main St', 'num_upcoming_shows': 0}])
+        self.assertEqual(geocode_missing(db.session), 1)
+        db.session.commit()
+        body = self.client().get('/venues/nearby?lat=37.7749&lon=-122.4194&radius=1').data.decode()
+        for name in ('The Musical Hop', 'The Dueling Pianos Bar', 'Park Square'):
+            self.assertIn(name, body)
+        self.assertEqual(self.client().get('/venues/nearby?lat=37.7749').status_code, 400)
+        self.assertEqual(self.client().get('/api/v1/venues/nearby?lat=1&lon=1&radius=5000').status_code, 400)
+
+    # test that precompiled templates load from the bytecode cache without compiling
+    def test_template_bytecode_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        names = template_names(app.jinja_env)
+        self.assertIn('pages/home.html', names)
+        self.assertNotIn('pages/home.css', names)
+
+        result = app.test_cli_runner().invoke(args=['fyyur-compile-templates', '--directory', directory])
+        self.assertIn('%d templates compiled' % len(names), result.output)
+        self.assertEqual(len(os.listdir(directory)), len(names))
+
+        env = app.create_jinja_environment()
+        env.filters.update(app.jinja_env.filters)
+        env.bytecode_cache = FileSystemBytecodeCache(directory)
+        compiled = []
+        compile = env.compile
+        env.compile = lambda source, name=None, *args, **kwargs: compiled.append(name) or compile(source, name, *args, **kwargs)
+        env.get_template('pages/show_venue.html')
+        self.assertEqual(compiled, [])
+
+        # production settings install the cache and load every template up front
+        app.config.update(TEMPLATE_BYTECODE_CACHE_DIR=directory, TEMPLATE_PRELOAD=True)
+        self.addCleanup(app.config.update, TEMPLATE_BYTECODE_CACHE_DIR=None, TEMPLATE_PRELOAD=False)
+        self.addCleanup(setattr, app.jinja_env, 'bytecode_cache', app.jinja_env.bytecode_cache)
+        init_templates(app)
+        self.assertEqual(app.jinja_env.bytecode_cache.directory, directory)
+        self.assertEqual(self.client().get('/').status_code, 200)
+
+    # test that built assets are bundled, fingerprinted, precompressed and cached for good
+    def test_static_assets_build(self):
+        # without a build the layout loads the files in static/
+        page = self.client().get('/').data
+        self.assertIn(b'/static/css/main.css', page)
+        self.assertIn(b'/static/img/front-splash.jpg', page)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        result = app.test_cli_runner().invoke(args=['fyyur-build-assets', '--directory', directory])
+        self.assertIn('assets built', result.output)
+        manifest = load_manifest(directory)
+        self.assertEqual(set(manifest), set(BUNDLES) | set(FILES))
+        self.assertRegex(manifest['css/fyyur.css'], r'^css/fyyur\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(directory, manifest['css/fyyur.css']), 'rb') as bundle:
+            css = bundle.read()
+        with open(os.path.join(directory, manifest['css/fyyur.css'] + '.gz'), 'rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), css)
+        self.assertIn(b'a{cursor:pointer;color:#ff8c3a}', css)
+        # fonts bootstrap points at but the app does not ship stay where they were
+        self.assertIn(b'url("/static/fonts/glyphicons-halflings-regular.woff")', css)
+        self.assertEqual(minify_css('a :hover { content: "a ;  b" ; } /* gone */ .x > .y { margin : 0 }'),
+                         'a :hover{content:"a ;  b"}.x>.y{margin :0}')
+
+        app.config['ASSETS_DIR'] = directory
+        self.addCleanup(init_assets, app)
+        self.addCleanup(app.config.update, ASSETS_DIR=app.config['ASSETS_DIR'])
+        init_assets(app)
+        page = self.client().get('/').data.decode()
+        self.assertIn('/assets/' + manifest['css/fyyur.css'], page)
+        self.assertIn('/assets/' + manifest['js/head.js'], page)
+        self.assertIn('/assets/' + manifest['img/front-splash.jpg'], page)
+        self.assertNotIn('/static/css/', page)
+
+        response = self.client().get('/assets/' + manifest['css/fyyur.css'], headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual((response.status_code, response.content_encoding, response.mimetype), (200, 'gzip', 'text/css'))
+        self.assertEqual(gzip.decompress(response.data), css)
+        self.assertEqual(response.cache_control.max_age, 365 * 24 * 3600)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertIn('Accept-Encoding', response.vary)
+        plain = self.client().get('/assets/' + manifest['css/fyyur.css'])
+        self.assertEqual((plain.content_encoding, plain.data), (None, css))
+        self.assertEqual(self.client().get('/assets/manifest.json').status_code, 404)
+
+    # test that the JSON API streams collections, selects ?fields= and revalidates with ETags
+    def test_api_collections(self):
+        artist = self.create_artist('Guns N Petals')
+        venue = self.create_venue('The Musical Hop')
+        self.create_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        self.create_show(artist, venue, 1)
+        venue_id = venue.id
+        app.config['API_STREAM_CHUNK'] = 1
+        self.addCleanup(app.config.update, API_STREAM_CHUNK=500)
+
+        response = self.client().get('/api/v1/venues')
+        self.assertTrue(response.is_streamed)
+        self.assertEqual([row['name'] for row in response.get_json()['data']],
+                         ['The Musical Hop', 'The Dueling Pianos Bar'])
+        # the per-process cache cannot see other processes' writes: no ETag
+        self.assertNotIn('ETag', response.headers)
+
+        client = RedisStandIn()
+        self.addCleanup(setattr, page_cache, 'backend', page_cache.backend)
+        page_cache.backend = RedisBackend(client)
+        etag = self.client().get('/api/v1/venues').headers['ETag']
+        with QueryCounter() as counter:
+            response = self.client().get('/api/v1/venues', headers={'If-None-Match': etag})
+        self.assertEqual((response.status_code, counter.count), (304, 0))
+
+        # a write from another process, e.g. a CLI command, bumps the shared generation
+        elsewhere = PageCache()
+        elsewhere.backend = RedisBackend(client)
+        db.session.execute(Venue.__table__.update().where(Venue.__table__.c.id == venue_id)
+                                                   .values(name='The Musical Hop Annex'))
+        db.session.commit()
+        elsewhere.invalidate('venues')
+        response = self.client().get('/api/v1/venues', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'The Musical Hop Annex', response.data)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        with QueryCounter() as counter:
+            data = self.client().get('/api/v1/shows?fields=venue_name,start_time').get_json()['data']
+        self.assertEqual(set(data[0]), {'id', 'venue_name', 'start_time'})
+        self.assertNotIn('JOIN artists', counter.statements[0])
+        response = self.client().get('/api/v1/artists?fields=name,nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.get_json()['error']['message'])
+
+        data = self.client().get('/api/v1/venues/%d' % venue_id).get_json()['data']
+        self.assertEqual(data['upcoming_shows'][0]['artist_name'], 'Guns N Petals')
+        self.assertEqual(self.client().get('/api/v1/artists/1000').get_json()['error']['status'], 404)
+
+    # test that months past the retention window are archived to gzipped CSV files and removed
+    def test_archive_past_shows(self):
+        venue = self.create_venue('The Musical Hop')
+        artist = self.create_artist('Guns N Petals')
+        this_month = month_start(datetime.now())
+        old = [add_months(this_month, -30) + timedelta(days=3, hours=20),
+               add_months(this_month, -30) + timedelta(days=9, hours=20),
+               add_months(this_month, -25) + timedelta(hours=21)]
+        for start_time in old:
+            db.session.add(Show(artist_id=artist.id, venue_id=venue.id, start_time=start_time))
+        db.session.commit()
+        self.create_show(artist, venue, -1)
+        self.create_show(artist, venue, 1)
+        venue_id = venue.id
+        self.assertEqual(partition_name(old[0]), 'shows_y%04dm%02d' % (old[0].year, old[0].month))
+        self.assertEqual(partition_month(partition_name(old[0])), month_start(old[0]))
+        self.assertIsNone(partition_month('shows_default'))
+
+        # nothing to partition on SQLite
+        result = app.test_cli_runner().invoke(args=['fyyur-create-partitions'])
+        self.assertIn('0 partitions created.', result.output)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        result = app.test_cli_runner().invoke(args=['fyyur-archive-shows', '--keep-months', '24',
+                                                    '--directory', directory])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('%s: 2 shows archived.' % old[0].strftime('%Y-%m'), result.output)
+        self.assertEqual(sorted(os.listdir(directory)), sorted(
+            partition_name(start_time) + '.csv.gz' for start_time in (old[0], old[2])))
+        with gzip.open(os.path.join(directory, partition_name(old[0]) + '.csv.gz'), 'rt') as archive:
+            lines = archive.read().splitlines()
+        self.assertEqual(lines[0], 'id,artist_id,venue_id,start_time')
+        self.assertEqual([line.split(',')[3] for line in lines[1:]], [old[0].isoformat(), old[1].isoformat()])
+
+        db.session.remove()
+        self.assertEqual(Show.query.count(), 2)
+        data = venue_detail(venue_id)
+        self.assertEqual((data['past_shows_count'], data['upcoming_shows_count']), (1, 1))
+        # months that have not ended stay put
+        with self.assertRaises(ValueError):
+            archive_shows(db.session, add_months(month_start(datetime.now()), 1), directory)
+
+    # test that /autocomplete completes any word of a name from memory and follows committed changes
+    def test_autocomplete(self):
+        venue = self.create_venue('The Musical Hop')
+        self.create_venue('Café Élan')
+        self.create_artist('Guns N Petals')
+        self.create_artist('The Hopeful Trio')
+        client = self.client()
+
+        data = client.get('/autocomplete?q=hop').get_json()['data']
+        self.assertEqual([(result['type'], result['name']) for result in data],
+                         [('venue', 'The Musical Hop'), ('artist', 'The Hopeful Trio')])
+        self.assertEqual(data[0]['id'], venue.id)
+        self.assertEqual(client.get('/autocomplete?q=ELAN').get_json()['data'][0]['name'], 'Café Élan')
+        self.assertEqual([result['name'] for result in client.get('/autocomplete?q=the&type=artist').get_json()['data']],
+                         ['The Hopeful Trio'])
+        self.assertEqual(client.get('/autocomplete?q=').get_json()['data'], [])
+        self.assertEqual(client.get('/autocomplete?q=hop&type=show').status_code, 400)
+
+        # renames, inserts and deletions apply on commit, without a query
+        venue = db.session.get(Venue, venue.id)
+        venue.name = 'The Jazz Cellar'
+        db.session.commit()
+        self.create_artist('Hoppy Kids')
+        db.session.add(Venue(name='Hop Rollback', city='Austin', state='TX', address='1 Main St'))
+        db.session.flush()
+        db.session.rollback()
+        with QueryCounter() as counter:
+            hop = [result['name'] for result in client.get('/autocomplete?q=hop').get_json()['data']]
+            jazz = [result['name'] for result in client.get('/autocomplete?q=jazz').get_json()['data']]
+        self.assertEqual(counter.count, 0)
+        self.assertEqual(hop, ['The Hopeful Trio', 'Hoppy Kids'])
+        self.assertEqual(jazz, ['The Jazz Cellar'])
+
+        venue.deleted_at = datetime.now()
+        db.session.commit()
+        self.assertEqual(client.get('/autocomplete?q=jazz').get_json()['data'], [])
+
+        index = PrefixIndex([(1, 'The Musical Hop'), (2, 'Hop Hop Hop')])
+        self.assertEqual(index.complete('hop', 10), [('hop', 1, 'The Musical Hop'), ('hop', 2, 'Hop Hop Hop')])
+        index.set(2, None)
+        self.assertEqual(index.complete('hop', 1), [('hop', 1, 'The Musical Hop')])
+        self.assertEqual(index.info()['changes'], 1)
+
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Fails when a query behind a hot route falls back to a sequential scan.
+
+    Uses the Postgres database named by TEST_DATABASE_URL when set (its
+    tables are created, seeded, analyzed and dropped again), otherwise a
+    seeded SQLite file."""
+
+    ROUTES = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1', '/venues?genre=Jazz', '/artists?genre=Jazz',
+              '/shows?window=upcoming', '/venues/nearby?lat=37.7749&lon=-122.4194&radius=50']
+    # search only reaches the database through the trigram index on Postgres
+    POSTGRES_ROUTES = ['/venues/search?search_term=venue+12', '/artists/search?search_term=artist+12']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.database_path = None
+        url = os.environ.get('TEST_DATABASE_URL')
+        if url is None:
+            db_fd, cls.database_path = tempfile.mkstemp(suffix='.db')
+            os.close(db_fd)
+            url = 'sqlite:///' + cls.database_path
+        app.config['SQLALCHEMY_DATABASE_URI'] = url
+        app.config['TESTING'] = True
+        app.config['PAGE_CACHE_ENABLED'] = False
+
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.create_all()
+        cls.dialect = db.engine.dialect.name
+        if cls.dialect == 'postgresql':
+            with db.engine.begin() as connection:
+                install_postgres_search(connection)
+        cls.seed()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+        if cls.database_path:
+            os.unlink(cls.database_path)
+
+    @classmethod
+    def seed(cls, venues=2000, artists=2000, shows=40000):
+        # enough rows that the planner prefers an index whenever one fits
+        now = datetime.now()
+        # bundled cities, so venues land on many points
+        places = sorted(CITY_CENTROIDS)
+        db.session.execute(Venue.__table__.insert(), [
+            {'name': 'Venue %d' % i, 'city': places[i % len(places)][0], 'state': places[i % len(places)][1],
+             'address': '%d Main St' % i,
+             'genres': [GENRES[i % len(GENRES)]], 'num_upcoming_shows': 0} for i in range(venues)])
+        db.session.execute(Artist.__table__.insert(), [
+            {'name': 'Artist %d' % i, 'city': 'City %d' % (i % 50), 'state': 'NY',
+             'genres': [GENRES[i % len(GENRES)]], 'num_upcoming_shows': 0} for i in range(artists)])
+        db.session.execute(Show.__table__.insert(), [
+            {'venue_id': i % venues + 1, 'artist_id': (i * 7) % artists + 1,
+             'start_time': now + timedelta(hours=i - shows // 2)} for i in range(shows)])
+        link_unlinked(db.session, Venue)
+        link_unlinked(db.session, Artist)
+        geocode_missing(db.session)
+        refresh_upcoming(db.session)
+        db.session.commit()
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('ANALYZE')
+
+    def sequential_scans(self, statement, parameters):
+        with db.engine.connect() as connection:
+            if self.dialect == 'postgresql':
+                plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+                nodes = [plan[0]['Plan']]
+                scans = []
+                while nodes:
+                    node = nodes.pop()
+                    if node['Node Type'] == 'Seq Scan':
+                        scans.append(node['Relation Name'])
+                    nodes.extend(node.get('Plans', []))
+                return scans
+
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            # "SCAN shows" reads the whole table; "SCAN shows USING INDEX" walks an index in order
+            return [row[3] for row in rows if row[3].startswith('SCAN ') and 'USING' not in row[3]]
+
+    # test that no query behind a hot route is planned as a sequential scan
+    def test_hot_routes_use_indexes(self):
+        routes = self.ROUTES + (self.POSTGRES_ROUTES if self.dialect == 'postgresql' else [])
+        for route in routes:
+            with QueryCounter() as counter:
+                response = app.test_client().get(route)
+            self.assertEqual(response.status_code, 200, route)
+
+            for statement, parameters in zip(counter.statements, counter.parameters):
+                if statement.lstrip().upper().startswith('SELECT'):
+                    self.assertEqual(self.sequential_scans(statement, parameters), [],
+                                     '%s: %s' % (route, statement))
+
+
+
+@unittest.skipUnless((os.environ.get('TEST_DATABASE_URL') or '').startswith('postgresql'),
+                     'needs a Postgres TEST_DATABASE_URL')
+class PostgresBookingTestCase(unittest.TestCase):
+    """Double bookings refused by the database once shows is partitioned by month."""
+
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['TEST_DATABASE_URL']
+        app.config['TESTING'] = True
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        with db.engine.begin() as connection:
+            install_postgres_bookings(connection)
+            install_postgres_partitions(connection, datetime(2026, 10, 1), datetime(2026, 11, 1))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    # test that two shows overlapping across a month boundary are refused, like two within a month
+    def test_overlap_across_month_partitions(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1 Main St')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        other = Artist(name='Matt Quevedo', city='New York', state='NY')
+        db.session.add_all([venue, artist, other])
+        db.session.commit()
+
+        def book(artist, start_time):
+            db.session.execute(Show.__table__.insert(), {'venue_id': venue.id, 'artist_id': artist.id,
+                                                         'start_time': start_time})
+            db.session.commit()
+
+        book(artist, datetime(2026, 10, 31, 23, 0))
+        for start_time in (datetime(2026, 11, 1, 0, 30), datetime(2026, 10, 31, 21, 0)):
+            with self.assertRaises(exc.IntegrityError):
+                book(other, start_time)
+            db.session.rollback()
+        book(other, datetime(2026, 11, 1, 2, 0))
+        self.assertEqual(list(find_conflicts(db.session)), [])
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
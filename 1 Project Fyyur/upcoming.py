@@ -0,0 +1,98 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import dateutil.parser
+from datetime import datetime
+from sqlalchemy import event, select
+from sqlalchemy.orm import attributes
+from models import Venue, Artist, Show, UpcomingShow
+
+#----------------------------------------------------------------------------#
+# Upcoming shows calendar.
+#
+# upcoming_shows holds one pre-joined row per show that had not started at
+# the last refresh, so the calendar reads a single table by its
+# (start_time, show_id) index instead of joining shows, venues and artists
+# over the whole history. New shows are added as they are created, venue
+# and artist renames are copied over by mapper events, and a scheduled
+# `flask fyyur-refresh-upcoming` rebuilds the table, dropping shows that
+# have started. Readers still filter on start_time, so rows that started
+# since the last refresh are never shown.
+#----------------------------------------------------------------------------#
+
+COLUMNS = ['show_id', 'start_time', 'venue_id', 'venue_name', 'venue_image_link',
+           'artist_id', 'artist_name', 'artist_image_link']
+
+# model -> (upcoming_shows columns copied from it, by the model's column)
+COPIED = {
+    Venue: (UpcomingShow.venue_id, {'name': 'venue_name', 'image_link': 'venue_image_link'}),
+    Artist: (UpcomingShow.artist_id, {'name': 'artist_name', 'image_link': 'artist_image_link'}),
+}
+
+def upcoming_rows(now, *criteria):
+    # shows joined to the names the calendar shows, in COLUMNS order
+    return select(
+        Show.id, Show.start_time,
+        Show.venue_id, Venue.name, Venue.image_link,
+        Show.artist_id, Artist.name, Artist.image_link
+    ).join(Venue, Venue.id == Show.venue_id) \
+     .join(Artist, Artist.id == Show.artist_id) \
+     .where(Show.start_time > now, Venue.deleted_at.is_(None), Artist.deleted_at.is_(None), *criteria)
+
+def refresh_upcoming(session, now=None):
+    '''
+    Rebuilds upcoming_shows from shows in the caller's transaction; readers
+    keep seeing the previous contents until it commits. Returns the row count.
+    '''
+    now = now or datetime.now()
+    table = UpcomingShow.__table__
+    session.execute(table.delete())
+    session.execute(table.insert().from_select(COLUMNS, upcoming_rows(now)))
+    return session.query(UpcomingShow).count()
+
+def add_upcoming_show(session, show, now=None):
+    '''Adds a freshly flushed show to the calendar if it has not started.'''
+    now = now or datetime.now()
+    if show.start_time <= now:
+        return
+    session.execute(UpcomingShow.__table__.insert().from_select(COLUMNS, upcoming_rows(now, Show.id == show.id)))
+
+def forget_upcoming(session, foreign_key, entity_id):
+    '''Drops the calendar rows of a venue or artist (foreign_key = Show.venue_id/artist_id).'''
+    column = UpcomingShow.venue_id if foreign_key is Show.venue_id else UpcomingShow.artist_id
+    session.query(UpcomingShow).filter(column == entity_id).delete(synchronize_session=False)
+
+def calendar(session, start=None, end=None, now=None):
+    '''Query of upcoming shows starting after `start` (and now) and before `end`.'''
+    now = now or datetime.now()
+    start = max(start, now) if start else now
+    query = session.query(*[getattr(UpcomingShow, column) for column in COLUMNS]) \
+        .filter(UpcomingShow.start_time > start)
+    if end is not None:
+        query = query.filter(UpcomingShow.start_time < end)
+    return query
+
+CALENDAR_ORDER = (UpcomingShow.start_time, UpcomingShow.show_id)
+
+def parse_bound(value):
+    '''Parses a from/to argument into a naive local datetime, raising ValueError.'''
+    try:
+        moment = dateutil.parser.parse(value)
+    except OverflowError as error:
+        raise ValueError(value) from error
+    # start times are stored as naive local times
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+def _copy_names(mapper, connection, target):
+    key, copied = COPIED[type(target)]
+    changed = {column: getattr(target, attribute) for attribute, column in copied.items()
+               if attributes.get_history(target, attribute).has_changes()}
+    if changed:
+        table = UpcomingShow.__table__
+        connection.execute(table.update().where(table.c[key.key] == target.id).values(**changed))
+
+for _model in COPIED:
+    event.listen(_model, 'after_update', _copy_names)